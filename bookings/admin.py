@@ -5,7 +5,7 @@ from django.urls import reverse, path
 from django.contrib import messages
 from django.shortcuts import redirect, get_object_or_404
 from django.core.exceptions import ValidationError
-from .models import ShortTermBooking, ShortTermBookingNight
+from .models import ShortTermBooking, ShortTermBookingNight, OutboxEmail
 from decimal import Decimal
 from .admin_helpers import render_discount_form
 from . import admin_templates
@@ -477,3 +477,27 @@ class ShortTermBookingNightAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         """Prevent manual addition of booking nights"""
         return False
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """Delivery status of queued emails"""
+
+    list_display = (
+        'subject', 'recipients', 'status', 'attempts', 'created_at',
+        'sent_at', 'next_attempt_at'
+    )
+    list_filter = ('status',)
+    search_fields = ('subject', 'to')
+    readonly_fields = (
+        'subject', 'html_content', 'from_email', 'to', 'attempts',
+        'last_error', 'created_at', 'sent_at'
+    )
+
+    def recipients(self, obj):
+        """Display recipients"""
+        return ', '.join(obj.to)
+
+    def has_add_permission(self, request):
+        """Emails are only queued by the application"""
+        return False
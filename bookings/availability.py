@@ -0,0 +1,293 @@
+"""
+Per-listing, per-year availability bitmaps.
+
+ShortTermAvailabilityBitmap stores one bit per night of a year (bit 0 is
+January 1st), set when the night is booked by a booking that is not
+cancelled. Date-range and flexible-date searches load the bitmaps of the
+years they touch in one query and test availability with integer bit
+operations instead of joining the nights table. Bitmaps are refreshed
+by the booking receivers in bookings/signals.py and rebuilt by
+`manage.py rebuild_calendar`.
+"""
+from datetime import date, timedelta
+
+from django.db.models import Count, Max
+
+from listings.models import ShortTermListing
+from .models import ShortTermAvailabilityBitmap, ShortTermBookingNight
+from .utils import resolve_nightly_prices_bulk, price_totals
+
+
+# 366 bits, enough for a leap year
+BITMAP_BYTES = 46
+
+
+def _to_int(bits):
+    return int.from_bytes(bytes(bits), "little")
+
+
+def _to_bytes(value):
+    return value.to_bytes(BITMAP_BYTES, "little")
+
+
+def refresh_availability_bitmaps(listing_id, start_date, end_date):
+    """
+    Recompute the bitmaps of a listing for every year touched by
+    [start_date, end_date).
+    """
+    if end_date <= start_date:
+        return
+
+    years = range(start_date.year, (end_date - timedelta(days=1)).year + 1)
+    bitmaps = {year: 0 for year in years}
+
+    nights = ShortTermBookingNight.objects.filter(
+        booking__listing_id=listing_id,
+        date__year__in=list(years),
+    ).exclude(
+        booking__status='cancelled'
+    ).values_list("date", flat=True)
+
+    for night in nights:
+        bitmaps[night.year] |= 1 << (night.timetuple().tm_yday - 1)
+
+    ShortTermAvailabilityBitmap.objects.bulk_create(
+        [
+            ShortTermAvailabilityBitmap(
+                listing_id=listing_id, year=year, booked=_to_bytes(bits))
+            for year, bits in bitmaps.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["listing", "year"],
+        update_fields=["booked"],
+    )
+
+
+def rebuild_availability_bitmaps(listing):
+    """Drop and rebuild every bitmap of a listing"""
+    ShortTermAvailabilityBitmap.objects.filter(listing=listing).delete()
+    years = ShortTermBookingNight.objects.filter(
+        booking__listing=listing
+    ).exclude(
+        booking__status='cancelled'
+    ).dates("date", "year")
+
+    for year in years:
+        refresh_availability_bitmaps(
+            listing.pk, date(year.year, 1, 1), date(year.year + 1, 1, 1))
+
+
+def booked_bits(start_date, end_date, listing_ids=None):
+    """
+    Load the booked nights of [start_date, end_date) as integers.
+
+    Bit i of each value is set when start_date + i days is booked.
+    Listings without any booked night in the range are omitted.
+
+    Returns:
+        dict: {listing_id: int}
+    """
+    length = (end_date - start_date).days
+    if length <= 0:
+        return {}
+
+    bitmaps = ShortTermAvailabilityBitmap.objects.filter(
+        year__gte=start_date.year,
+        year__lte=(end_date - timedelta(days=1)).year,
+    )
+    if listing_ids is not None:
+        bitmaps = bitmaps.filter(listing_id__in=listing_ids)
+
+    range_mask = (1 << length) - 1
+    result = {}
+    for listing_id, year, bits in bitmaps.values_list(
+            "listing_id", "year", "booked"):
+        # Align bit 0 (January 1st of the year) with start_date
+        shift = (date(year, 1, 1) - start_date).days
+        value = _to_int(bits)
+        value = value << shift if shift >= 0 else value >> -shift
+        value &= range_mask
+        if value:
+            result[listing_id] = result.get(listing_id, 0) | value
+    return result
+
+
+def check_in_bits(booked, length, nights):
+    """
+    Feasible check-in offsets for stays of `nights` nights.
+
+    Args:
+        booked: booked bits over a window of `length` nights, as
+            returned by booked_bits.
+        length: number of nights in the window.
+        nights: length of the stay.
+
+    Returns:
+        int: bit i is set when every night from offset i to
+        i + nights - 1 is free and inside the window.
+    """
+    if nights < 1 or nights > length:
+        return 0
+
+    free = ~booked & ((1 << length) - 1)
+    # After the loop bit i is set iff bits i .. i + span - 1 are free.
+    # The span doubles each round, then the remainder is folded in.
+    span = 1
+    while span * 2 <= nights:
+        free &= free >> span
+        span *= 2
+    if span < nights:
+        free &= free >> (nights - span)
+    return free
+
+
+def unavailable_listing_ids(start_date, end_date):
+    """Listing ids with at least one booked night in the range"""
+    return set(booked_bits(start_date, end_date))
+
+
+def _unpriced_bits(breakdown):
+    """Bit i is set when night i of a nightly breakdown has no price"""
+    bits = 0
+    for idx, (_, price) in enumerate(breakdown):
+        if price is None:
+            bits |= 1 << idx
+    return bits
+
+
+def unpriced_bits(start_date, end_date):
+    """
+    Load the nights of [start_date, end_date) that have no price, as
+    booked_bits does. Only listings without a price can have any, so
+    this costs three queries however many listings there are.
+
+    Returns:
+        dict: {listing_id: int}
+    """
+    breakdowns = resolve_nightly_prices_bulk(
+        ShortTermListing.objects.filter(price__isnull=True),
+        start_date, end_date)
+    result = {}
+    for listing_id, breakdown in breakdowns.items():
+        bits = _unpriced_bits(breakdown)
+        if bits:
+            result[listing_id] = bits
+    return result
+
+
+def listing_ids_without_stay(start_date, end_date, nights):
+    """
+    Listing ids that have no run of `nights` free and priced nights
+    within [start_date, end_date). Listings without bitmaps and with a
+    price are entirely free and never returned.
+    """
+    length = (end_date - start_date).days
+    blocked = booked_bits(start_date, end_date)
+    for listing_id, bits in unpriced_bits(start_date, end_date).items():
+        blocked[listing_id] = blocked.get(listing_id, 0) | bits
+    return {
+        listing_id
+        for listing_id, bits in blocked.items()
+        if not check_in_bits(bits, length, nights)
+    }
+
+
+def flexible_stays(listings, start_date, end_date, nights):
+    """
+    Find every feasible stay of `nights` nights inside
+    [start_date, end_date) for several listings, and the cheapest one.
+
+    Availability comes from the bitmaps and prices from the bulk price
+    resolver, three queries in total. Stay subtotals are computed with a
+    sliding window over prefix sums, so each listing costs O(window).
+
+    Returns:
+        dict: {listing_id: {
+            'check_in_dates': [date, ...],
+            'cheapest': price dict of the cheapest stay (as returned by
+                calculate_booking_price) plus 'check_in' and 'check_out',
+                or None when no stay is feasible,
+        }}
+    """
+    listings = list(listings)
+    length = (end_date - start_date).days
+    booked = booked_bits(
+        start_date, end_date, [listing.pk for listing in listings])
+    breakdowns = resolve_nightly_prices_bulk(listings, start_date, end_date)
+
+    results = {}
+    for listing in listings:
+        breakdown = breakdowns[listing.pk]
+
+        # Nights without a price cannot be quoted, treat them as booked
+        prefix = [0]
+        for _, price in breakdown:
+            prefix.append(prefix[-1] + (price or 0))
+
+        feasible = check_in_bits(
+            booked.get(listing.pk, 0) | _unpriced_bits(breakdown),
+            length, nights)
+
+        check_in_dates = []
+        cheapest_idx = None
+        cheapest_subtotal = None
+        for idx in range(feasible.bit_length()):
+            if not (feasible >> idx) & 1:
+                continue
+            check_in_dates.append(start_date + timedelta(days=idx))
+            subtotal = prefix[idx + nights] - prefix[idx]
+            if cheapest_subtotal is None or subtotal < cheapest_subtotal:
+                cheapest_idx = idx
+                cheapest_subtotal = subtotal
+
+        cheapest = None
+        if cheapest_idx is not None:
+            cheapest = price_totals(
+                listing, breakdown[cheapest_idx:cheapest_idx + nights])
+            check_in = start_date + timedelta(days=cheapest_idx)
+            cheapest['check_in'] = check_in
+            cheapest['check_out'] = check_in + timedelta(days=nights)
+
+        results[listing.pk] = {
+            'check_in_dates': check_in_dates,
+            'cheapest': cheapest,
+        }
+    return results
+
+
+def availability_validators(listing_id):
+    """
+    Validators of the availability of a listing, for conditional GET
+    (see re_drf_api/conditional.py). Prices move the listing's
+    `updated_on` and `pricing_version`; bookings their own `updated_at`,
+    and deleting one touches the listing.
+
+    Returns:
+        tuple: (values, last modified datetime), or None for an unknown
+        listing.
+    """
+    try:
+        row = ShortTermListing.objects.filter(pk=listing_id).annotate(
+            last_booking=Max("bookings__updated_at"),
+            booking_count=Count("bookings"),
+        ).values(
+            "updated_on", "pricing_version", "last_booking", "booking_count"
+        ).order_by("pk").first()
+    except ValueError:
+        return None
+    if row is None:
+        return None
+
+    last_modified = max(
+        row["updated_on"], row["last_booking"] or row["updated_on"])
+    return (
+        (
+            "availability",
+            listing_id,
+            row["updated_on"],
+            row["pricing_version"],
+            row["last_booking"],
+            row["booking_count"],
+        ),
+        last_modified,
+    )
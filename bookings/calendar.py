@@ -0,0 +1,220 @@
+"""
+Materialized per-listing daily calendar.
+
+ShortTermCalendarDay stores the nightly price and booked state of every
+short-term listing for each date in a rolling window (today plus
+CALENDAR_HORIZON_DAYS), plus every booked night outside that window.
+Readers query this one indexed table instead of joining bookings,
+nights, overrides and seasons. Rows are refreshed by the receivers in
+bookings/signals.py; `manage.py rebuild_calendar` rebuilds them from
+scratch and `manage.py check_calendar` reports drift.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from listings.models import ShortTermListing
+from .models import ShortTermBookingNight, ShortTermCalendarDay
+from .utils import resolve_nightly_prices
+
+
+# Number of days ahead of today that are always materialized
+CALENDAR_HORIZON_DAYS = 730
+
+
+def calendar_window():
+    """
+    Return the (start, end) of the always-materialized window.
+    The end date is exclusive.
+    """
+    today = timezone.localdate()
+    return today, today + timedelta(days=CALENDAR_HORIZON_DAYS)
+
+
+def _booked_nights(listing_id, start_date=None, end_date=None):
+    """
+    Return {date: booking_id} for the listing's booked nights,
+    excluding nights of cancelled bookings.
+    """
+    nights = ShortTermBookingNight.objects.filter(
+        booking__listing_id=listing_id
+    ).exclude(booking__status='cancelled')
+
+    if start_date is not None:
+        nights = nights.filter(date__gte=start_date)
+    if end_date is not None:
+        nights = nights.filter(date__lt=end_date)
+
+    return dict(nights.values_list("date", "booking_id"))
+
+
+def _expected_days(listing, start_date, end_date):
+    """
+    Compute the rows the calendar should hold for [start_date, end_date):
+    every date inside the materialized window plus every booked night.
+
+    Returns:
+        dict: {date: (price, booked, booking_id)}
+    """
+    if end_date <= start_date:
+        return {}
+
+    window_start, window_end = calendar_window()
+    booked = _booked_nights(listing.pk, start_date, end_date)
+
+    expected = {}
+    for night, price in resolve_nightly_prices(
+            listing, start_date, end_date):
+        booking_id = booked.get(night)
+        if booking_id is None and not window_start <= night < window_end:
+            continue
+        expected[night] = (price, booking_id is not None, booking_id)
+    return expected
+
+
+def refresh_calendar(listing, start_date, end_date):
+    """
+    Recompute the calendar rows of a listing for [start_date, end_date).
+
+    Uses a constant number of queries regardless of the range length.
+    Rows outside the materialized window that are no longer booked are
+    dropped.
+    """
+    if end_date <= start_date:
+        return
+
+    expected = _expected_days(listing, start_date, end_date)
+
+    ShortTermCalendarDay.objects.bulk_create(
+        [
+            ShortTermCalendarDay(
+                listing=listing,
+                date=night,
+                price=price,
+                booked=booked,
+                booking_id=booking_id,
+            )
+            for night, (price, booked, booking_id) in expected.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["listing", "date"],
+        update_fields=["price", "booked", "booking"],
+        batch_size=500,
+    )
+
+    # Everything inside the window was just written; outside it only
+    # booked nights are kept.
+    window_start, window_end = calendar_window()
+    ShortTermCalendarDay.objects.filter(
+        listing=listing,
+        date__gte=start_date,
+        date__lt=end_date,
+    ).exclude(
+        date__gte=window_start,
+        date__lt=window_end,
+    ).exclude(
+        date__in=[night for night, day in expected.items() if day[1]],
+    ).delete()
+
+
+def refresh_booking_calendar(booking):
+    """
+    Refresh every calendar date a booking occupies now or occupied
+    before its last change (dates, listing or status).
+
+    Returns:
+        dict: {listing_id: (first_date, last_date)} of the refreshed
+        ranges, last_date inclusive.
+    """
+    ranges = {}
+    if booking.check_in and booking.check_out:
+        ranges[booking.listing_id] = (
+            booking.check_in, booking.check_out - timedelta(days=1))
+
+    previous = ShortTermCalendarDay.objects.filter(
+        booking_id=booking.pk
+    ).values_list("listing_id", "date")
+    for listing_id, night in previous:
+        first, last = ranges.get(listing_id, (night, night))
+        ranges[listing_id] = (min(first, night), max(last, night))
+
+    listings = {booking.listing_id: booking.listing}
+    other_ids = [pk for pk in ranges if pk not in listings]
+    if other_ids:
+        listings.update(ShortTermListing.objects.in_bulk(other_ids))
+
+    for listing_id, (first, last) in ranges.items():
+        if listing_id in listings:
+            refresh_calendar(
+                listings[listing_id], first, last + timedelta(days=1))
+
+    return ranges
+
+
+def rebuild_listing_calendar(listing):
+    """
+    Drop and rebuild all calendar rows of a listing: the materialized
+    window plus every booked night.
+    """
+    window_start, window_end = calendar_window()
+    booked = _booked_nights(listing.pk)
+    start_date = min([window_start, *booked])
+    end_date = max([window_end, *(night + timedelta(days=1)
+                                  for night in booked)])
+
+    ShortTermCalendarDay.objects.filter(listing=listing).delete()
+    refresh_calendar(listing, start_date, end_date)
+
+
+def find_calendar_drift(listing):
+    """
+    Compare the stored calendar of a listing with freshly computed values.
+
+    Returns:
+        list: [(date, stored, expected), ...] where stored and expected
+        are (price, booked, booking_id) tuples or None if missing.
+    """
+    window_start, window_end = calendar_window()
+    stored = {
+        night: (price, booked, booking_id)
+        for night, price, booked, booking_id in
+        ShortTermCalendarDay.objects.filter(listing=listing).values_list(
+            "date", "price", "booked", "booking_id")
+    }
+    booked = _booked_nights(listing.pk)
+    dates = set(stored) | set(booked)
+    start_date = min([window_start, *dates])
+    end_date = max([window_end, *(night + timedelta(days=1)
+                                  for night in dates)])
+    expected = _expected_days(listing, start_date, end_date)
+
+    drift = []
+    for night in sorted(set(stored) | set(expected)):
+        if stored.get(night) != expected.get(night):
+            drift.append((night, stored.get(night), expected.get(night)))
+    return drift
+
+
+def get_calendar_days(listing, start_date, end_date):
+    """
+    Read [start_date, end_date) from the materialized calendar.
+
+    Returns:
+        list: [(date, price, booked), ...] ordered by date, or None when
+        the table does not cover every date of the range (e.g. the range
+        leaves the window or the calendar has not been built yet).
+    """
+    window_start, window_end = calendar_window()
+    if start_date < window_start or end_date > window_end:
+        return None
+
+    days = list(
+        ShortTermCalendarDay.objects.filter(
+            listing=listing,
+            date__gte=start_date,
+            date__lt=end_date,
+        ).order_by("date").values_list("date", "price", "booked")
+    )
+    if len(days) != (end_date - start_date).days:
+        return None
+    return days
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from listings.models import ShortTermListing
+from bookings.calendar import find_calendar_drift, rebuild_listing_calendar
+
+
+class Command(BaseCommand):
+    """
+    Compare the materialized calendar with freshly computed availability
+    and prices. Exits with an error if any listing has drifted, unless
+    --fix is given, in which case drifted listings are rebuilt.
+
+        python manage.py check_calendar
+        python manage.py check_calendar --fix
+    """
+    help = "Check the materialized calendar for inconsistencies"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--listing',
+            action='append',
+            type=int,
+            dest='listings',
+            help="Only check this listing id (repeatable)",
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help="Rebuild listings whose calendar has drifted",
+        )
+
+    def handle(self, *args, **options):
+        listings = ShortTermListing.objects.order_by('pk')
+        if options['listings']:
+            listings = listings.filter(pk__in=options['listings'])
+
+        drifted = 0
+        for listing in listings.iterator():
+            drift = find_calendar_drift(listing)
+            if not drift:
+                continue
+
+            drifted += 1
+            self.stdout.write(
+                f"Listing {listing.pk}: {len(drift)} date(s) differ"
+            )
+            for night, stored, expected in drift[:10]:
+                self.stdout.write(
+                    f"  {night}: stored={stored} expected={expected}"
+                )
+
+            if options['fix']:
+                rebuild_listing_calendar(listing)
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Calendar is consistent"))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt {drifted} drifted listing(s)"
+            ))
+        else:
+            raise CommandError(f"{drifted} listing(s) have drifted")
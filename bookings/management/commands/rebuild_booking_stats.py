@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from listings.models import ShortTermListing
+from bookings.statistics import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the daily booking statistics (ShortTermDailyStats) from
+    bookings and their nights. Migration 0021 builds the table and the
+    booking receivers keep it up to date; run this to repair it.
+
+        python manage.py rebuild_booking_stats
+        python manage.py rebuild_booking_stats --listing 3 --listing 7
+    """
+    help = "Rebuild the daily booking statistics"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--listing',
+            action='append',
+            type=int,
+            dest='listings',
+            help="Only rebuild this listing id (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        listings = ShortTermListing.objects.order_by('pk')
+        if options['listings']:
+            listings = listings.filter(pk__in=options['listings'])
+
+        count = 0
+        for listing in listings.iterator():
+            rebuild_daily_stats(listing)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt statistics for {count} listing(s)"
+        ))
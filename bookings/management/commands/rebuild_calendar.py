@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from listings.models import ShortTermListing
+from bookings.availability import rebuild_availability_bitmaps
+from bookings.calendar import rebuild_listing_calendar
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the materialized calendar (ShortTermCalendarDay) and the
+    availability bitmaps (ShortTermAvailabilityBitmap) from bookings,
+    price overrides, seasons and listing prices.
+
+    Run once after migrating, and daily so the rolling window keeps
+    moving forward:
+
+        python manage.py rebuild_calendar
+        python manage.py rebuild_calendar --listing 3 --listing 7
+    """
+    help = "Rebuild the materialized short-term listing calendar"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--listing',
+            action='append',
+            type=int,
+            dest='listings',
+            help="Only rebuild this listing id (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        listings = ShortTermListing.objects.order_by('pk')
+        if options['listings']:
+            listings = listings.filter(pk__in=options['listings'])
+
+        count = 0
+        for listing in listings.iterator():
+            rebuild_listing_calendar(listing)
+            rebuild_availability_bitmaps(listing)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt calendar for {count} listing(s)"
+        ))
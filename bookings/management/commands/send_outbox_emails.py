@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.outbox import send_outbox_emails
+
+
+class Command(BaseCommand):
+    """
+    Deliver pending emails from the outbox. Runs once by default, e.g.
+    from a scheduler, or keeps polling with --loop as a worker process.
+
+        python manage.py send_outbox_emails
+        python manage.py send_outbox_emails --loop --interval 10
+    """
+    help = "Send pending emails from the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help="Emails sent per batch (default 50)",
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help="Keep polling for new emails",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help="Seconds to wait between polls with --loop (default 5)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # Drain everything that is due before sleeping
+            while True:
+                sent, failed = send_outbox_emails(options['batch_size'])
+                if sent or failed:
+                    self.stdout.write(
+                        f"Sent {sent} email(s), {failed} failed"
+                    )
+                if sent + failed < options['batch_size']:
+                    break
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
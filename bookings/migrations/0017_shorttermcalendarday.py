@@ -0,0 +1,108 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:59
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+
+
+# Frozen copy of bookings.calendar.CALENDAR_HORIZON_DAYS
+CALENDAR_HORIZON_DAYS = 730
+
+
+def nightly_price(listing, night, overrides, seasons):
+    """
+    Price of one night: override, then the earliest season covering it,
+    then the listing's price (bookings.utils.resolve_nightly_prices).
+    """
+    if night in overrides:
+        return Decimal(overrides[night])
+    for start_date, end_date, price in seasons:
+        if start_date <= night < end_date:
+            return Decimal(price)
+    return Decimal(listing.price) if listing.price is not None else None
+
+
+def build_calendar(apps, schema_editor):
+    """
+    Materialize the calendar of every short-term listing from its
+    current bookings and prices: the window starting today plus every
+    booked night, as `manage.py rebuild_calendar` does.
+    """
+    ShortTermListing = apps.get_model("listings", "ShortTermListing")
+    ShortTermPriceOverride = apps.get_model(
+        "listings", "ShortTermPriceOverride")
+    ShortTermSeasonalPrice = apps.get_model(
+        "listings", "ShortTermSeasonalPrice")
+    ShortTermBookingNight = apps.get_model(
+        "bookings", "ShortTermBookingNight")
+    ShortTermCalendarDay = apps.get_model("bookings", "ShortTermCalendarDay")
+
+    window_start = timezone.localdate()
+    window = [window_start + timedelta(days=offset)
+              for offset in range(CALENDAR_HORIZON_DAYS)]
+
+    for listing in ShortTermListing.objects.all():
+        booked = dict(
+            ShortTermBookingNight.objects.filter(
+                booking__listing_id=listing.pk
+            ).exclude(
+                booking__status='cancelled'
+            ).values_list("date", "booking_id")
+        )
+        overrides = dict(
+            ShortTermPriceOverride.objects.filter(
+                listing_id=listing.pk).values_list("date", "price")
+        )
+        seasons = list(
+            ShortTermSeasonalPrice.objects.filter(
+                listing_id=listing.pk
+            ).order_by("start_date", "pk").values_list(
+                "start_date", "end_date", "price")
+        )
+
+        ShortTermCalendarDay.objects.bulk_create(
+            [
+                ShortTermCalendarDay(
+                    listing_id=listing.pk,
+                    date=night,
+                    price=nightly_price(listing, night, overrides, seasons),
+                    booked=night in booked,
+                    booking_id=booked.get(night),
+                )
+                for night in sorted(set(window) | set(booked))
+            ],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0066_alter_listingfile_file_and_more'),
+        ('bookings', '0016_alter_shorttermbooking_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShortTermCalendarDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('booked', models.BooleanField(default=False)),
+                ('booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='bookings.shorttermbooking')),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_days', to='listings.shorttermlisting')),
+            ],
+            options={
+                'verbose_name': 'Calendar Day',
+                'verbose_name_plural': 'Calendar Days',
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['booked', 'date'], name='bookings_sh_booked_6e33c2_idx')],
+                'unique_together': {('listing', 'date')},
+            },
+        ),
+        migrations.RunPython(build_calendar, migrations.RunPython.noop),
+    ]
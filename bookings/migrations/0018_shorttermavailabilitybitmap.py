@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Frozen copy of bookings.availability.BITMAP_BYTES
+BITMAP_BYTES = 46
+
+
+def build_bitmaps(apps, schema_editor):
+    """
+    Set the bit of every night booked by a booking that is not
+    cancelled, as `manage.py rebuild_calendar` does.
+    """
+    ShortTermBookingNight = apps.get_model(
+        "bookings", "ShortTermBookingNight")
+    ShortTermAvailabilityBitmap = apps.get_model(
+        "bookings", "ShortTermAvailabilityBitmap")
+
+    bitmaps = {}
+    nights = ShortTermBookingNight.objects.exclude(
+        booking__status='cancelled'
+    ).values_list("booking__listing_id", "date")
+    for listing_id, night in nights.iterator():
+        key = (listing_id, night.year)
+        bitmaps[key] = (
+            bitmaps.get(key, 0) | 1 << (night.timetuple().tm_yday - 1))
+
+    ShortTermAvailabilityBitmap.objects.bulk_create(
+        [
+            ShortTermAvailabilityBitmap(
+                listing_id=listing_id,
+                year=year,
+                booked=bits.to_bytes(BITMAP_BYTES, "little"),
+            )
+            for (listing_id, year), bits in bitmaps.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0066_alter_listingfile_file_and_more'),
+        ('bookings', '0017_shorttermcalendarday'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShortTermAvailabilityBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('booked', models.BinaryField(max_length=46)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_bitmaps', to='listings.shorttermlisting')),
+            ],
+            options={
+                'verbose_name': 'Availability Bitmap',
+                'verbose_name_plural': 'Availability Bitmaps',
+                'indexes': [models.Index(fields=['year'], name='bookings_sh_year_319880_idx')],
+                'unique_together': {('listing', 'year')},
+            },
+        ),
+        migrations.RunPython(build_bitmaps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+CONSTRAINT_NAME = "bookings_no_overlapping_stays"
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    """
+    Reject overlapping stays of the same listing at the database level.
+    PostgreSQL only; other engines rely on the per-listing row lock taken
+    by ShortTermBookingSerializer.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    schema_editor.execute(
+        f"ALTER TABLE bookings_shorttermbooking "
+        f"ADD CONSTRAINT {CONSTRAINT_NAME} EXCLUDE USING gist ("
+        f"listing_id WITH =, "
+        f"daterange(check_in, check_out) WITH &&"
+        f") WHERE (status <> 'cancelled')"
+    )
+
+
+def remove_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"ALTER TABLE bookings_shorttermbooking "
+        f"DROP CONSTRAINT IF EXISTS {CONSTRAINT_NAME}"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0018_shorttermavailabilitybitmap'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            add_exclusion_constraint, remove_exclusion_constraint),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:12
+
+from decimal import ROUND_FLOOR, Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Frozen copy of bookings.statistics.CENT
+CENT = Decimal('0.01')
+
+
+def split_amount(amount, weights):
+    """
+    Split an amount in cents proportionally to weights, largest
+    remainder first (bookings.statistics.split_amount).
+    """
+    amount = Decimal(amount or 0).quantize(CENT)
+    total_weight = sum(weights)
+    if not total_weight:
+        weights = [1] * len(weights)
+        total_weight = len(weights)
+
+    exact = [amount * weight / total_weight for weight in weights]
+    parts = [part.quantize(CENT, rounding=ROUND_FLOOR) for part in exact]
+    remainder = int((amount - sum(parts)) / CENT)
+    by_remainder = sorted(
+        range(len(parts)), key=lambda index: parts[index] - exact[index])
+    for index in by_remainder[:remainder]:
+        parts[index] += CENT
+    return parts
+
+
+def build_daily_stats(apps, schema_editor):
+    """
+    Build the daily statistics of every booking that is not cancelled,
+    as `manage.py rebuild_booking_stats` does.
+    """
+    ShortTermBookingNight = apps.get_model(
+        "bookings", "ShortTermBookingNight")
+    ShortTermDailyStats = apps.get_model("bookings", "ShortTermDailyStats")
+
+    nights = ShortTermBookingNight.objects.exclude(
+        booking__status='cancelled'
+    ).order_by('booking_id', 'date').values_list(
+        'booking_id',
+        'booking__listing_id',
+        'date',
+        'price',
+        'booking__total_price',
+        'booking__discount_amount',
+    )
+
+    stays = {}
+    for booking_id, listing_id, night, price, total, discount in (
+            nights.iterator()):
+        stays.setdefault(
+            booking_id, (listing_id, total, discount, []))[3].append(
+                (night, price))
+
+    rows = {}
+    for listing_id, total, discount, stay in stays.values():
+        weights = [price for _, price in stay]
+        revenues = split_amount(total, weights)
+        discounts = split_amount(discount, weights)
+        for (night, _), revenue, night_discount in zip(
+                stay, revenues, discounts):
+            row = rows.get((listing_id, night))
+            if row is None:
+                row = rows[listing_id, night] = ShortTermDailyStats(
+                    listing_id=listing_id, date=night)
+            row.nights_sold += 1
+            row.revenue += revenue
+            row.discounts += night_discount
+
+    ShortTermDailyStats.objects.bulk_create(rows.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0067_shorttermlisting_pricing_version'),
+        ('bookings', '0020_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShortTermDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('nights_sold', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('discounts', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='listings.shorttermlisting')),
+            ],
+            options={
+                'verbose_name': 'Daily Statistics',
+                'verbose_name_plural': 'Daily Statistics',
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['date'], name='bookings_sh_date_f7d4d1_idx')],
+                'unique_together': {('listing', 'date')},
+            },
+        ),
+        migrations.RunPython(build_daily_stats, migrations.RunPython.noop),
+    ]
@@ -6,9 +6,19 @@ from phonenumber_field.modelfields import PhoneNumberField
 from django.core.exceptions import ValidationError
 from decimal import Decimal
 from django.utils import timezone
+from django.dispatch import Signal
 from .utils import calculate_booking_price
 
 
+# PostgreSQL exclusion constraint rejecting overlapping stays of the same
+# listing (see migration 0019)
+BOOKING_OVERLAP_CONSTRAINT = 'bookings_no_overlapping_stays'
+
+# Sent after the nights of a new booking have been bulk created.
+# bulk_create() does not send post_save for the individual nights.
+booking_nights_created = Signal()
+
+
 def generate_booking_reference():
     return str(uuid.uuid4()).replace('-', '').upper()[:8]
 
@@ -369,8 +379,18 @@ class ShortTermBooking(models.Model):
                     )
 
         # Prevent overlaps (excluding cancelled bookings)
+        if self.overlapping_bookings().exists():
+            raise ValidationError(
+                "This listing is already booked for the selected dates."
+            )
+
+    def overlapping_bookings(self):
+        """
+        Other bookings of the listing, not cancelled, that share at least
+        one night with this one.
+        """
         overlapping = ShortTermBooking.objects.filter(
-            listing=self.listing,
+            listing_id=self.listing_id,
             check_in__lt=self.check_out,
             check_out__gt=self.check_in,
         ).exclude(status='cancelled')
@@ -378,10 +398,7 @@ class ShortTermBooking(models.Model):
         if self.pk:
             overlapping = overlapping.exclude(pk=self.pk)
 
-        if overlapping.exists():
-            raise ValidationError(
-                "This listing is already booked for the selected dates."
-            )
+        return overlapping
 
     def save(self, *args, **kwargs):
         """
@@ -399,8 +416,9 @@ class ShortTermBooking(models.Model):
         elif self.status in ['pending', 'cancelled']:
             self.admin_confirmed = False
 
-        # Calculate prices on creation
-        if creating:
+        # Calculate prices on creation, unless the caller already priced
+        # the stay and set _nights_data (see ShortTermBookingSerializer)
+        if creating and getattr(self, '_nights_data', None) is None:
             if self.listing and self.check_in and self.check_out:
                 price_data = calculate_booking_price(
                     self.listing,
@@ -422,7 +440,10 @@ class ShortTermBooking(models.Model):
                 self._nights_data = price_data.get('breakdown', [])
 
         # If dates changed on pending booking, recalculate
-        elif self.status == 'pending' and not self.has_discount:
+        elif (
+            not creating and
+            self.status == 'pending' and not self.has_discount
+        ):
             old = ShortTermBooking.objects.get(pk=self.pk)
             if (
                 old.check_in != self.check_in or
@@ -458,6 +479,8 @@ class ShortTermBooking(models.Model):
                 )
                 for date, price in self._nights_data
             ])
+            booking_nights_created.send(
+                sender=self.__class__, booking=self)
 
     def __str__(self):
         return (
@@ -494,3 +517,138 @@ class ShortTermBookingNight(models.Model):
 
     def __str__(self):
         return f"{self.booking.reference_number} – {self.date} – €{self.price}"
+
+
+class ShortTermCalendarDay(models.Model):
+    """
+    Materialized price and availability of a short-term listing on one
+    date. Kept up to date by the receivers in bookings/signals.py; see
+    bookings/calendar.py. Never edit by hand.
+    """
+    listing = models.ForeignKey(
+        ShortTermListing,
+        on_delete=models.CASCADE,
+        related_name="calendar_days",
+    )
+    date = models.DateField()
+    price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True)
+    booked = models.BooleanField(default=False)
+    booking = models.ForeignKey(
+        ShortTermBooking,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+
+    class Meta:
+        ordering = ["date"]
+        unique_together = ("listing", "date")
+        indexes = [
+            models.Index(fields=["booked", "date"]),
+        ]
+        verbose_name = 'Calendar Day'
+        verbose_name_plural = 'Calendar Days'
+
+    def __str__(self):
+        state = "booked" if self.booked else "free"
+        return f"{self.listing_id} – {self.date} – {state}"
+
+
+class ShortTermAvailabilityBitmap(models.Model):
+    """
+    Booked nights of a short-term listing in one year, one bit per night
+    (bit 0 is January 1st). See bookings/availability.py.
+    """
+    listing = models.ForeignKey(
+        ShortTermListing,
+        on_delete=models.CASCADE,
+        related_name="availability_bitmaps",
+    )
+    year = models.PositiveSmallIntegerField()
+    booked = models.BinaryField(max_length=46)
+
+    class Meta:
+        unique_together = ("listing", "year")
+        indexes = [
+            models.Index(fields=["year"]),
+        ]
+        verbose_name = 'Availability Bitmap'
+        verbose_name_plural = 'Availability Bitmaps'
+
+    def __str__(self):
+        return f"{self.listing_id} – {self.year}"
+
+
+class ShortTermDailyStats(models.Model):
+    """
+    Nights sold, revenue and discounts of a short-term listing on one
+    date, from bookings that are not cancelled. A booking's total price
+    and discount are spread over its nights in proportion to the nightly
+    prices. Refreshed by the booking receivers in bookings/signals.py;
+    see bookings/statistics.py.
+    """
+    listing = models.ForeignKey(
+        ShortTermListing,
+        on_delete=models.CASCADE,
+        related_name="daily_stats",
+    )
+    date = models.DateField()
+    nights_sold = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    discounts = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        ordering = ["date"]
+        unique_together = ("listing", "date")
+        indexes = [
+            models.Index(fields=["date"]),
+        ]
+        verbose_name = 'Daily Statistics'
+        verbose_name_plural = 'Daily Statistics'
+
+    def __str__(self):
+        return f"{self.listing_id} – {self.date} – {self.nights_sold}"
+
+
+class OutboxEmail(models.Model):
+    """
+    Email waiting to be delivered. Written by the booking receivers in
+    the same transaction as the booking and sent by
+    `manage.py send_outbox_emails`; see bookings/outbox.py.
+    """
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    html_content = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.JSONField(default=list, help_text="List of recipients")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending'
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+        verbose_name = 'Outbox Email'
+        verbose_name_plural = 'Outbox Emails'
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.to)} ({self.status})"
@@ -0,0 +1,118 @@
+"""
+Transactional email outbox.
+
+Receivers call enqueue_email() instead of talking to the SMTP server, so
+the email row is committed (or rolled back) together with the booking
+and requests never wait on SMTP. `manage.py send_outbox_emails` calls
+send_outbox_emails() to deliver pending emails over a single connection,
+retrying failures with exponential backoff.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+# Attempts before an email is marked as failed
+MAX_ATTEMPTS = 6
+
+# Delay before the first retry, doubled after every failed attempt
+RETRY_BASE_DELAY = timedelta(minutes=1)
+
+
+def enqueue_email(subject, html_content, to, from_email=None):
+    """
+    Store an HTML email for delivery by the outbox worker.
+    Empty addresses (e.g. an unset SERVER_EMAIL) are dropped; nothing is
+    stored when no recipient is left.
+    """
+    to = [address for address in to if address]
+    if not to:
+        return None
+    return OutboxEmail.objects.create(
+        subject=subject,
+        html_content=html_content,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL or '',
+        to=to,
+    )
+
+
+def _retry_delay(attempts):
+    return RETRY_BASE_DELAY * 2 ** (attempts - 1)
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def send_outbox_emails(batch_size=50, connection=None):
+    """
+    Deliver pending emails that are due, oldest first.
+
+    Rows are locked while they are sent (skipped by other workers on
+    databases that support it), and every email reuses one connection.
+
+    Returns:
+        tuple: (sent, failed) counts for this batch.
+    """
+    connection = connection or get_connection()
+    sent = failed = 0
+
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at', 'pk')[:batch_size]
+        )
+        if not emails:
+            return sent, failed
+
+        try:
+            for email in emails:
+                message = EmailMultiAlternatives(
+                    email.subject,
+                    email.html_content,
+                    email.from_email or None,
+                    email.to,
+                    connection=connection,
+                )
+                message.attach_alternative(email.html_content, "text/html")
+
+                email.attempts += 1
+                try:
+                    # Opened once and kept open: send() only closes
+                    # connections it opened itself
+                    connection.open()
+                    message.send()
+                except Exception as e:
+                    failed += 1
+                    email.last_error = f"{type(e).__name__}: {e}"
+                    if email.attempts >= MAX_ATTEMPTS:
+                        email.status = 'failed'
+                    else:
+                        email.next_attempt_at = (
+                            timezone.now() + _retry_delay(email.attempts))
+                    # Start over with a fresh connection
+                    _close_quietly(connection)
+                else:
+                    sent += 1
+                    email.status = 'sent'
+                    email.sent_at = timezone.now()
+                    email.last_error = ''
+        finally:
+            _close_quietly(connection)
+
+        OutboxEmail.objects.bulk_update(
+            emails,
+            ['status', 'attempts', 'next_attempt_at', 'last_error',
+             'sent_at'],
+        )
+
+    return sent, failed
@@ -0,0 +1,86 @@
+"""
+Signed price quotes.
+
+A quote prices a stay once and returns the nightly breakdown together
+with a signed, short-lived token. Booking creation accepts the token and
+persists the quoted nights instead of pricing the stay again.
+
+Tokens carry the listing's pricing_version. The receivers in
+bookings/signals.py bump it whenever the listing's prices, taxes,
+overrides or seasons change, which makes older tokens stale; a stale,
+expired or tampered token simply falls back to full recomputation.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.core import signing
+from django.db.models import F
+
+from listings.models import ShortTermListing
+from .utils import calculate_booking_price, price_totals
+
+
+QUOTE_SALT = "bookings.quote"
+
+# Seconds a quote token stays valid
+QUOTE_MAX_AGE = 15 * 60
+
+
+def bump_pricing_version(listing_id):
+    """Invalidate every outstanding quote of a listing"""
+    ShortTermListing.objects.filter(pk=listing_id).update(
+        pricing_version=F("pricing_version") + 1)
+
+
+def create_quote(listing, check_in, check_out):
+    """
+    Price a stay and sign the result.
+
+    Returns:
+        tuple: (token, price_data) where price_data is the dict returned
+        by calculate_booking_price.
+    """
+    price_data = calculate_booking_price(listing, check_in, check_out)
+    payload = {
+        "listing": listing.pk,
+        "check_in": check_in.isoformat(),
+        "check_out": check_out.isoformat(),
+        "version": listing.pricing_version,
+        "nights": [
+            [night.isoformat(), str(price)]
+            for night, price in price_data["breakdown"]
+        ],
+    }
+    token = signing.dumps(payload, salt=QUOTE_SALT, compress=True)
+    return token, price_data
+
+
+def load_quote(token, listing, check_in, check_out):
+    """
+    Return the price data of a quote token without querying prices.
+
+    Returns:
+        dict: same shape as calculate_booking_price, or None when the
+        token is invalid, expired, issued for another stay or priced with
+        an older pricing version.
+    """
+    try:
+        payload = signing.loads(
+            token, salt=QUOTE_SALT, max_age=QUOTE_MAX_AGE)
+    except signing.BadSignature:
+        # SignatureExpired is a subclass
+        return None
+
+    if (
+        payload.get("listing") != listing.pk or
+        payload.get("check_in") != check_in.isoformat() or
+        payload.get("check_out") != check_out.isoformat() or
+        payload.get("version") != listing.pricing_version
+    ):
+        return None
+
+    nights = [
+        (date.fromisoformat(night), Decimal(price))
+        for night, price in payload["nights"]
+    ]
+    return price_totals(listing, nights)
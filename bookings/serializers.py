@@ -1,9 +1,19 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from .models import ShortTermBooking
-from bookings.utils import calculate_booking_price
+from listings.models import ShortTermListing
+from .models import ShortTermBooking, BOOKING_OVERLAP_CONSTRAINT
+from bookings.utils import calculate_booking_price, MAX_STAY_NIGHTS
+from bookings.quotes import load_quote
 from decimal import Decimal
 
 
+DATES_BOOKED_ERROR = {
+    "check_in": "These dates are already booked.",
+    "check_out": "These dates are already booked."
+}
+
+
 class ShortTermBookingSerializer(serializers.ModelSerializer):
     """
     Serializer for ShortTermBooking with full discount support.
@@ -64,6 +74,10 @@ class ShortTermBookingSerializer(serializers.ModelSerializer):
     status_display = serializers.CharField(
         source='get_status_display', read_only=True)
 
+    # Token from the quote endpoint, reused instead of repricing the stay
+    quote_token = serializers.CharField(
+        write_only=True, required=False, allow_blank=True)
+
     class Meta:
         model = ShortTermBooking
         fields = [
@@ -85,6 +99,7 @@ class ShortTermBookingSerializer(serializers.ModelSerializer):
             'children',
             'message',
             'language',
+            'quote_token',
 
             # Status
             'status',
@@ -174,21 +189,8 @@ class ShortTermBookingSerializer(serializers.ModelSerializer):
                 "check_out": "Check-out must be after check-in."
             })
 
-        # Check for overlapping bookings (exclude cancelled)
-        overlapping = ShortTermBooking.objects.filter(
-            listing=listing,
-            check_in__lt=check_out,
-            check_out__gt=check_in
-        ).exclude(status='cancelled')
-
-        if self.instance:
-            overlapping = overlapping.exclude(id=self.instance.id)
-
-        if overlapping.exists():
-            raise serializers.ValidationError({
-                "check_in": "These dates are already booked.",
-                "check_out": "These dates are already booked."
-            })
+        # Overlapping bookings are checked in create()/update(), once,
+        # under the listing lock
 
         # Validate guest counts
         if total_guests < 1:
@@ -244,34 +246,61 @@ class ShortTermBookingSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         """
         Create booking with automatic price calculation.
+
+        A valid quote token supplies the nightly prices; otherwise (no
+        token, or a stale one) the stay is priced here. Either way the
+        model's save() reuses these prices instead of pricing again.
         """
-        listing = validated_data['listing']
         check_in = validated_data['check_in']
         check_out = validated_data['check_out']
+        quote_token = validated_data.pop('quote_token', None)
+
+        with transaction.atomic():
+            listing = self._lock_listing(validated_data['listing'])
+            validated_data['listing'] = listing
 
-        # Calculate all pricing components
-        price_data = calculate_booking_price(listing, check_in, check_out)
+            # Calculate all pricing components
+            price_data = None
+            if quote_token:
+                price_data = load_quote(
+                    quote_token, listing, check_in, check_out)
+            if price_data is None:
+                price_data = self._price(listing, check_in, check_out)
+
+            # Add calculated values to validated data
+            validated_data['total_nights'] = price_data['nights']
+            validated_data['subtotal'] = price_data['subtotal']
+            validated_data['vat'] = price_data['vat']
+            validated_data['municipality_tax'] = price_data[
+                'municipality_tax']
+            validated_data['climate_crisis_fee'] = price_data[
+                'climate_crisis_fee']
+            validated_data['cleaning_fee'] = price_data['cleaning_fee']
+            validated_data['service_fee'] = price_data['service_fee']
+            validated_data['total_price'] = price_data['total']
 
-        # Add calculated values to validated data
-        validated_data['total_nights'] = price_data['nights']
-        validated_data['subtotal'] = price_data['subtotal']
-        validated_data['vat'] = price_data['vat']
-        validated_data['municipality_tax'] = price_data['municipality_tax']
-        validated_data['climate_crisis_fee'] = price_data['climate_crisis_fee']
-        validated_data['cleaning_fee'] = price_data['cleaning_fee']
-        validated_data['service_fee'] = price_data['service_fee']
-        validated_data['total_price'] = price_data['total']
+            # Default status
+            if 'status' not in validated_data:
+                validated_data['status'] = 'pending'
 
-        # Default status
-        if 'status' not in validated_data:
-            validated_data['status'] = 'pending'
+            booking = ShortTermBooking(**validated_data)
+            booking._nights_data = price_data['breakdown']
+            self._check_overlap(booking)
+            try:
+                booking.save()
+            except IntegrityError as exc:
+                self._raise_if_overlap(exc)
+                raise
 
-        return super().create(validated_data)
+        return booking
 
     def update(self, instance, validated_data):
         """
         Update booking with price recalculation if dates changed.
         """
+        # Quotes only apply to new bookings
+        validated_data.pop('quote_token', None)
+
         # Check if dates changed
         dates_changed = (
             'check_in' in validated_data and
@@ -292,7 +321,7 @@ class ShortTermBookingSerializer(serializers.ModelSerializer):
             check_in = validated_data.get('check_in', instance.check_in)
             check_out = validated_data.get('check_out', instance.check_out)
 
-            price_data = calculate_booking_price(listing, check_in, check_out)
+            price_data = self._price(listing, check_in, check_out)
 
             validated_data['total_nights'] = price_data['nights']
             validated_data['subtotal'] = price_data['subtotal']
@@ -304,7 +333,54 @@ class ShortTermBookingSerializer(serializers.ModelSerializer):
             validated_data['service_fee'] = price_data['service_fee']
             validated_data['total_price'] = price_data['total']
 
-        return super().update(instance, validated_data)
+        with transaction.atomic():
+            listing = self._lock_listing(
+                validated_data.get('listing', instance.listing))
+            self._check_overlap(ShortTermBooking(
+                pk=instance.pk,
+                listing=listing,
+                check_in=validated_data.get('check_in', instance.check_in),
+                check_out=validated_data.get('check_out', instance.check_out),
+                status=validated_data.get('status', instance.status),
+            ))
+            try:
+                return super().update(instance, validated_data)
+            except IntegrityError as exc:
+                self._raise_if_overlap(exc)
+                raise
+
+    def _price(self, listing, check_in, check_out):
+        """calculate_booking_price, with unpriced nights as a 400"""
+        try:
+            return calculate_booking_price(listing, check_in, check_out)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({"check_in": exc.messages})
+
+    def _lock_listing(self, listing):
+        """
+        Lock the listing row until the end of the transaction.
+
+        Concurrent reservations of the same listing queue here, so the
+        overlap check that follows sees every committed booking. Returns
+        the freshly loaded listing.
+        """
+        return ShortTermListing.objects.select_for_update().get(
+            pk=listing.pk)
+
+    def _check_overlap(self, booking):
+        """Reject a booking sharing nights with another booking"""
+        if booking.status == 'cancelled':
+            return
+        if booking.overlapping_bookings().exists():
+            raise serializers.ValidationError(DATES_BOOKED_ERROR)
+
+    def _raise_if_overlap(self, exc):
+        """
+        Turn a violation of the PostgreSQL exclusion constraint into the
+        same error as _check_overlap.
+        """
+        if BOOKING_OVERLAP_CONSTRAINT in str(exc):
+            raise serializers.ValidationError(DATES_BOOKED_ERROR)
 
     def to_representation(self, instance):
         """
@@ -326,6 +402,31 @@ class ShortTermBookingSerializer(serializers.ModelSerializer):
         return data
 
 
+class ShortTermBookingQuoteSerializer(serializers.Serializer):
+    """
+    Validates a price quote request. Used by the public quote endpoint.
+    """
+
+    listing = serializers.PrimaryKeyRelatedField(
+        queryset=ShortTermListing.objects.all()
+    )
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+
+    def validate(self, data):
+        """Validate dates"""
+        if data['check_out'] <= data['check_in']:
+            raise serializers.ValidationError({
+                "check_out": "Check-out must be after check-in."
+            })
+        if (data['check_out'] - data['check_in']).days > MAX_STAY_NIGHTS:
+            raise serializers.ValidationError({
+                "check_out": f"The stay cannot exceed {MAX_STAY_NIGHTS} "
+                             f"nights."
+            })
+        return data
+
+
 class ShortTermBookingDiscountSerializer(serializers.Serializer):
     """
     Serializer for applying/removing discounts to bookings.
@@ -379,3 +480,37 @@ class ShortTermBookingStatusSerializer(serializers.Serializer):
         # Could add logic here to prevent invalid transitions
         # e.g., cannot go from completed to pending
         return value
+
+
+class BookingStatisticsQuerySerializer(serializers.Serializer):
+    """
+    Validates the time series parameters of the statistics endpoint.
+    Used by admin-only endpoints.
+    """
+
+    # Longest daily series returned in one response
+    MAX_DAYS = 731
+
+    start = serializers.DateField()
+    end = serializers.DateField()
+    granularity = serializers.ChoiceField(
+        choices=['day', 'month'],
+        default='day'
+    )
+    listing = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, data):
+        """Validate the date range"""
+        days = (data['end'] - data['start']).days
+        if days <= 0:
+            raise serializers.ValidationError({
+                "end": "End must be after start."
+            })
+        if data['granularity'] == 'day' and days > self.MAX_DAYS:
+            raise serializers.ValidationError({
+                "end": (
+                    f"Daily series cannot exceed {self.MAX_DAYS} days; "
+                    f"use granularity=month."
+                )
+            })
+        return data
@@ -1,9 +1,31 @@
-from django.db.models.signals import post_save
+from datetime import timedelta
+from django.db.models import Min, Max
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
-from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.conf import settings
-from bookings.models import ShortTermBooking
+from listings.models import (
+    ShortTermListing,
+    ShortTermPriceOverride,
+    ShortTermSeasonalPrice,
+)
+from bookings.models import (
+    ShortTermBooking,
+    ShortTermBookingNight,
+    ShortTermCalendarDay,
+    booking_nights_created,
+)
+from bookings.availability import refresh_availability_bitmaps
+from bookings.outbox import enqueue_email
+from bookings.quotes import bump_pricing_version
+from bookings.statistics import refresh_daily_stats
+from bookings.calendar import (
+    calendar_window,
+    refresh_calendar,
+    refresh_booking_calendar,
+)
+from listings.signals import touch_listings
+from re_drf_api.cache import bump_cache_version
 
 
 @receiver(post_save, sender=ShortTermBooking)
@@ -69,19 +91,8 @@ def send_booking_confirmation_email(sender, instance, created, **kwargs):
 
     html_content = render_to_string(html_template, context)
 
-    email = EmailMultiAlternatives(
-        subject,
-        html_content,
-        settings.DEFAULT_FROM_EMAIL,
-        [instance.email]
-    )
-    email.attach_alternative(html_content, "text/html")
-
-    try:
-        email.send()
-    except Exception as e:
-        # Log error but don't block booking creation
-        print(f"Error sending booking confirmation email: {e}")
+    # Delivered by `manage.py send_outbox_emails`
+    enqueue_email(subject, html_content, [instance.email])
 
 
 @receiver(post_save, sender=ShortTermBooking)
@@ -153,19 +164,8 @@ def notify_guest_when_admin_confirms(sender, instance, created, **kwargs):
 
     html_content = render_to_string(html_template, context)
 
-    email = EmailMultiAlternatives(
-        subject,
-        html_content,
-        settings.DEFAULT_FROM_EMAIL,
-        [instance.email]
-    )
-    email.attach_alternative(html_content, "text/html")
-
-    try:
-        email.send()
-    except Exception as e:
-        # Log error but don't block booking update
-        print(f"Error sending booking confirmation email: {e}")
+    # Delivered by `manage.py send_outbox_emails`
+    enqueue_email(subject, html_content, [instance.email])
 
 
 @receiver(post_save, sender=ShortTermBooking)
@@ -235,16 +235,217 @@ def notify_admin_of_new_booking(sender, instance, created, **kwargs):
 
     html_content = render_to_string(html_template, context)
 
-    email = EmailMultiAlternatives(
-        subject,
-        html_content,
-        settings.DEFAULT_FROM_EMAIL,
-        [settings.SERVER_EMAIL]
+    # Delivered by `manage.py send_outbox_emails`
+    enqueue_email(subject, html_content, [settings.SERVER_EMAIL])
+
+
+# ============================================================================
+# MATERIALIZED CALENDAR, AVAILABILITY BITMAPS AND DAILY STATISTICS
+# (see bookings/calendar.py, bookings/availability.py and
+# bookings/statistics.py)
+# ============================================================================
+
+def _deleting_listing(origin):
+    """
+    True when a delete cascades from a ShortTermListing. The listing's
+    calendar rows are deleted with it, so nothing must be re-inserted.
+    """
+    return getattr(origin, 'model', type(origin)) is ShortTermListing
+
+
+def _pricing_range(instance):
+    """Dates [start, end) affected by a price override or season"""
+    if isinstance(instance, ShortTermPriceOverride):
+        return instance.date, instance.date + timedelta(days=1)
+    return instance.start_date, instance.end_date
+
+
+def _refresh_booking_availability(booking):
+    """
+    Refresh the calendar, bitmaps and daily statistics of every date a
+    booking touches
+    """
+    ranges = refresh_booking_calendar(booking)
+    for listing_id, (first, last) in ranges.items():
+        refresh_availability_bitmaps(
+            listing_id, first, last + timedelta(days=1))
+        refresh_daily_stats(listing_id, first, last + timedelta(days=1))
+
+
+@receiver(booking_nights_created, sender=ShortTermBooking)
+def add_new_booking_to_calendar(sender, booking, **kwargs):
+    """Mark the nights of a new booking as booked"""
+    _refresh_booking_availability(booking)
+
+
+@receiver(post_save, sender=ShortTermBooking)
+def refresh_calendar_on_booking_change(sender, instance, created, **kwargs):
+    """Status, date or listing changes free or occupy nights"""
+    if created:
+        # Nights do not exist yet, see booking_nights_created
+        return
+    _refresh_booking_availability(instance)
+
+
+@receiver(post_delete, sender=ShortTermBooking)
+def free_calendar_on_booking_delete(sender, instance, origin=None,
+                                    **kwargs):
+    """
+    Free the nights of a deleted booking. Calendar rows are only updated
+    or deleted here, never inserted, so this is safe inside a listing
+    cascade.
+    """
+    if not _deleting_listing(origin):
+        refresh_availability_bitmaps(
+            instance.listing_id, instance.check_in, instance.check_out)
+        refresh_daily_stats(
+            instance.listing_id, instance.check_in, instance.check_out)
+
+    window_start, window_end = calendar_window()
+    freed = ShortTermCalendarDay.objects.filter(
+        listing_id=instance.listing_id,
+        date__gte=instance.check_in,
+        date__lt=instance.check_out,
+        booking__isnull=True,
     )
-    email.attach_alternative(html_content, "text/html")
+    freed.filter(
+        date__gte=window_start, date__lt=window_end
+    ).update(booked=False)
+    freed.exclude(
+        date__gte=window_start, date__lt=window_end
+    ).delete()
+
+
+@receiver(post_save, sender=ShortTermBookingNight)
+def refresh_calendar_on_night_save(sender, instance, created, **kwargs):
+    """Nights created one by one (bulk creation sends no post_save)"""
+    booking = instance.booking
+    refresh_calendar(
+        booking.listing, instance.date, instance.date + timedelta(days=1))
+    refresh_availability_bitmaps(
+        booking.listing_id, instance.date, instance.date + timedelta(days=1))
+    refresh_daily_stats(
+        booking.listing_id, instance.date, instance.date + timedelta(days=1))
+
+
+@receiver(pre_save, sender=ShortTermPriceOverride)
+@receiver(pre_save, sender=ShortTermSeasonalPrice)
+def remember_previous_pricing_range(sender, instance, **kwargs):
+    """Keep the old dates so moving an override/season reprices them"""
+    instance._calendar_previous = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).first()
+        if previous:
+            instance._calendar_previous = (
+                previous.listing_id, *_pricing_range(previous))
+
+
+@receiver(post_save, sender=ShortTermPriceOverride)
+@receiver(post_save, sender=ShortTermSeasonalPrice)
+def refresh_calendar_on_pricing_save(sender, instance, **kwargs):
+    """Reprice the dates covered by an override or season"""
+    previous = getattr(instance, '_calendar_previous', None)
+    if previous:
+        listing_id, start_date, end_date = previous
+        if listing_id == instance.listing_id:
+            refresh_calendar(instance.listing, start_date, end_date)
+        else:
+            bump_pricing_version(listing_id)
+            listing = ShortTermListing.objects.filter(pk=listing_id).first()
+            if listing:
+                refresh_calendar(listing, start_date, end_date)
+
+    bump_pricing_version(instance.listing_id)
+    refresh_calendar(instance.listing, *_pricing_range(instance))
+
+
+@receiver(post_delete, sender=ShortTermPriceOverride)
+@receiver(post_delete, sender=ShortTermSeasonalPrice)
+def refresh_calendar_on_pricing_delete(sender, instance, origin=None,
+                                       **kwargs):
+    """Reprice the dates an override or season no longer covers"""
+    if _deleting_listing(origin):
+        return
+    bump_pricing_version(instance.listing_id)
+    refresh_calendar(instance.listing, *_pricing_range(instance))
+
+
+# Listing fields that change the price of a stay
+PRICING_FIELDS = (
+    'price',
+    'vat_rate',
+    'municipality_tax_rate',
+    'climate_crisis_fee_per_night',
+    'cleaning_fee',
+    'service_fee',
+)
+
+
+@receiver(pre_save, sender=ShortTermListing)
+def remember_previous_listing_pricing(sender, instance, **kwargs):
+    """Keep the old pricing fields to detect changes in post_save"""
+    instance._previous_pricing = None
+    if instance.pk:
+        instance._previous_pricing = (
+            sender.objects.filter(pk=instance.pk)
+            .values('pricing_version', *PRICING_FIELDS)
+            .first()
+        )
+    if instance._previous_pricing:
+        # The version may have been bumped since this instance was
+        # loaded; never write an older one back
+        instance.pricing_version = max(
+            instance.pricing_version,
+            instance._previous_pricing['pricing_version'])
+
+
+@receiver(post_save, sender=ShortTermListing)
+def refresh_calendar_on_listing_save(sender, instance, created, **kwargs):
+    """
+    Build the calendar of a new listing. Invalidate quotes when pricing
+    changes and reprice the calendar when the base price changes.
+    """
+    previous = getattr(instance, '_previous_pricing', None)
+    if not created and previous:
+        if any(previous[field] != getattr(instance, field)
+               for field in PRICING_FIELDS):
+            bump_pricing_version(instance.pk)
+            instance.refresh_from_db(fields=['pricing_version'])
+        if previous['price'] == instance.price:
+            return
+
+    # Booked nights outside the window are repriced as well
+    start_date, end_date = calendar_window()
+    stored = ShortTermCalendarDay.objects.filter(
+        listing=instance
+    ).aggregate(first=Min('date'), last=Max('date'))
+    if stored['first']:
+        start_date = min(start_date, stored['first'])
+        end_date = max(end_date, stored['last'] + timedelta(days=1))
+    refresh_calendar(instance, start_date, end_date)
+
+
+# ============================================================================
+# RESPONSE CACHE (see re_drf_api/cache.py)
+# ============================================================================
 
-    try:
-        email.send()
-    except Exception as e:
-        # Log error but don't block booking creation
-        print(f"Error sending admin notification email: {e}")
+@receiver(post_save, sender=ShortTermBooking)
+@receiver(post_delete, sender=ShortTermBooking)
+@receiver(post_save, sender=ShortTermBookingNight)
+def invalidate_cached_availability(sender, **kwargs):
+    """Bookings change the results of the listing date filters"""
+    bump_cache_version('short_term_listings')
+
+
+# ============================================================================
+# LAST MODIFIED (see re_drf_api/conditional.py)
+# ============================================================================
+
+@receiver(post_delete, sender=ShortTermBooking)
+def touch_listing_on_booking_delete(sender, instance, origin=None, **kwargs):
+    """
+    A deleted booking leaves no `updated_at` behind, so move the
+    listing's Last-Modified instead
+    """
+    if not _deleting_listing(origin):
+        touch_listings(ShortTermListing, [instance.listing_id])
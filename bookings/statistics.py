@@ -0,0 +1,237 @@
+"""
+Booking statistics.
+
+ShortTermDailyStats holds one row per listing and sold night with the
+revenue and discount attributed to that night. The booking receivers in
+bookings/signals.py refresh the dates a booking touches, so time series
+over any range read pre-aggregated rows instead of scanning bookings.
+`manage.py rebuild_booking_stats` rebuilds the table from scratch.
+"""
+from datetime import timedelta
+from decimal import ROUND_FLOOR, Decimal
+
+from django.db.models import Count, Sum, Avg, Q
+from django.db.models.functions import TruncMonth
+
+from listings.models import ShortTermListing
+from .models import (
+    ShortTermBooking,
+    ShortTermBookingNight,
+    ShortTermDailyStats,
+)
+from .utils import month_windows
+
+
+CENT = Decimal('0.01')
+
+
+def booking_summary():
+    """
+    Headline booking counts and totals in a single conditional
+    aggregation query.
+
+    Returns:
+        dict: the payload of the booking_statistics endpoint.
+    """
+    not_cancelled = ~Q(status='cancelled')
+    aggregates = {
+        'total_bookings': Count('pk'),
+        'with_discount': Count('pk', filter=Q(discount_type__isnull=False)),
+        'total_revenue': Sum('total_price', filter=not_cancelled),
+        'total_discounts_given': Sum('discount_amount'),
+        'average_booking_value': Avg('total_price', filter=not_cancelled),
+    }
+    for status_code, _ in ShortTermBooking.STATUS_CHOICES:
+        aggregates[f'status_{status_code}'] = Count(
+            'pk', filter=Q(status=status_code))
+
+    totals = ShortTermBooking.objects.aggregate(**aggregates)
+
+    return {
+        'total_bookings': totals['total_bookings'],
+        'by_status': {
+            status_code: totals[f'status_{status_code}']
+            for status_code, _ in ShortTermBooking.STATUS_CHOICES
+        },
+        'with_discount': totals['with_discount'],
+        'total_revenue': totals['total_revenue'] or 0,
+        'total_discounts_given': totals['total_discounts_given'] or 0,
+        'average_booking_value': totals['average_booking_value'] or 0,
+    }
+
+
+def split_amount(amount, weights):
+    """
+    Split an amount in cents proportionally to weights, handing out the
+    rounding remainder by largest remainder, so the parts always add up
+    to the amount.
+
+    Returns:
+        list: one Decimal per weight.
+    """
+    amount = Decimal(amount or 0).quantize(CENT)
+    total_weight = sum(weights)
+    if not total_weight:
+        # Split evenly when nothing is priced
+        weights = [1] * len(weights)
+        total_weight = len(weights)
+
+    exact = [amount * weight / total_weight for weight in weights]
+    parts = [part.quantize(CENT, rounding=ROUND_FLOOR) for part in exact]
+    remainder = int((amount - sum(parts)) / CENT)
+    by_remainder = sorted(
+        range(len(parts)), key=lambda index: parts[index] - exact[index])
+    for index in by_remainder[:remainder]:
+        parts[index] += CENT
+    return parts
+
+
+def refresh_daily_stats(listing_id, start_date, end_date):
+    """
+    Recompute the daily statistics of a listing for [start_date, end_date).
+
+    A booking's total and discount are split over all of its nights,
+    including those outside the range, so its rows add up to the booking
+    however the range cuts it.
+    """
+    if end_date <= start_date:
+        return
+
+    bookings = ShortTermBookingNight.objects.filter(
+        booking__listing_id=listing_id,
+        date__gte=start_date,
+        date__lt=end_date,
+    ).exclude(
+        booking__status='cancelled'
+    ).values('booking_id')
+
+    nights = ShortTermBookingNight.objects.filter(
+        booking_id__in=bookings
+    ).order_by('booking_id', 'date').values_list(
+        'booking_id',
+        'date',
+        'price',
+        'booking__total_price',
+        'booking__discount_amount',
+    )
+
+    stays = {}
+    for booking_id, night, price, total, discount in nights:
+        stays.setdefault(booking_id, (total, discount, []))[2].append(
+            (night, price))
+
+    rows = {}
+    for total, discount, stay in stays.values():
+        # Share of the booking attributed to each night
+        weights = [price for _, price in stay]
+        revenues = split_amount(total, weights)
+        discounts = split_amount(discount, weights)
+        for (night, _), revenue, night_discount in zip(
+                stay, revenues, discounts):
+            if not start_date <= night < end_date:
+                continue
+            row = rows.get(night)
+            if row is None:
+                row = rows[night] = ShortTermDailyStats(
+                    listing_id=listing_id, date=night)
+            row.nights_sold += 1
+            row.revenue += revenue
+            row.discounts += night_discount
+
+    ShortTermDailyStats.objects.filter(
+        listing_id=listing_id,
+        date__gte=start_date,
+        date__lt=end_date,
+    ).delete()
+    ShortTermDailyStats.objects.bulk_create(rows.values(), batch_size=500)
+
+
+def rebuild_daily_stats(listing):
+    """Drop and rebuild every daily statistics row of a listing"""
+    ShortTermDailyStats.objects.filter(listing=listing).delete()
+    years = ShortTermBookingNight.objects.filter(
+        booking__listing=listing
+    ).exclude(
+        booking__status='cancelled'
+    ).dates('date', 'year')
+
+    for year in years:
+        refresh_daily_stats(
+            listing.pk,
+            year.replace(month=1, day=1),
+            year.replace(year=year.year + 1, month=1, day=1),
+        )
+
+
+def _periods(start_date, end_date, granularity):
+    """[(period_start, period_end), ...] covering [start_date, end_date)"""
+    if granularity == 'month':
+        return month_windows(start_date, end_date)
+    return [
+        (start_date + timedelta(days=offset),
+         start_date + timedelta(days=offset + 1))
+        for offset in range((end_date - start_date).days)
+    ]
+
+
+def stats_time_series(start_date, end_date, granularity='day',
+                      listing_id=None):
+    """
+    Nights sold, revenue, discounts and occupancy per day or month of
+    [start_date, end_date), optionally for one listing. Two queries,
+    whatever the length of the range.
+
+    Occupancy is nights sold over nights available, where every
+    short-term listing is available every night of the period.
+
+    Returns:
+        list: [
+            {
+                "period": date,  # first day of the day/month
+                "nights_sold": int,
+                "revenue": Decimal,
+                "discounts": Decimal,
+                "occupancy": float,
+            }
+        ]
+    """
+    rows = ShortTermDailyStats.objects.filter(
+        date__gte=start_date,
+        date__lt=end_date,
+    )
+    if listing_id is not None:
+        rows = rows.filter(listing_id=listing_id)
+        listing_count = 1
+    else:
+        listing_count = ShortTermListing.objects.count()
+
+    period = 'date'
+    if granularity == 'month':
+        rows = rows.annotate(month=TruncMonth('date'))
+        period = 'month'
+    totals = {
+        row[period]: row
+        for row in rows.values(period).annotate(
+            nights_sold_total=Sum('nights_sold'),
+            revenue_total=Sum('revenue'),
+            discounts_total=Sum('discounts'),
+        ).order_by()
+    }
+
+    series = []
+    for period_start, period_end in _periods(
+            start_date, end_date, granularity):
+        # A month period is keyed by the first of the month
+        row = totals.get(period_start.replace(day=1)
+                         if granularity == 'month' else period_start)
+        nights_sold = row['nights_sold_total'] if row else 0
+        available = (period_end - period_start).days * listing_count
+        series.append({
+            'period': period_start,
+            'nights_sold': nights_sold,
+            'revenue': row['revenue_total'] if row else Decimal('0.00'),
+            'discounts': row['discounts_total'] if row else Decimal('0.00'),
+            'occupancy': (
+                round(nights_sold / available, 4) if available else 0),
+        })
+    return series
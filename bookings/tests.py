@@ -1,3 +1,247 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from listings.models import (
+    ShortTermListing, ShortTermPriceOverride, ShortTermSeasonalPrice
+)
+from .calendar import calendar_window
+from .models import OutboxEmail, ShortTermBooking, ShortTermDailyStats
+from .statistics import booking_summary, refresh_daily_stats, split_amount
+from .utils import calculate_booking_price, get_listing_availability
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxEmailTests(TestCase):
+    """
+    Booking emails are queued in the outbox and delivered by
+    `manage.py send_outbox_emails`.
+    """
+
+    def setUp(self):
+        agent = User.objects.create_user(username='agent')
+        self.listing = ShortTermListing.objects.create(
+            agent_name=agent,
+            price=Decimal('100.00'),
+            max_guests=4,
+            max_adults=2,
+            max_children=2,
+        )
+
+    def create_booking(self):
+        check_in = timezone.localdate() + timedelta(days=10)
+        return ShortTermBooking.objects.create(
+            listing=self.listing,
+            first_name='Maria',
+            last_name='Papadopoulou',
+            phone_number='+306900000000',
+            email='guest@example.com',
+            check_in=check_in,
+            check_out=check_in + timedelta(days=3),
+        )
+
+    def test_booking_email_is_queued_not_sent(self):
+        self.create_booking()
+
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, 'pending')
+        self.assertEqual(email.to, ['guest@example.com'])
+
+    def test_command_sends_pending_emails(self):
+        self.create_booking()
+
+        call_command('send_outbox_emails', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['guest@example.com'])
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, 'sent')
+        self.assertEqual(email.attempts, 1)
+        self.assertIsNotNone(email.sent_at)
+
+    def test_failed_send_is_retried_later(self):
+        self.create_booking()
+
+        with mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages',
+            side_effect=OSError('connection refused'),
+        ):
+            call_command('send_outbox_emails', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, 'pending')
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('connection refused', email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+        # Not due yet
+        call_command('send_outbox_emails', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        call_command('send_outbox_emails', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'sent')
+        self.assertEqual(email.attempts, 2)
+        self.assertEqual(email.last_error, '')
+
+
+class NightlyPriceQueryTests(TestCase):
+    """
+    Stays are priced from one query for the price overrides and one for
+    the seasons, however many nights they cover.
+    """
+
+    def setUp(self):
+        agent = User.objects.create_user(username='agent')
+        self.listing = ShortTermListing.objects.create(
+            agent_name=agent,
+            price=Decimal('100.00'),
+            max_guests=4,
+            max_adults=2,
+            max_children=2,
+        )
+        self.check_in = timezone.localdate() + timedelta(days=10)
+        ShortTermSeasonalPrice.objects.create(
+            listing=self.listing,
+            start_date=self.check_in + timedelta(days=1),
+            end_date=self.check_in + timedelta(days=5),
+            price=150,
+        )
+        ShortTermPriceOverride.objects.create(
+            listing=self.listing,
+            date=self.check_in + timedelta(days=2),
+            price=200,
+        )
+
+    def test_price_queries_do_not_grow_with_the_stay(self):
+        for nights in (3, 60):
+            with self.assertNumQueries(2):
+                price = calculate_booking_price(
+                    self.listing,
+                    self.check_in,
+                    self.check_in + timedelta(days=nights),
+                )
+            self.assertEqual(price['nights'], nights)
+
+    def test_override_then_season_then_listing_price(self):
+        price = calculate_booking_price(
+            self.listing, self.check_in, self.check_in + timedelta(days=4))
+
+        self.assertEqual(
+            [night_price for night, night_price in price['breakdown']],
+            [Decimal('100.00'), 150, 200, 150],
+        )
+        self.assertEqual(price['subtotal'], Decimal('600.00'))
+
+
+class ListingAvailabilityQueryTests(TestCase):
+    """
+    get_listing_availability reads the materialized calendar with one
+    query, and needs three queries (booked nights, overrides, seasons)
+    outside of it.
+    """
+
+    def setUp(self):
+        agent = User.objects.create_user(username='agent')
+        self.listing = ShortTermListing.objects.create(
+            agent_name=agent,
+            price=Decimal('100.00'),
+            max_guests=4,
+            max_adults=2,
+            max_children=2,
+        )
+
+    def test_calendar_range(self):
+        start_date, window_end = calendar_window()
+        end_date = start_date + timedelta(days=365)
+        self.assertLessEqual(end_date, window_end)
+
+        with self.assertNumQueries(1):
+            days = get_listing_availability(
+                self.listing, start_date, end_date)
+        self.assertEqual(len(days), 365)
+
+    def test_range_outside_the_calendar(self):
+        start_date = calendar_window()[1] + timedelta(days=10)
+        for length in (30, 365):
+            with self.assertNumQueries(3):
+                days = get_listing_availability(
+                    self.listing,
+                    start_date,
+                    start_date + timedelta(days=length),
+                )
+            self.assertEqual(len(days), length)
+            self.assertTrue(all(day['available'] for day in days))
+
+
+class DailyStatsTests(TestCase):
+    """
+    The daily statistics rows of a booking add up to its total price and
+    discount, and the headline numbers cost one query.
+    """
+
+    def setUp(self):
+        agent = User.objects.create_user(username='agent')
+        self.listing = ShortTermListing.objects.create(
+            agent_name=agent,
+            price=Decimal('100.00'),
+            max_guests=4,
+            max_adults=2,
+            max_children=2,
+        )
+        self.check_in = timezone.localdate() + timedelta(days=10)
+        self.booking = ShortTermBooking.objects.create(
+            listing=self.listing,
+            first_name='Maria',
+            last_name='Papadopoulou',
+            phone_number='+306900000000',
+            email='guest@example.com',
+            check_in=self.check_in,
+            check_out=self.check_in + timedelta(days=3),
+        )
+
+    def test_split_amount_hands_out_the_remainder(self):
+        self.assertEqual(
+            split_amount(Decimal('100.00'), [1, 1, 1]),
+            [Decimal('33.34'), Decimal('33.33'), Decimal('33.33')],
+        )
+        self.assertEqual(
+            sum(split_amount(Decimal('462.50'), [97, 113, 101, 89])),
+            Decimal('462.50'),
+        )
+
+    def test_rows_add_up_to_the_booking(self):
+        # Thirds of the total do not round to whole cents
+        ShortTermBooking.objects.filter(pk=self.booking.pk).update(
+            total_price=Decimal('100.00'), discount_amount=Decimal('10.00'))
+        # Refreshed in two ranges that cut through the stay
+        middle = self.check_in + timedelta(days=1)
+        refresh_daily_stats(self.listing.pk, self.check_in, middle)
+        refresh_daily_stats(
+            self.listing.pk, middle, self.check_in + timedelta(days=3))
+
+        rows = ShortTermDailyStats.objects.filter(listing=self.listing)
+        self.assertEqual(rows.count(), 3)
+        self.assertEqual(
+            sum(row.revenue for row in rows), Decimal('100.00'))
+        self.assertEqual(
+            sum(row.discounts for row in rows), Decimal('10.00'))
+
+    def test_summary_is_one_query(self):
+        with self.assertNumQueries(1):
+            summary = booking_summary()
+        self.assertEqual(summary['total_bookings'], 1)
+        self.assertEqual(summary['by_status']['pending'], 1)
@@ -3,6 +3,7 @@ from django.urls import path
 from .views import (
     ShortTermBookingCreateView,
     ShortTermBookingDetailView,
+    ShortTermBookingQuoteView,
     UnavailableDatesView,
     apply_discount_to_booking,
     remove_discount_from_booking,
@@ -27,6 +28,11 @@ urlpatterns = [
         UnavailableDatesView.as_view(),
         name='unavailable-dates'
     ),
+    path(
+        'short-term-bookings/quote/',
+        ShortTermBookingQuoteView.as_view(),
+        name='short-term-booking-quote'
+    ),
 
     # Admin-only discount endpoints
     path(
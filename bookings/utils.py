@@ -1,11 +1,142 @@
 from datetime import timedelta
 from decimal import Decimal
+from django.core.exceptions import ValidationError
 from listings.models import (
     ShortTermPriceOverride,
     ShortTermSeasonalPrice
 )
 
 
+# Longest stay that is priced at once
+MAX_STAY_NIGHTS = 186
+
+
+def _resolve_prices(listing, check_in, check_out, overrides, seasons):
+    """
+    Resolve nightly prices from already loaded pricing rows.
+
+    Args:
+        overrides: dict of {date: price} for the listing.
+        seasons: iterable of (start_date, end_date, price), in
+            precedence order (earliest start_date first).
+
+    Returns:
+        list: [(date, Decimal), ...] for every night in
+        [check_in, check_out)
+    """
+    num_nights = (check_out - check_in).days
+    if num_nights <= 0:
+        return []
+
+    # Paint each season over the nights it covers. Earlier seasons win,
+    # so only nights that are still empty are filled in.
+    season_prices = [None] * num_nights
+    for start_date, end_date, price in seasons:
+        first = max((start_date - check_in).days, 0)
+        last = min((end_date - check_in).days, num_nights)
+        for idx in range(first, last):
+            if season_prices[idx] is None:
+                season_prices[idx] = price
+
+    base_price = (
+        Decimal(listing.price) if listing.price is not None else None
+    )
+
+    nights = []
+    current_date = check_in
+    for idx in range(num_nights):
+        if current_date in overrides:
+            nightly_price = Decimal(overrides[current_date])
+        elif season_prices[idx] is not None:
+            nightly_price = Decimal(season_prices[idx])
+        else:
+            nightly_price = base_price
+
+        nights.append((current_date, nightly_price))
+        current_date += timedelta(days=1)
+
+    return nights
+
+
+def resolve_nightly_prices(listing, check_in, check_out):
+    """
+    Resolve the price of every night in [check_in, check_out).
+
+    Overrides and seasons overlapping the stay are loaded with one
+    query each and resolved in memory, so the number of queries is
+    constant (two) regardless of the length of the stay.
+
+    Precedence per night: ShortTermPriceOverride, then
+    ShortTermSeasonalPrice, then listing.price.
+
+    Returns:
+        list: [(date, Decimal), ...]
+    """
+    if check_out <= check_in:
+        return []
+
+    overrides = dict(
+        ShortTermPriceOverride.objects.filter(
+            listing=listing,
+            date__gte=check_in,
+            date__lt=check_out,
+        ).values_list("date", "price")
+    )
+
+    seasons = ShortTermSeasonalPrice.objects.filter(
+        listing=listing,
+        start_date__lt=check_out,
+        end_date__gt=check_in,
+    ).order_by("start_date", "pk").values_list(
+        "start_date", "end_date", "price"
+    )
+
+    return _resolve_prices(listing, check_in, check_out, overrides, seasons)
+
+
+def resolve_nightly_prices_bulk(listings, check_in, check_out):
+    """
+    Resolve the nightly prices of several listings over the same stay.
+
+    Overrides and seasons of all listings are loaded with one query each
+    and grouped per listing in memory.
+
+    Returns:
+        dict: {listing_id: [(date, Decimal), ...]}
+    """
+    listings = list(listings)
+    if check_out <= check_in:
+        return {listing.pk: [] for listing in listings}
+
+    listing_ids = [listing.pk for listing in listings]
+
+    overrides = {listing_id: {} for listing_id in listing_ids}
+    for listing_id, night, price in ShortTermPriceOverride.objects.filter(
+        listing_id__in=listing_ids,
+        date__gte=check_in,
+        date__lt=check_out,
+    ).values_list("listing_id", "date", "price"):
+        overrides[listing_id][night] = price
+
+    seasons = {listing_id: [] for listing_id in listing_ids}
+    for listing_id, *season in ShortTermSeasonalPrice.objects.filter(
+        listing_id__in=listing_ids,
+        start_date__lt=check_out,
+        end_date__gt=check_in,
+    ).order_by("start_date", "pk").values_list(
+        "listing_id", "start_date", "end_date", "price"
+    ):
+        seasons[listing_id].append(season)
+
+    return {
+        listing.pk: _resolve_prices(
+            listing, check_in, check_out,
+            overrides[listing.pk], seasons[listing.pk],
+        )
+        for listing in listings
+    }
+
+
 def calculate_booking_price(listing, check_in, check_out):
     """
     Calculate booking price with all taxes and fees based on
@@ -27,47 +158,84 @@ def calculate_booking_price(listing, check_in, check_out):
             'nights': int,
             'breakdown': list of (date, price)
         }
+
+    Raises:
+        ValidationError: when a night of the stay has no price.
     """
     if check_out <= check_in:
-        return {
-            'subtotal': Decimal("0.00"),
-            'vat': Decimal("0.00"),
-            'municipality_tax': Decimal("0.00"),
-            'climate_crisis_fee': Decimal("0.00"),
-            'cleaning_fee': Decimal("0.00"),
-            'service_fee': Decimal("0.00"),
-            'total': Decimal("0.00"),
-            'nights': 0,
-            'breakdown': []
-        }
+        return _empty_price()
 
-    subtotal = Decimal("0.00")
-    nights = []
-    current_date = check_in
+    nights = resolve_nightly_prices(listing, check_in, check_out)
+    unpriced = unpriced_nights(nights)
+    if unpriced:
+        raise ValidationError(
+            "No price is set for "
+            f"{', '.join(night.isoformat() for night in unpriced)}."
+        )
+    return price_totals(listing, nights)
 
-    # Calculate base price for each night
-    while current_date < check_out:
-        override = ShortTermPriceOverride.objects.filter(
-            listing=listing,
-            date=current_date
-        ).first()
 
-        season = ShortTermSeasonalPrice.objects.filter(
-            listing=listing,
-            start_date__lte=current_date,
-            end_date__gt=current_date
-        ).first()
-
-        if override:
-            nightly_price = Decimal(override.price)
-        elif season:
-            nightly_price = Decimal(season.price)
-        else:
-            nightly_price = Decimal(listing.price)
+def calculate_booking_prices(listings, check_in, check_out):
+    """
+    Calculate booking prices for several listings over the same stay.
 
-        nights.append((current_date, nightly_price))
-        subtotal += nightly_price
-        current_date += timedelta(days=1)
+    Same result per listing as calculate_booking_price, but overrides and
+    seasons of all listings are loaded with one query each, so the number
+    of queries is constant regardless of the number of listings and the
+    length of the stay.
+
+    Returns:
+        dict: {listing_id: price dict as returned by
+        calculate_booking_price, or None when a night of the stay has no
+        price}
+    """
+    if check_out <= check_in:
+        return {listing.pk: _empty_price() for listing in listings}
+
+    breakdowns = resolve_nightly_prices_bulk(listings, check_in, check_out)
+    return {
+        listing.pk: (
+            None if unpriced_nights(breakdowns[listing.pk])
+            else price_totals(listing, breakdowns[listing.pk])
+        )
+        for listing in listings
+    }
+
+
+def unpriced_nights(nights):
+    """
+    Nights of a breakdown without a price: the listing has no price and
+    no season or override covers them.
+
+    Returns:
+        list: [date, ...]
+    """
+    return [night for night, price in nights if price is None]
+
+
+def _empty_price():
+    return {
+        'subtotal': Decimal("0.00"),
+        'vat': Decimal("0.00"),
+        'municipality_tax': Decimal("0.00"),
+        'climate_crisis_fee': Decimal("0.00"),
+        'cleaning_fee': Decimal("0.00"),
+        'service_fee': Decimal("0.00"),
+        'total': Decimal("0.00"),
+        'nights': 0,
+        'breakdown': []
+    }
+
+
+def price_totals(listing, nights):
+    """
+    Apply the listing's taxes and fees to a nightly breakdown. Every
+    night must have a price (see unpriced_nights).
+
+    Tax rates are stored as percentages (13.25) and converted
+    to decimals (0.1325) for calculation.
+    """
+    subtotal = sum((price for _, price in nights), Decimal("0.00"))
 
     num_nights = len(nights)
 
@@ -76,7 +244,6 @@ def calculate_booking_price(listing, check_in, check_out):
     vat_rate = Decimal(listing.vat_rate) / Decimal('100')
     municipality_tax_rate = Decimal(
         listing.municipality_tax_rate) / Decimal('100')
-    service_fee = Decimal(listing.service_fee)  # One-time fee
 
     # Calculate taxes and fees
     vat = subtotal * vat_rate
@@ -106,6 +273,11 @@ def get_listing_availability(listing, start_date, end_date):
     """
     Returns a list of dicts with availability and pricing info.
 
+    Reads the materialized calendar (one query) when it covers the whole
+    range. Otherwise falls back to three queries: booked nights, price
+    overrides and seasonal prices. Nights of cancelled bookings count as
+    available, matching UnavailableDatesView.
+
     Returns:
         list: [
             {
@@ -115,10 +287,19 @@ def get_listing_availability(listing, start_date, end_date):
             }
         ]
     """
+    from .calendar import get_calendar_days
     from .models import ShortTermBookingNight
 
-    results = []
-    current_date = start_date
+    days = get_calendar_days(listing, start_date, end_date)
+    if days is not None:
+        return [
+            {
+                "date": night,
+                "available": not booked,
+                "price": price,
+            }
+            for night, price, booked in days
+        ]
 
     # Fetch booked nights once (fast, safe)
     booked_dates = set(
@@ -126,38 +307,38 @@ def get_listing_availability(listing, start_date, end_date):
             booking__listing=listing,
             date__gte=start_date,
             date__lt=end_date,
+        ).exclude(
+            booking__status='cancelled'
         ).values_list("date", flat=True)
     )
 
-    while current_date < end_date:
-        # Availability
-        is_available = current_date not in booked_dates
-
-        # Pricing
-        override = ShortTermPriceOverride.objects.filter(
-            listing=listing,
-            date=current_date
-        ).first()
-
-        season = ShortTermSeasonalPrice.objects.filter(
-            listing=listing,
-            start_date__lte=current_date,
-            end_date__gt=current_date
-        ).first()
-
-        if override:
-            price = Decimal(override.price)
-        elif season:
-            price = Decimal(season.price)
-        else:
-            price = Decimal(listing.price)
-
-        results.append({
-            "date": current_date,
-            "available": is_available,
+    return [
+        {
+            "date": night,
+            "available": night not in booked_dates,
             "price": price,
-        })
+        }
+        for night, price in resolve_nightly_prices(
+            listing, start_date, end_date)
+    ]
 
-        current_date += timedelta(days=1)
 
-    return results
+def month_windows(start_date, end_date):
+    """
+    Split [start_date, end_date) into calendar months.
+
+    Returns:
+        list: [(window_start, window_end), ...] where each window covers
+        at most one calendar month and window_end is exclusive.
+    """
+    windows = []
+    current = start_date
+    while current < end_date:
+        if current.month == 12:
+            next_month = current.replace(year=current.year + 1, month=1, day=1)
+        else:
+            next_month = current.replace(month=current.month + 1, day=1)
+        window_end = min(next_month, end_date)
+        windows.append((current, window_end))
+        current = window_end
+    return windows
@@ -3,16 +3,23 @@ from rest_framework import generics, status, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db.models import Q
 from django_filters.rest_framework import DjangoFilterBackend
+from re_drf_api.conditional import conditional_get
 
-from .models import ShortTermBooking, ShortTermBookingNight
+from .models import ShortTermBooking, ShortTermCalendarDay
+from .availability import availability_validators
+from .quotes import create_quote, QUOTE_MAX_AGE
+from .statistics import booking_summary, stats_time_series
 from .serializers import (
     ShortTermBookingSerializer,
+    ShortTermBookingQuoteSerializer,
     ShortTermBookingDiscountSerializer,
+    BookingStatisticsQuerySerializer,
     ShortTermBookingStatusSerializer
 )
 
@@ -31,6 +38,7 @@ class ShortTermBookingCreateView(generics.ListCreateAPIView):
     - ordering: Order by field (id, check_in, total_price, -created_at, etc.)
     - check_in_after: Filter bookings checking in after this date (YYYY-MM-DD)
     - check_in_before: Filter bookings checking in before this date (YYYY-MM-DD)
+    - pagination=cursor: Keyset pagination without a total count
     """
     serializer_class = ShortTermBookingSerializer
     filter_backends = [DjangoFilterBackend,
@@ -38,6 +46,14 @@ class ShortTermBookingCreateView(generics.ListCreateAPIView):
     ordering_fields = ['id', 'check_in',
                        'check_out', 'total_price', 'created_at']
     ordering = ['-created_at']  # Default ordering
+    # Orderings available with ?pagination=cursor
+    cursor_orderings = {
+        'created_at': 'created_at',
+        'check_in': 'check_in',
+        'check_out': 'check_out',
+        'total_price': 'total_price',
+    }
+    cursor_default_ordering = '-created_at'
     search_fields = [
         'reference_number',
         'first_name',
@@ -159,8 +175,17 @@ class UnavailableDatesView(APIView):
     """
     Returns blocked date ranges based on booking nights.
     Used by frontend calendar to show unavailable dates.
+
+    Supports conditional GET (ETag / Last-Modified).
     """
 
+    def get_validators(self, request, *args, **kwargs):
+        listing_id = request.query_params.get("listing")
+        if not listing_id:
+            return None
+        return availability_validators(listing_id)
+
+    @conditional_get
     def get(self, request, *args, **kwargs):
         listing_id = request.query_params.get("listing")
         if not listing_id:
@@ -169,15 +194,13 @@ class UnavailableDatesView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Get all booked nights for this listing (exclude cancelled)
+        # Booked nights from the materialized calendar (cancelled
+        # bookings are never marked as booked)
         nights = (
-            ShortTermBookingNight.objects
-            .filter(
-                booking__listing_id=listing_id
-            )
-            .exclude(booking__status='cancelled')
-            .select_related("booking")
+            ShortTermCalendarDay.objects
+            .filter(listing_id=listing_id, booked=True)
             .order_by("date")
+            .values_list("date", flat=True)
         )
 
         # Convert nights → ranges (frontend-friendly)
@@ -187,19 +210,19 @@ class UnavailableDatesView(APIView):
 
         for night in nights:
             if current_start is None:
-                current_start = night.date
-                last_date = night.date
+                current_start = night
+                last_date = night
                 continue
 
-            if night.date == last_date + timedelta(days=1):
-                last_date = night.date
+            if night == last_date + timedelta(days=1):
+                last_date = night
             else:
                 ranges.append({
                     "check_in": current_start,
                     "check_out": last_date + timedelta(days=1),
                 })
-                current_start = night.date
-                last_date = night.date
+                current_start = night
+                last_date = night
 
         if current_start:
             ranges.append({
@@ -210,6 +233,50 @@ class UnavailableDatesView(APIView):
         return Response(ranges)
 
 
+class ShortTermBookingQuoteView(APIView):
+    """
+    Prices a stay and returns a signed quote token.
+
+    POST /api/short-term-bookings/quote/
+    {"listing": 1, "check_in": "YYYY-MM-DD", "check_out": "YYYY-MM-DD"}
+
+    Pass the token as `quote_token` when creating the booking to reuse
+    this price instead of computing it again. Tokens expire after
+    `expires_in` seconds or as soon as the listing's pricing changes.
+    """
+    def post(self, request, *args, **kwargs):
+        serializer = ShortTermBookingQuoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        listing = serializer.validated_data['listing']
+        check_in = serializer.validated_data['check_in']
+        check_out = serializer.validated_data['check_out']
+
+        try:
+            token, price_data = create_quote(listing, check_in, check_out)
+        except DjangoValidationError as exc:
+            raise ValidationError({'check_in': exc.messages})
+
+        return Response({
+            'quote_token': token,
+            'expires_in': QUOTE_MAX_AGE,
+            'listing': listing.pk,
+            'check_in': check_in,
+            'check_out': check_out,
+            'nights': price_data['nights'],
+            'subtotal': price_data['subtotal'],
+            'vat': price_data['vat'],
+            'municipality_tax': price_data['municipality_tax'],
+            'climate_crisis_fee': price_data['climate_crisis_fee'],
+            'cleaning_fee': price_data['cleaning_fee'],
+            'service_fee': price_data['service_fee'],
+            'total': price_data['total'],
+            'breakdown': [
+                {'date': night, 'price': price}
+                for night, price in price_data['breakdown']
+            ],
+        })
+
+
 # ============================================================================
 # ADMIN-ONLY ENDPOINTS FOR DISCOUNT MANAGEMENT
 # ============================================================================
@@ -368,32 +435,23 @@ def booking_statistics(request):
     Admin-only endpoint for booking statistics.
 
     GET /api/bookings/statistics/
+
+    Optional query parameters add a time series of nights sold, revenue,
+    discounts and occupancy read from the daily statistics table:
+    - start, end: date range (YYYY-MM-DD, end exclusive)
+    - granularity: day (default) or month
+    - listing: restrict the series to one short-term listing
     """
-    from django.db.models import Sum, Avg
-
-    stats = {
-        'total_bookings': ShortTermBooking.objects.count(),
-        'by_status': {
-            status_code: ShortTermBooking.objects.filter(
-                status=status_code).count()
-            for status_code, _ in ShortTermBooking.STATUS_CHOICES
-        },
-        'with_discount': ShortTermBooking.objects.filter(
-            discount_type__isnull=False
-        ).count(),
-        'total_revenue': ShortTermBooking.objects.exclude(
-            status='cancelled'
-        ).aggregate(
-            total=Sum('total_price')
-        )['total'] or 0,
-        'total_discounts_given': ShortTermBooking.objects.aggregate(
-            total=Sum('discount_amount')
-        )['total'] or 0,
-        'average_booking_value': ShortTermBooking.objects.exclude(
-            status='cancelled'
-        ).aggregate(
-            avg=Avg('total_price')
-        )['avg'] or 0,
-    }
+    stats = booking_summary()
+
+    if 'start' in request.query_params or 'end' in request.query_params:
+        params = BookingStatisticsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        stats['time_series'] = stats_time_series(
+            params.validated_data['start'],
+            params.validated_data['end'],
+            params.validated_data['granularity'],
+            params.validated_data.get('listing'),
+        )
 
     return Response(stats)
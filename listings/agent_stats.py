@@ -0,0 +1,78 @@
+"""
+Per-agent listing counters.
+
+AgentListingStats stores how many sale and short-term listings each
+agent has, so the listing lists can order by agent activity with a
+one-to-one join instead of a COUNT over the whole listings table. The
+receivers in listings/signals.py recount the agents a listing change
+touches; `manage.py reconcile_agent_listing_stats` fixes any drift.
+"""
+from django.db.models import Count
+
+from .models import AgentListingStats, Listing, ShortTermListing
+
+
+def _count_listings(agent_ids=None):
+    """
+    Returns:
+        dict: {agent_id: [listing_count, short_term_listing_count]}
+    """
+    counts = {}
+    for index, model in enumerate((Listing, ShortTermListing)):
+        listings = model.objects.all()
+        if agent_ids is not None:
+            listings = listings.filter(agent_name_id__in=agent_ids)
+        for agent_id, count in listings.values_list(
+                "agent_name").annotate(count=Count("pk")).order_by():
+            counts.setdefault(agent_id, [0, 0])[index] = count
+    return counts
+
+
+def _save_stats(counts):
+    AgentListingStats.objects.bulk_create(
+        [
+            AgentListingStats(
+                agent_id=agent_id,
+                listing_count=listing_count,
+                short_term_listing_count=short_term_listing_count,
+            )
+            for agent_id, (listing_count, short_term_listing_count)
+            in counts.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["agent"],
+        update_fields=["listing_count", "short_term_listing_count"],
+    )
+
+
+def refresh_agent_listing_stats(agent_ids):
+    """Recount the sale and short-term listings of the given agents"""
+    agent_ids = {agent_id for agent_id in agent_ids if agent_id is not None}
+    if not agent_ids:
+        return
+
+    counts = _count_listings(agent_ids)
+    for agent_id in agent_ids:
+        counts.setdefault(agent_id, [0, 0])
+    _save_stats(counts)
+
+
+def reconcile_agent_listing_stats():
+    """
+    Recount every agent and correct the rows that drifted.
+
+    Returns:
+        int: number of agents whose counters were corrected.
+    """
+    counts = _count_listings()
+    for agent_id, listing_count, short_term_listing_count in (
+            AgentListingStats.objects.values_list(
+                "agent_id", "listing_count", "short_term_listing_count")):
+        stored = [listing_count, short_term_listing_count]
+        if counts.get(agent_id, [0, 0]) == stored:
+            counts.pop(agent_id, None)
+        else:
+            counts.setdefault(agent_id, [0, 0])
+
+    _save_stats(counts)
+    return len(counts)
@@ -0,0 +1,127 @@
+"""
+Content-addressed storage of uploads.
+
+Agents re-upload the same photos and documents, e.g. when cloning a
+listing into a short-term listing or re-saving the admin form. Every
+upload is hashed (SHA-256, read in chunks, so memory stays flat) before
+it is sent; when StoredBlob already has the content, the new row points
+at the stored object and nothing is uploaded.
+
+Reference counts are kept without locks: acquire_blob only increments a
+row that still exists, and release_blob deletes the row (and, once the
+transaction commits, the stored object) only if its count is still zero
+after the decrement. An acquire racing with the last release either
+revives the blob or finds it gone and uploads the content again.
+
+Images are uploaded to Backblaze by listings/uploads.py; listing and
+owner files go through the default storage of their FileField and are
+deduplicated by the receivers in listings/signals.py.
+"""
+import hashlib
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+
+from .models import StoredBlob
+from .services import delete_from_backblaze
+
+
+BACKBLAZE = "backblaze"
+STORAGE = "storage"
+
+
+def content_hash(file):
+    """
+    Returns:
+        tuple: (SHA-256 hex digest, size) of a Django File, rewound
+        afterwards so it can still be uploaded.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in file.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return digest.hexdigest(), size
+
+
+def find_blobs(backend, digests):
+    """
+    Returns:
+        dict: {digest: StoredBlob} of the contents already stored.
+    """
+    return {
+        blob.sha256: blob
+        for blob in StoredBlob.objects.filter(
+            backend=backend, sha256__in=set(digests))
+    }
+
+
+def acquire_blob(blob, count=1):
+    """
+    Add references to a stored blob.
+
+    Returns:
+        bool: False when the blob was deleted in the meantime.
+    """
+    return StoredBlob.objects.filter(pk=blob.pk).update(
+        ref_count=F("ref_count") + count) > 0
+
+
+def register_blob(backend, digest, name, size, url="", count=1):
+    """
+    Record newly uploaded content with `count` references.
+
+    Returns:
+        tuple: (blob, created). When another upload of the same content
+        got there first, its blob is returned (with the references
+        added) and the caller deletes its own copy.
+    """
+    while True:
+        blob, created = StoredBlob.objects.get_or_create(
+            backend=backend,
+            sha256=digest,
+            defaults={
+                "name": name,
+                "url": url,
+                "size": size,
+                "ref_count": count,
+            },
+        )
+        if created or acquire_blob(blob, count):
+            return blob, created
+        # Deleted between the lookup and the increment; register anew
+
+
+def _delete_stored(backend, name):
+    try:
+        if backend == BACKBLAZE:
+            delete_from_backblaze(name)
+        else:
+            default_storage.delete(name)
+    except Exception:
+        # An orphaned object only costs storage
+        pass
+
+
+def release_blob(backend, **lookup):
+    """
+    Drop one reference to the blob matching `lookup` (name= or url=),
+    deleting it from storage with its last reference. Content uploaded
+    before deduplication has no blob and is left alone.
+    """
+    blob = StoredBlob.objects.filter(backend=backend, **lookup).first()
+    if blob is None:
+        return
+    StoredBlob.objects.filter(pk=blob.pk, ref_count__gt=0).update(
+        ref_count=F("ref_count") - 1)
+    deleted, _ = StoredBlob.objects.filter(
+        pk=blob.pk, ref_count__lte=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: _delete_stored(backend, blob.name))
+
+
+def is_tracked(backend, **lookup):
+    """True when the content matching `lookup` is reference counted"""
+    return StoredBlob.objects.filter(backend=backend, **lookup).exists()
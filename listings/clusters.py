@@ -0,0 +1,202 @@
+"""
+Map marker clusters.
+
+Listings are clustered by geohash prefix: a map zoom level maps to a
+geohash precision (`cluster_precision`) and each cell of that precision
+with listings in it becomes one marker, with its listing count, centroid
+and price range.
+
+ListingCluster stores the clusters of every precision from
+MIN_CLUSTER_PRECISION to MAX_CLUSTER_PRECISION. The finest level is
+aggregated from the listings, each coarser level from the level below
+it, so a listing change only recomputes the handful of cells it sits in
+(listings/signals.py). `manage.py rebuild_listing_clusters` rebuilds the
+table from scratch.
+"""
+from django.db import transaction
+from django.db.models import Avg, Count, F, Max, Min, Q, Sum
+from django.db.models.functions import Substr
+
+from .geo import cells_q
+from .models import Listing, ListingCluster, ShortTermListing
+
+
+CLUSTER_KINDS = {
+    Listing: "listing",
+    ShortTermListing: "short_term",
+}
+
+# The finest clusters are about 1.2 x 0.6 km
+MIN_CLUSTER_PRECISION = 1
+MAX_CLUSTER_PRECISION = 6
+
+# From this zoom level on the map shows individual listings
+POINTS_ZOOM = 14
+MAX_MAP_POINTS = 500
+
+
+def cluster_precision(zoom):
+    """Geohash precision of the clusters shown at a map zoom level"""
+    return min(max((zoom + 1) // 2 - 1, MIN_CLUSTER_PRECISION),
+               MAX_CLUSTER_PRECISION)
+
+
+def _prefix_q(field, prefixes):
+    """Index range lookups matching the values starting with a prefix"""
+    matches = Q()
+    for prefix in prefixes:
+        # "{" sorts after every geohash character
+        matches |= Q(
+            **{f"{field}__gte": prefix, f"{field}__lt": prefix + "{"})
+    return matches
+
+
+def aggregate_clusters(queryset, precision):
+    """
+    Cluster the listings of a queryset by geohash prefix in one GROUP BY
+    query.
+
+    Returns:
+        list: [
+            {
+                "cell": str,
+                "count": int,
+                "latitude": float,  # centroid
+                "longitude": float,
+                "min_price": Decimal,
+                "max_price": Decimal,
+            }
+        ]
+    """
+    rows = queryset.exclude(geohash="").annotate(
+        cluster_cell=Substr("geohash", 1, precision)
+    ).values("cluster_cell").annotate(
+        cluster_count=Count("pk"),
+        centroid_latitude=Avg("latitude"),
+        centroid_longitude=Avg("longitude"),
+        cluster_min_price=Min("price"),
+        cluster_max_price=Max("price"),
+    ).order_by("cluster_cell")
+
+    return [
+        {
+            "cell": row["cluster_cell"],
+            "count": row["cluster_count"],
+            "latitude": row["centroid_latitude"],
+            "longitude": row["centroid_longitude"],
+            "min_price": row["cluster_min_price"],
+            "max_price": row["cluster_max_price"],
+        }
+        for row in rows
+    ]
+
+
+def _merge_children(kind, precision, prefixes):
+    """Clusters of one precision, aggregated from the level below"""
+    children = ListingCluster.objects.filter(
+        kind=kind, precision=precision + 1)
+    if prefixes is not None:
+        children = children.filter(_prefix_q("cell", prefixes))
+
+    rows = children.annotate(
+        parent=Substr("cell", 1, precision)
+    ).values("parent").annotate(
+        total=Sum("count"),
+        latitude_sum=Sum(F("latitude") * F("count")),
+        longitude_sum=Sum(F("longitude") * F("count")),
+        lowest_price=Min("min_price"),
+        highest_price=Max("max_price"),
+    ).order_by()
+
+    return [
+        {
+            "cell": row["parent"],
+            "count": row["total"],
+            "latitude": row["latitude_sum"] / row["total"],
+            "longitude": row["longitude_sum"] / row["total"],
+            "min_price": row["lowest_price"],
+            "max_price": row["highest_price"],
+        }
+        for row in rows
+    ]
+
+
+def _save_level(kind, precision, prefixes, rows):
+    """
+    Save the clusters of one precision and, under the given prefixes,
+    delete the cells that no longer have listings.
+    """
+    if prefixes is not None:
+        ListingCluster.objects.filter(
+            _prefix_q("cell", prefixes), kind=kind, precision=precision
+        ).exclude(cell__in=[row["cell"] for row in rows]).delete()
+
+    ListingCluster.objects.bulk_create(
+        [
+            ListingCluster(kind=kind, precision=precision, **row)
+            for row in rows
+        ],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["kind", "cell"],
+        update_fields=[
+            "count", "latitude", "longitude", "min_price", "max_price"],
+    )
+
+
+@transaction.atomic
+def _build_clusters(model, prefixes=None):
+    kind = CLUSTER_KINDS[model]
+    listings = model.objects.all()
+    if prefixes is not None:
+        listings = listings.filter(_prefix_q("geohash", prefixes))
+    _save_level(
+        kind,
+        MAX_CLUSTER_PRECISION,
+        prefixes,
+        aggregate_clusters(listings, MAX_CLUSTER_PRECISION),
+    )
+
+    for precision in range(
+            MAX_CLUSTER_PRECISION - 1, MIN_CLUSTER_PRECISION - 1, -1):
+        if prefixes is not None:
+            prefixes = {prefix[:precision] for prefix in prefixes}
+        _save_level(
+            kind, precision, prefixes,
+            _merge_children(kind, precision, prefixes),
+        )
+
+
+def refresh_clusters(model, geohashes):
+    """
+    Recompute the clusters of every precision containing the given
+    listing geohashes, e.g. the old and new location of a listing.
+    """
+    prefixes = {
+        geohash[:MAX_CLUSTER_PRECISION] for geohash in geohashes if geohash
+    }
+    if prefixes:
+        _build_clusters(model, prefixes)
+
+
+@transaction.atomic
+def rebuild_clusters(model):
+    """Drop and rebuild every cluster of a listing model"""
+    ListingCluster.objects.filter(kind=CLUSTER_KINDS[model]).delete()
+    _build_clusters(model)
+
+
+def stored_clusters(model, precision, south, west, north, east):
+    """
+    Returns:
+        QuerySet: the stored clusters of a precision whose centroid is
+        inside a bounding box.
+    """
+    return ListingCluster.objects.filter(
+        cells_q(south, west, north, east, field="cell",
+                max_precision=precision),
+        kind=CLUSTER_KINDS[model],
+        precision=precision,
+        latitude__range=(south, north),
+        longitude__range=(west, east),
+    ).order_by("cell")
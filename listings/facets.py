@@ -0,0 +1,219 @@
+"""
+Facet counts for the listing search filters.
+
+For every facet (type, bedrooms, amenity, ...) the filter UI shows how
+many listings match each value, given the other filters of the request.
+Following the usual convention, a facet ignores its own filter, so that
+picking "house" still shows how many apartments there are.
+
+Facets whose filter is not in the request share the same listings, so
+they are counted together in one conditional aggregation query; each
+facet with an active filter needs its own. Amenities are counted with a
+grouped query over the amenities join table. Results are cached for
+FACETS_CACHE_SECONDS under a key built from the normalized query
+parameters and the listing cache versions, so listing changes show up
+at once.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from re_drf_api.cache import (
+    normalized_query, scope_versions, shared_cache_configured
+)
+from .models import Listing
+
+
+FACETS_CACHE_SECONDS = 300
+
+# Query parameters that do not filter the listings
+IGNORED_PARAMS = {
+    "format", "page", "page_size", "ordering", "pagination", "cursor",
+    "view", "fields", "omit",
+}
+
+
+def _choice_buckets(field, choices):
+    return [
+        (value, str(label), Q(**{field: value}))
+        for value, label in choices
+    ]
+
+
+def _bedroom_buckets():
+    buckets = [(count, str(count), Q(bedrooms=count)) for count in range(5)]
+    buckets.append(("5+", "5+", Q(bedrooms__gte=5)))
+    return buckets
+
+
+# name: (query parameters of the facet's own filter, buckets), where a
+# bucket is (value, label, condition) and amenities have no fixed buckets
+LISTING_FACETS = {
+    "type": (
+        ["type"],
+        _choice_buckets("type", Listing.type_filter_choices),
+    ),
+    "sub_type": (
+        ["sub_type"],
+        _choice_buckets("sub_type", Listing.sub_type_filter_choices),
+    ),
+    "sale_type": (
+        ["sale_type"],
+        _choice_buckets("sale_type", Listing.sale_type_filter_choices),
+    ),
+    "bedrooms": (
+        ["bedrooms", "min_bedrooms", "max_bedrooms"],
+        _bedroom_buckets(),
+    ),
+    "energy_class": (
+        ["energy_class"],
+        _choice_buckets(
+            "energy_class", Listing.energy_class_filter_choices),
+    ),
+    "heating_system": (
+        ["heating_system"],
+        _choice_buckets("heating_system", Listing.heating_system_choices),
+    ),
+    "amenities": (["amenities"], None),
+}
+
+SHORT_TERM_FACETS = {
+    "bedrooms": (
+        ["bedrooms", "min_bedrooms", "max_bedrooms"],
+        _bedroom_buckets(),
+    ),
+    "amenities": (["amenities"], None),
+}
+
+
+def facet_params(query_params):
+    """
+    Returns:
+        QueryDict: the filtering query parameters, without empty values,
+        sorted so equivalent requests share a cache key.
+    """
+    params = normalized_query(query_params)
+    for key in IGNORED_PARAMS:
+        params.pop(key, None)
+    return params
+
+
+def facets_cache_key(model, params, scopes):
+    digest = hashlib.sha1(params.urlencode().encode()).hexdigest()
+    return (
+        f"facets:{model._meta.label_lower}:{scope_versions(scopes)}:"
+        f"{digest}"
+    )
+
+
+def amenity_counts(listings):
+    """
+    Returns:
+        list: [{"value": amenity id, "label": name, "count": int}] for the
+        amenities of the given listings, by name.
+    """
+    field = listings.model._meta.get_field("amenities")
+    amenity = field.m2m_reverse_field_name()
+    rows = field.remote_field.through.objects.filter(
+        **{f"{field.m2m_field_name()}__in": listings.values("pk")}
+    ).exclude(
+        **{f"{amenity}__name": ""}
+    ).values(
+        amenity, f"{amenity}__name"
+    ).annotate(
+        count=Count("pk")
+    ).order_by(f"{amenity}__name")
+
+    return [
+        {
+            "value": row[amenity],
+            "label": row[f"{amenity}__name"],
+            "count": row["count"],
+        }
+        for row in rows
+    ]
+
+
+def facet_counts(facets, params, filter_listings):
+    """
+    Count the listings matching each value of each facet.
+
+    Args:
+        facets: LISTING_FACETS or SHORT_TERM_FACETS.
+        params: the normalized query parameters (see facet_params).
+        filter_listings: callable returning the listings matching a
+            QueryDict of query parameters.
+
+    Returns:
+        dict: {
+            "count": int,  # listings matching every filter
+            "facets": {
+                name: [{"value": ..., "label": str, "count": int}],
+            },
+        }
+    """
+    # Facets ignoring the same filters count the same listings
+    groups = {frozenset(): []}
+    for name, (own_params, buckets) in facets.items():
+        relaxed = frozenset(param for param in own_params if param in params)
+        groups.setdefault(relaxed, []).append(name)
+
+    total = 0
+    counts = {}
+    for relaxed, names in groups.items():
+        data = params.copy()
+        for param in relaxed:
+            data.pop(param)
+        listings = filter_listings(data).order_by()
+
+        aggregates = {"total": Count("pk")} if not relaxed else {}
+        for name in names:
+            buckets = facets[name][1]
+            if buckets is None:
+                counts[name] = amenity_counts(listings)
+                continue
+            for index, (value, label, condition) in enumerate(buckets):
+                aggregates[f"facet_{name}_{index}"] = Count(
+                    "pk", filter=condition)
+        if not aggregates:
+            continue
+
+        row = listings.aggregate(**aggregates)
+        total = row.get("total", total)
+        for name in names:
+            buckets = facets[name][1]
+            if buckets is None:
+                continue
+            counts[name] = [
+                {
+                    "value": value,
+                    "label": label,
+                    "count": row[f"facet_{name}_{index}"],
+                }
+                for index, (value, label, condition) in enumerate(buckets)
+            ]
+
+    return {
+        "count": total,
+        "facets": {name: counts[name] for name in facets},
+    }
+
+
+def cached_facet_counts(model, facets, query_params, filter_listings,
+                        scopes):
+    """
+    facet_counts, cached by normalized query parameters and the versions
+    of the response cache `scopes` (see re_drf_api/cache.py). Not
+    cached unless the cache is shared by every worker process.
+    """
+    params = facet_params(query_params)
+    if not shared_cache_configured():
+        return facet_counts(facets, params, filter_listings)
+
+    key = facets_cache_key(model, params, scopes)
+    data = cache.get(key)
+    if data is None:
+        data = facet_counts(facets, params, filter_listings)
+        cache.set(key, data, FACETS_CACHE_SECONDS)
+    return data
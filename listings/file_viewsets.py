@@ -17,6 +17,7 @@ from listings.file_serializers import (
     ListingFileSerializer,
     ShortTermListingFileSerializer
 )
+from listings.blobs import STORAGE, is_tracked
 from re_drf_api.permissions import IsAdminUser
 
 
@@ -148,8 +149,10 @@ class BaseFileViewSet(viewsets.ModelViewSet):
         """
         instance = self.get_object()
 
-        # Delete the actual file from storage
-        if instance.file:
+        # Delete the actual file from storage. Deduplicated files may be
+        # shared; they are deleted with their last reference instead
+        # (listings/signals.py)
+        if instance.file and not is_tracked(STORAGE, name=instance.file.name):
             try:
                 instance.file.delete(save=False)
             except Exception as e:
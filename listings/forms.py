@@ -1,5 +1,7 @@
+from .blobs import BACKBLAZE, release_blob
 from .utils import generate_unique_filename
-from .services import upload_to_backblaze
+from .uploads import store_image
+from .variants import reset_variants
 from .models import Images, ShortTermListing
 from django.utils.safestring import mark_safe
 from django import forms
@@ -52,16 +54,25 @@ class ImagesAdminForm(forms.ModelForm):
         fields = ['listing', 'url', 'is_first', 'order']
 
     def save(self, commit=True):
-        """Upload file to Backblaze and save URL to instance."""
+        """
+        Upload file to Backblaze and save URL to instance. Content that
+        is already stored is reused instead (see listings/blobs.py).
+        """
         instance = super().save(commit=False)
         file = self.cleaned_data.get('file')
 
         if file:
             filename = generate_unique_filename(
+                "listings",
                 instance.listing.id,
-                instance.listing.id + 1
+                instance.order or 0
             )
-            file_url = upload_to_backblaze(file, filename)
+            file_url = store_image(file, filename)
+            if instance.pk and file_url == self.initial.get('url'):
+                # Same content again: the image keeps its one reference
+                release_blob(BACKBLAZE, url=file_url)
+            else:
+                reset_variants(instance)
             instance.url = file_url
 
         if commit:
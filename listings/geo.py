@@ -0,0 +1,275 @@
+"""
+Map search over listings.
+
+Listing and ShortTermListing keep the geohash of their coordinates in an
+indexed `geohash` column. A bounding box is covered by at most
+MAX_BBOX_CELLS geohash cells, turned into index range scans, and only
+the rows found there are tested against the exact box. Distances to a
+point are computed by the database in the same query (haversine), so
+the listings never have to be loaded to be filtered or sorted.
+"""
+from math import cos, floor, radians
+
+from django.db.models import F, Q, Value
+from django.db.models.functions import (
+    ASin, Cos, Least, Power, Radians, Sin, Sqrt
+)
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# About 5 metres
+GEOHASH_PRECISION = 9
+MAX_BBOX_CELLS = 32
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+DEFAULT_RADIUS_KM = 10
+MAX_RADIUS_KM = 500
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """
+    Returns:
+        str: the geohash of a point, `precision` characters long.
+    """
+    ranges = {"lat": [-90.0, 90.0], "lng": [-180.0, 180.0]}
+    chars = []
+    bits = bit_count = 0
+    axis = "lng"
+    while len(chars) < precision:
+        value = longitude if axis == "lng" else latitude
+        low, high = ranges[axis]
+        middle = (low + high) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            ranges[axis][0] = middle
+        else:
+            ranges[axis][1] = middle
+        axis = "lat" if axis == "lng" else "lng"
+
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = bit_count = 0
+    return "".join(chars)
+
+
+def location_geohash(latitude, longitude):
+    """
+    Returns:
+        str: the geohash stored for a listing, "" when it has no location
+        (unset, or left at the 0, 0 default).
+    """
+    if latitude is None or longitude is None:
+        return ""
+    if latitude == 0 and longitude == 0:
+        return ""
+    return encode_geohash(latitude, longitude)
+
+
+def _cell_size(precision):
+    """(height, width) in degrees of the geohash cells of a precision"""
+    lat_bits = 5 * precision // 2
+    lng_bits = 5 * precision - lat_bits
+    return 180 / 2 ** lat_bits, 360 / 2 ** lng_bits
+
+
+def covering_cells(south, west, north, east, max_precision=GEOHASH_PRECISION):
+    """
+    The finest geohash cells, up to `max_precision` characters, covering
+    a bounding box, at most MAX_BBOX_CELLS of them.
+
+    Returns:
+        list: sorted geohash prefixes, or None when the box is too large
+        for the cells to narrow anything down.
+    """
+    for precision in range(max_precision, 0, -1):
+        height, width = _cell_size(precision)
+        last_row = round(180 / height) - 1
+        last_col = round(360 / width) - 1
+        rows = range(floor((south + 90) / height),
+                     min(floor((north + 90) / height), last_row) + 1)
+        cols = range(floor((west + 180) / width),
+                     min(floor((east + 180) / width), last_col) + 1)
+        if len(rows) * len(cols) <= MAX_BBOX_CELLS:
+            return sorted({
+                encode_geohash(
+                    -90 + (row + 0.5) * height,
+                    -180 + (col + 0.5) * width,
+                    precision,
+                )
+                for row in rows
+                for col in cols
+            })
+    return None
+
+
+def _cell_ranges(cells):
+    """
+    Merge sorted cells of one precision into (first, last) runs of
+    consecutive cells.
+    """
+    runs = []
+    for cell in cells:
+        if runs:
+            first, last = runs[-1]
+            if (last[:-1] == cell[:-1] and
+                    BASE32.index(cell[-1]) == BASE32.index(last[-1]) + 1):
+                runs[-1] = (first, cell)
+                continue
+        runs.append((cell, cell))
+    return runs
+
+
+def cells_q(south, west, north, east, field="geohash",
+            max_precision=GEOHASH_PRECISION):
+    """
+    Returns:
+        Q: index range lookups on a geohash `field` of at most
+        `max_precision` characters, matching at least the geohashes
+        inside the box.
+    """
+    cells = covering_cells(south, west, north, east, max_precision)
+    if cells is None:
+        return Q()
+    in_cells = Q()
+    for first, last in _cell_ranges(cells):
+        # "{" sorts after every geohash character
+        in_cells |= Q(
+            **{f"{field}__gte": first, f"{field}__lt": last + "{"})
+    return in_cells
+
+
+def within_bbox(queryset, south, west, north, east):
+    """Listings located inside a bounding box"""
+    queryset = queryset.filter(cells_q(south, west, north, east))
+    return queryset.exclude(geohash="").filter(
+        latitude__range=(south, north),
+        longitude__range=(west, east),
+    )
+
+
+def distance_km(latitude, longitude):
+    """
+    Returns:
+        Expression: the haversine distance in km from each listing to a
+        point.
+    """
+    lat = radians(latitude)
+    half_dlat = (Radians(F("latitude")) - Value(lat)) / 2
+    half_dlng = (Radians(F("longitude")) - Value(radians(longitude))) / 2
+    haversine = (
+        Power(Sin(half_dlat), 2) +
+        Value(cos(lat)) * Cos(Radians(F("latitude"))) *
+        Power(Sin(half_dlng), 2)
+    )
+    # Rounding can push the haversine just above 1
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(Least(haversine, Value(1.0))))
+
+
+def within_radius(queryset, latitude, longitude, radius_km):
+    """
+    Listings at most `radius_km` from a point, annotated with their
+    `distance_km`.
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    lat_cos = cos(radians(latitude))
+    dlng = 180 if lat_cos < 1e-6 else min(
+        radius_km / (KM_PER_DEGREE * lat_cos), 180)
+    queryset = within_bbox(
+        queryset,
+        max(latitude - dlat, -90),
+        max(longitude - dlng, -180),
+        min(latitude + dlat, 90),
+        min(longitude + dlng, 180),
+    )
+    return queryset.annotate(
+        distance_km=distance_km(latitude, longitude)
+    ).filter(distance_km__lte=radius_km)
+
+
+def _parse_floats(value, count):
+    try:
+        values = [float(number) for number in value.split(",")]
+    except ValueError:
+        values = []
+    if len(values) != count:
+        raise ValidationError(f"Expected {count} comma-separated numbers.")
+    return values
+
+
+def _check_point(latitude, longitude):
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValidationError("Coordinates out of range.")
+
+
+def parse_bbox(value):
+    """
+    Returns:
+        tuple: (south, west, north, east) from "south,west,north,east".
+    """
+    south, west, north, east = _parse_floats(value, 4)
+    _check_point(south, west)
+    _check_point(north, east)
+    if south > north or west > east:
+        raise ValidationError("Expected south,west,north,east.")
+    return south, west, north, east
+
+
+def parse_point(value):
+    """
+    Returns:
+        tuple: (latitude, longitude) from "lat,lng".
+    """
+    latitude, longitude = _parse_floats(value, 2)
+    _check_point(latitude, longitude)
+    return latitude, longitude
+
+
+def parse_radius(value):
+    radius_km, = _parse_floats(value, 1)
+    if not 0 < radius_km <= MAX_RADIUS_KM:
+        raise ValidationError(f"Must be between 0 and {MAX_RADIUS_KM} km.")
+    return radius_km
+
+
+class GeoFilter(filters.BaseFilterBackend):
+    """
+    Map filters:
+
+    - bbox=south,west,north,east: listings inside the box
+    - near=lat,lng&radius_km=10: listings within radius_km (default 10)
+      of a point, annotated with distance_km and nearest first unless
+      the request sets ?ordering=
+
+    List it after OrderingFilter in filter_backends.
+    """
+
+    def _param(self, params, name, parse):
+        try:
+            return parse(params[name])
+        except ValidationError as error:
+            raise ValidationError({name: error.detail})
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        if "bbox" in params:
+            queryset = within_bbox(
+                queryset, *self._param(params, "bbox", parse_bbox))
+
+        if "near" in params:
+            latitude, longitude = self._param(params, "near", parse_point)
+            radius_km = DEFAULT_RADIUS_KM
+            if "radius_km" in params:
+                radius_km = self._param(params, "radius_km", parse_radius)
+
+            queryset = within_radius(queryset, latitude, longitude, radius_km)
+            if filters.OrderingFilter.ordering_param not in params:
+                queryset = queryset.order_by(
+                    "distance_km", *queryset.query.order_by)
+
+        return queryset
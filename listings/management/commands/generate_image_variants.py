@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from listings.variants import process_pending_variants
+
+
+class Command(BaseCommand):
+    """
+    Generate the resized WebP/AVIF variants of new listing images. Runs
+    once by default, e.g. from a scheduler, or keeps polling with --loop
+    as a worker process, like the `variants` process of the Procfile.
+
+        python manage.py generate_image_variants
+        python manage.py generate_image_variants --loop --interval 10
+    """
+    help = "Generate resized variants of pending listing images"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help="Images per model and batch (default 20)",
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help="Keep polling for new images",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help="Seconds to wait between polls with --loop (default 5)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # Drain everything that is pending before sleeping
+            while True:
+                done, failed = process_pending_variants(
+                    options['batch_size'])
+                if done or failed:
+                    self.stdout.write(
+                        f"Generated variants of {done} image(s), "
+                        f"{failed} failed"
+                    )
+                if not done and not failed:
+                    break
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from listings.clusters import CLUSTER_KINDS, rebuild_clusters
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the map clusters of all sale and short-term listings, e.g.
+    after bulk updates of listing locations or prices, which bypass the
+    signals:
+
+        python manage.py rebuild_listing_clusters
+    """
+    help = "Rebuild the map clusters of all listings"
+
+    def handle(self, *args, **options):
+        for model in CLUSTER_KINDS:
+            rebuild_clusters(model)
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt the clusters of "
+                f"{model._meta.verbose_name_plural}"
+            ))
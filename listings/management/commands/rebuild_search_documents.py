@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from listings.models import Listing, ShortTermListing
+from listings.search import build_search_document, sync_search_index
+from re_drf_api.cache import bump_cache_version
+
+
+class Command(BaseCommand):
+    """
+    Recompute the search document of every listing, e.g. after bulk
+    updates, which bypass Listing.save(), or after changing
+    SEARCH_DOCUMENT_FIELDS:
+
+        python manage.py rebuild_search_documents
+    """
+    help = "Rebuild the full-text search documents of all listings"
+
+    def handle(self, *args, **options):
+        for model in (Listing, ShortTermListing):
+            listings = list(model.objects.all())
+            for listing in listings:
+                listing.search_document = build_search_document(listing)
+                sync_search_index(listing, listing._state.db)
+            model.objects.bulk_update(
+                listings, ["search_document"], batch_size=500)
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt {len(listings)} {model._meta.verbose_name_plural}"
+            ))
+        bump_cache_version("listings", "short_term_listings")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from listings.agent_stats import reconcile_agent_listing_stats
+
+
+class Command(BaseCommand):
+    """
+    Recount the listings of every agent and correct AgentListingStats
+    rows that drifted (e.g. after bulk deletes or raw SQL, which bypass
+    the signals). Safe to run periodically:
+
+        python manage.py reconcile_agent_listing_stats
+    """
+    help = "Recount agent listing counters"
+
+    def handle(self, *args, **options):
+        corrected = reconcile_agent_listing_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Corrected {corrected} agent(s)"
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0066_alter_listingfile_file_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shorttermlisting',
+            name='pricing_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Invalidates outstanding price quotes when bumped'),
+        ),
+    ]
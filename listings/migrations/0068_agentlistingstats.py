@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_agent_listing_stats(apps, schema_editor):
+    Listing = apps.get_model("listings", "Listing")
+    ShortTermListing = apps.get_model("listings", "ShortTermListing")
+    AgentListingStats = apps.get_model("listings", "AgentListingStats")
+
+    counts = {}
+    for index, model in enumerate((Listing, ShortTermListing)):
+        for agent_id, count in model.objects.values_list(
+                "agent_name").annotate(count=models.Count("pk")).order_by():
+            counts.setdefault(agent_id, [0, 0])[index] = count
+
+    AgentListingStats.objects.bulk_create([
+        AgentListingStats(
+            agent_id=agent_id,
+            listing_count=listing_count,
+            short_term_listing_count=short_term_listing_count,
+        )
+        for agent_id, (listing_count, short_term_listing_count)
+        in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('listings', '0067_shorttermlisting_pricing_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgentListingStats',
+            fields=[
+                ('agent', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('listing_count', models.PositiveIntegerField(db_index=True, default=0)),
+                ('short_term_listing_count', models.PositiveIntegerField(db_index=True, default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Agent Listing Stats',
+            },
+        ),
+        migrations.RunPython(
+            populate_agent_listing_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:16
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0068_agentlistingstats'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='images',
+            options={'ordering': ['order', 'pk'], 'verbose_name_plural': 'Images'},
+        ),
+        migrations.AlterModelOptions(
+            name='shorttermimages',
+            options={'ordering': ['order', 'pk'], 'verbose_name_plural': 'Short Term Images'},
+        ),
+    ]
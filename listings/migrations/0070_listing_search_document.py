@@ -0,0 +1,140 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:21
+
+import re
+import unicodedata
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+
+# Frozen copies of the helpers of listings/search.py, so later changes
+# to that module do not alter this migration
+
+SEARCH_CONFIG = "simple"
+
+SEARCH_INDEXES = {
+    "Listing": "listings_listing_search_gin",
+    "ShortTermListing": "listings_stlisting_search_gin",
+}
+
+SEARCH_DOCUMENT_FIELDS = {
+    "Listing": (
+        "type",
+        "sub_type",
+        "municipality",
+        "municipality_gr",
+        "address_street",
+        "address_street_gr",
+        "postcode",
+        "municipality_id",
+        "county_id",
+        "region_id",
+        "description",
+        "description_gr",
+    ),
+    "ShortTermListing": (
+        "title",
+        "title_gr",
+        "municipality",
+        "municipality_gr",
+        "address_street",
+        "address_street_gr",
+        "postcode",
+        "municipality_id",
+        "county_id",
+        "region_id",
+        "description",
+        "description_gr",
+    ),
+}
+
+WORD_RE = re.compile(r"[^\W_]+")
+
+
+def normalize_text(text):
+    decomposed = unicodedata.normalize("NFD", str(text))
+    stripped = "".join(
+        char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(WORD_RE.findall(stripped.casefold()))
+
+
+def build_search_document(instance, fields):
+    values = (getattr(instance, field) for field in fields)
+    return normalize_text(
+        " ".join(str(value) for value in values if value not in (None, ""))
+    )
+
+
+def fts_table(model):
+    return f"{model._meta.db_table}_fts"
+
+
+def search_index(name):
+    return GinIndex(
+        SearchVector("search_document", config=SEARCH_CONFIG), name=name)
+
+
+def populate_search_documents(apps, schema_editor):
+    for model_name in SEARCH_INDEXES:
+        model = apps.get_model("listings", model_name)
+        listings = list(model.objects.all())
+        fields = SEARCH_DOCUMENT_FIELDS[model_name]
+        for listing in listings:
+            listing.search_document = build_search_document(
+                listing, fields)
+        model.objects.bulk_update(
+            listings, ["search_document"], batch_size=500)
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    A GIN index over the tsvector of the document on PostgreSQL, an FTS5
+    table mirroring the documents on SQLite.
+    """
+    vendor = schema_editor.connection.vendor
+    for model_name, index_name in SEARCH_INDEXES.items():
+        model = apps.get_model("listings", model_name)
+        if vendor == "postgresql":
+            schema_editor.add_index(model, search_index(index_name))
+        elif vendor == "sqlite":
+            table = fts_table(model)
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {table} USING fts5(search_document)")
+            schema_editor.execute(
+                f"INSERT INTO {table} (rowid, search_document) "
+                f"SELECT id, search_document FROM {model._meta.db_table}"
+            )
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for model_name, index_name in SEARCH_INDEXES.items():
+        model = apps.get_model("listings", model_name)
+        if vendor == "postgresql":
+            schema_editor.remove_index(model, search_index(index_name))
+        elif vendor == "sqlite":
+            schema_editor.execute(f"DROP TABLE IF EXISTS {fts_table(model)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0069_order_listing_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='shorttermlisting',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(
+            populate_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+# Frozen copy of the geohash encoder of listings/geo.py, so later changes
+# to that module do not alter this migration
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    ranges = {"lat": [-90.0, 90.0], "lng": [-180.0, 180.0]}
+    chars = []
+    bits = bit_count = 0
+    axis = "lng"
+    while len(chars) < precision:
+        value = longitude if axis == "lng" else latitude
+        low, high = ranges[axis]
+        middle = (low + high) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            ranges[axis][0] = middle
+        else:
+            ranges[axis][1] = middle
+        axis = "lat" if axis == "lng" else "lng"
+
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = bit_count = 0
+    return "".join(chars)
+
+
+def location_geohash(latitude, longitude):
+    """Empty for listings without a location (unset or left at 0, 0)"""
+    if latitude is None or longitude is None:
+        return ""
+    if latitude == 0 and longitude == 0:
+        return ""
+    return encode_geohash(latitude, longitude)
+
+
+def populate_geohashes(apps, schema_editor):
+    for model_name in ("Listing", "ShortTermListing"):
+        model = apps.get_model("listings", model_name)
+        listings = list(model.objects.only("latitude", "longitude"))
+        for listing in listings:
+            listing.geohash = location_geohash(
+                listing.latitude, listing.longitude)
+        model.objects.bulk_update(listings, ["geohash"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0070_listing_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='shorttermlisting',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(populate_geohashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:27
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import Substr
+
+
+# Frozen copies of listings.clusters.MIN_CLUSTER_PRECISION and
+# MAX_CLUSTER_PRECISION
+MIN_CLUSTER_PRECISION = 1
+MAX_CLUSTER_PRECISION = 6
+
+
+def aggregate_clusters(queryset, precision):
+    """
+    Cluster the listings of a queryset by geohash prefix in one GROUP BY
+    query (listings.clusters.aggregate_clusters).
+    """
+    rows = queryset.exclude(geohash="").annotate(
+        cluster_cell=Substr("geohash", 1, precision)
+    ).values("cluster_cell").annotate(
+        cluster_count=Count("pk"),
+        centroid_latitude=Avg("latitude"),
+        centroid_longitude=Avg("longitude"),
+        cluster_min_price=Min("price"),
+        cluster_max_price=Max("price"),
+    ).order_by("cluster_cell")
+
+    return [
+        {
+            "cell": row["cluster_cell"],
+            "count": row["cluster_count"],
+            "latitude": row["centroid_latitude"],
+            "longitude": row["centroid_longitude"],
+            "min_price": row["cluster_min_price"],
+            "max_price": row["cluster_max_price"],
+        }
+        for row in rows
+    ]
+
+
+def populate_listing_clusters(apps, schema_editor):
+    ListingCluster = apps.get_model("listings", "ListingCluster")
+    for model_name, kind in (
+            ("Listing", "listing"), ("ShortTermListing", "short_term")):
+        model = apps.get_model("listings", model_name)
+        for precision in range(
+                MIN_CLUSTER_PRECISION, MAX_CLUSTER_PRECISION + 1):
+            ListingCluster.objects.bulk_create(
+                [
+                    ListingCluster(kind=kind, precision=precision, **row)
+                    for row in aggregate_clusters(
+                        model.objects.all(), precision)
+                ],
+                batch_size=500,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0071_listing_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingCluster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('listing', 'Listing'), ('short_term', 'Short-term listing')], max_length=20)),
+                ('cell', models.CharField(max_length=12)),
+                ('precision', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'precision', 'cell'], name='listings_li_kind_beba75_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='listingcluster',
+            constraint=models.UniqueConstraint(fields=('kind', 'cell'), name='unique_listing_cluster_cell'),
+        ),
+        migrations.RunPython(
+            populate_listing_clusters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0072_listingcluster'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='images',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='images',
+            name='variants_attempts',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='images',
+            name='variants_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='shorttermimages',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='shorttermimages',
+            name='variants_attempts',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='shorttermimages',
+            name='variants_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='images',
+            index=models.Index(fields=['variants_status'], name='listings_im_variant_a3973d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shorttermimages',
+            index=models.Index(fields=['variants_status'], name='listings_sh_variant_cd7f6e_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0075_image_variants_claim'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='images',
+            name='variants_retry_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='shorttermimages',
+            name='variants_retry_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
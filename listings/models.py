@@ -5,6 +5,8 @@ from django.core.exceptions import ValidationError
 from decimal import Decimal
 from django.utils.translation import gettext_lazy as _
 from .file_models import ListingFile, ShortTermListingFile  # noqa: F401
+from .geo import location_geohash
+from .search import build_search_document
 
 
 class Owner(models.Model):
@@ -281,6 +283,9 @@ class Listing(models.Model):
     availability = models.DateField(null=True, blank=True)
     latitude = models.FloatField(default=0.0, null=True, blank=True)
     longitude = models.FloatField(default=0.0, null=True, blank=True)
+    # Geohash of the coordinates, "" without a location; see listings/geo.py
+    geohash = models.CharField(
+        max_length=12, blank=True, default="", editable=False, db_index=True)
     service_charge = models.FloatField(
         validators=[validate_zero], default=0, null=True, blank=True)
     renovation_year = models.IntegerField(
@@ -333,10 +338,20 @@ class Listing(models.Model):
         Amenities, blank=True, related_name="listings")
     approved = models.BooleanField(default=False)
     featured = models.BooleanField(default=False)
+    # Normalized text of the searchable fields; see listings/search.py
+    search_document = models.TextField(blank=True, default="", editable=False)
 
     class Meta:
         ordering = ["-created_on"]
 
+    def save(self, *args, **kwargs):
+        self.search_document = build_search_document(self)
+        self.geohash = location_geohash(self.latitude, self.longitude)
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {
+                *kwargs["update_fields"], "search_document", "geohash"}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f" listing AE000{self.id}"
 
@@ -354,6 +369,31 @@ class Images(models.Model):
     order = models.PositiveIntegerField(default=0, null=True)
     description = models.CharField(max_length=255, blank=True, null=True)
 
+    VARIANTS_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    # Resized WebP/AVIF copies, generated by `manage.py
+    # generate_image_variants`; see listings/variants.py
+    variants = models.JSONField(default=dict, blank=True, editable=False)
+    variants_status = models.CharField(
+        max_length=20,
+        choices=VARIANTS_STATUS_CHOICES,
+        default='pending',
+        editable=False,
+    )
+    variants_attempts = models.PositiveSmallIntegerField(
+        default=0, editable=False)
+    # When a worker claimed the image for processing
+    variants_claimed_at = models.DateTimeField(
+        null=True, blank=True, editable=False)
+    # When a failed image is retried
+    variants_retry_at = models.DateTimeField(
+        null=True, blank=True, editable=False)
+
     def __str__(self):
         return f"{self.listing}'s image"
 
@@ -364,6 +404,10 @@ class Images(models.Model):
         super().save(*args, **kwargs)
 
     class Meta:
+        ordering = ["order", "pk"]
+        indexes = [
+            models.Index(fields=["variants_status"]),
+        ]
         verbose_name_plural = "Images"
 
 
@@ -437,6 +481,9 @@ class ShortTermListing(models.Model):
         validators=[validate_zero], null=True, blank=True)
     latitude = models.FloatField(default=0.0, null=True, blank=True)
     longitude = models.FloatField(default=0.0, null=True, blank=True)
+    # Geohash of the coordinates, "" without a location; see listings/geo.py
+    geohash = models.CharField(
+        max_length=12, blank=True, default="", editable=False, db_index=True)
     distance_from_sea = models.IntegerField(
         validators=[validate_zero], default=0, null=True, blank=True)
     distance_from_city = models.IntegerField(
@@ -490,6 +537,23 @@ class ShortTermListing(models.Model):
         default=Decimal('0.00'),
         help_text="One-time service/platform fee in EUR"
     )
+    # Bumped whenever prices, taxes, overrides or seasons change;
+    # see bookings/quotes.py
+    pricing_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Invalidates outstanding price quotes when bumped"
+    )
+    # Normalized text of the searchable fields; see listings/search.py
+    search_document = models.TextField(blank=True, default="", editable=False)
+
+    def save(self, *args, **kwargs):
+        self.search_document = build_search_document(self)
+        self.geohash = location_geohash(self.latitude, self.longitude)
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {
+                *kwargs["update_fields"], "search_document", "geohash"}
+        super().save(*args, **kwargs)
 
     def clean(self):
         super().clean()
@@ -526,6 +590,24 @@ class ShortTermImages(models.Model):
     order = models.PositiveIntegerField(default=0, null=True)
     description = models.CharField(max_length=255, blank=True, null=True)
 
+    # Resized WebP/AVIF copies, generated by `manage.py
+    # generate_image_variants`; see listings/variants.py
+    variants = models.JSONField(default=dict, blank=True, editable=False)
+    variants_status = models.CharField(
+        max_length=20,
+        choices=Images.VARIANTS_STATUS_CHOICES,
+        default='pending',
+        editable=False,
+    )
+    variants_attempts = models.PositiveSmallIntegerField(
+        default=0, editable=False)
+    # When a worker claimed the image for processing
+    variants_claimed_at = models.DateTimeField(
+        null=True, blank=True, editable=False)
+    # When a failed image is retried
+    variants_retry_at = models.DateTimeField(
+        null=True, blank=True, editable=False)
+
     def __str__(self):
         return f"{self.listing}'s image"
 
@@ -538,6 +620,10 @@ class ShortTermImages(models.Model):
         super().save(*args, **kwargs)
 
     class Meta:
+        ordering = ["order", "pk"]
+        indexes = [
+            models.Index(fields=["variants_status"]),
+        ]
         verbose_name_plural = "Short Term Images"
 
 
@@ -580,3 +666,101 @@ class ShortTermSeasonalPrice(models.Model):
             f"{self.listing.id}: {self.start_date} → "
             f"{self.end_date} (€{self.price})"
         )
+
+
+class AgentListingStats(models.Model):
+    """
+    Number of sale and short-term listings of each agent, used to order
+    the listing lists by agent activity. Kept up to date by
+    listings/signals.py and reconciled by
+    `manage.py reconcile_agent_listing_stats`.
+    """
+    agent = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="listing_stats",
+    )
+    listing_count = models.PositiveIntegerField(default=0, db_index=True)
+    short_term_listing_count = models.PositiveIntegerField(
+        default=0, db_index=True)
+
+    class Meta:
+        verbose_name_plural = "Agent Listing Stats"
+
+    def __str__(self):
+        return (
+            f"{self.agent}: {self.listing_count} / "
+            f"{self.short_term_listing_count}"
+        )
+
+
+class ListingCluster(models.Model):
+    """
+    Map cluster of the listings whose geohash starts with `cell`, one row
+    per non-empty cell and precision, for sale and short-term listings
+    separately. Kept up to date by listings/signals.py and rebuilt by
+    `manage.py rebuild_listing_clusters`; see listings/clusters.py.
+    """
+    KIND_CHOICES = [
+        ("listing", "Listing"),
+        ("short_term", "Short-term listing"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    cell = models.CharField(max_length=12)
+    precision = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+    # Centroid of the listings of the cell
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    min_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "cell"], name="unique_listing_cluster_cell"),
+        ]
+        indexes = [
+            models.Index(fields=["kind", "precision", "cell"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.cell} ({self.count})"
+
+
+class StoredBlob(models.Model):
+    """
+    Uploaded content, stored once however many images or files use it.
+    `ref_count` counts the rows pointing at `name`/`url`; the object is
+    deleted from storage with its last reference. See listings/blobs.py.
+    """
+    BACKEND_CHOICES = [
+        ("backblaze", "Backblaze (listing images)"),
+        ("storage", "Default storage (documents)"),
+    ]
+
+    backend = models.CharField(max_length=20, choices=BACKEND_CHOICES)
+    sha256 = models.CharField(max_length=64)
+    # Storage key, and the public URL of Backblaze uploads
+    name = models.CharField(max_length=255)
+    url = models.URLField(max_length=255, blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["backend", "sha256"], name="unique_stored_blob"),
+        ]
+        indexes = [
+            models.Index(fields=["backend", "name"]),
+            models.Index(fields=["url"]),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
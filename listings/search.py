@@ -0,0 +1,183 @@
+"""
+Full-text search over listings.
+
+Listing and ShortTermListing keep a `search_document`: the text of their
+searchable fields in both languages, normalized by `normalize_text` so
+accents and case do not matter ("Αθήνα", "ΑΘΗΝΑ" and "αθηνα" all match).
+Queries are normalized the same way and every term matches as a prefix.
+
+PostgreSQL searches the document through a GIN index on its `simple`
+tsvector and ranks with ts_rank. SQLite (development) mirrors the
+documents into an FTS5 table named `<table>_fts` and ranks with bm25.
+Other engines fall back to unranked `icontains` lookups.
+`manage.py rebuild_search_documents` recomputes every document.
+"""
+import re
+import unicodedata
+
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector
+)
+from django.db import connections
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+
+# Fields indexed in the search document of each model, by model label
+SEARCH_DOCUMENT_FIELDS = {
+    "listings.listing": (
+        "type",
+        "sub_type",
+        "municipality",
+        "municipality_gr",
+        "address_street",
+        "address_street_gr",
+        "postcode",
+        "municipality_id",
+        "county_id",
+        "region_id",
+        "description",
+        "description_gr",
+    ),
+    "listings.shorttermlisting": (
+        "title",
+        "title_gr",
+        "municipality",
+        "municipality_gr",
+        "address_street",
+        "address_street_gr",
+        "postcode",
+        "municipality_id",
+        "county_id",
+        "region_id",
+        "description",
+        "description_gr",
+    ),
+}
+
+SEARCH_CONFIG = "simple"
+
+# Letters and digits; underscores and punctuation separate words
+WORD_RE = re.compile(r"[^\W_]+")
+
+
+def normalize_text(text):
+    """
+    Strip accents (including the Greek tonos and dialytika), fold case
+    and collapse everything but letters and digits into single spaces.
+    """
+    decomposed = unicodedata.normalize("NFD", str(text))
+    stripped = "".join(
+        char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(WORD_RE.findall(stripped.casefold()))
+
+
+def build_search_document(instance):
+    """
+    Returns:
+        str: the normalized search document of a listing.
+    """
+    values = (
+        getattr(instance, field)
+        for field in SEARCH_DOCUMENT_FIELDS[instance._meta.label_lower]
+    )
+    return normalize_text(
+        " ".join(str(value) for value in values if value not in (None, ""))
+    )
+
+
+def fts_table(model):
+    return f"{model._meta.db_table}_fts"
+
+
+def sync_search_index(instance, using):
+    """Mirror the search document of a listing into the SQLite FTS table"""
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    table = fts_table(type(instance))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [instance.pk])
+        cursor.execute(
+            f"INSERT INTO {table} (rowid, search_document) VALUES (%s, %s)",
+            [instance.pk, instance.search_document],
+        )
+
+
+def remove_from_search_index(instance, using):
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {fts_table(type(instance))} WHERE rowid = %s",
+            [instance.pk],
+        )
+
+
+def search_listings(queryset, query):
+    """
+    Filter a listing queryset down to the matches of a free-text query
+    and annotate them with `search_rank` (higher is better).
+
+    Returns:
+        QuerySet: the filtered queryset, unchanged for an empty query.
+    """
+    terms = normalize_text(query).split()
+    if not terms:
+        return queryset
+
+    vendor = connections[queryset.db].vendor
+    if vendor == "postgresql":
+        # Same expression as the GIN index of migration 0070
+        vector = SearchVector("search_document", config=SEARCH_CONFIG)
+        search_query = SearchQuery(
+            " & ".join(f"{term}:*" for term in terms),
+            config=SEARCH_CONFIG,
+            search_type="raw",
+        )
+        return queryset.annotate(
+            search_vector=vector,
+            search_rank=SearchRank(vector, search_query),
+        ).filter(search_vector=search_query)
+
+    if vendor == "sqlite":
+        table = fts_table(queryset.model)
+        match = " AND ".join(f'"{term}"*' for term in terms)
+        return queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [match])
+        ).annotate(
+            # bm25() is lower for better matches
+            search_rank=RawSQL(
+                f"SELECT -bm25({table}) FROM {table} "
+                f"WHERE {table} MATCH %s "
+                f"AND rowid = {queryset.model._meta.db_table}.id",
+                [match],
+                output_field=FloatField(),
+            )
+        )
+
+    for term in terms:
+        queryset = queryset.filter(search_document__icontains=term)
+    return queryset.annotate(search_rank=Value(0.0))
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    ?search= over the listing search document. Results are ordered by
+    relevance unless the request sets ?ordering=, so list it after
+    OrderingFilter in filter_backends.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "")
+        if not normalize_text(query):
+            return queryset
+
+        queryset = search_listings(queryset, query)
+        if filters.OrderingFilter.ordering_param not in request.query_params:
+            queryset = queryset.order_by(
+                "-search_rank", *queryset.query.order_by)
+        return queryset
@@ -3,13 +3,19 @@ from .models import (
     Listing, Images, Amenities, Owner, OwnerFile,
     ShortTermListing, ShortTermImages, ShortTermPriceOverride
 )
+from .file_models import ListingFile, ShortTermListingFile
 from .file_serializers import (
     ListingFileListSerializer, ShortTermListingFileSerializer
 )
 from django.core.files.images import get_image_dimensions
-from .services import upload_to_backblaze
-from django.db.models import Max
+from .uploads import create_images, stage_images
+from .variants import image_srcset
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Prefetch, Subquery
+from re_drf_api.serializers import SparseFieldsetMixin
 from .utils import generate_unique_filename
+from .geo import parse_bbox
+from bookings.utils import MAX_STAY_NIGHTS
 
 
 def validate_images(value):
@@ -94,12 +100,21 @@ class ImagesSerializer(serializers.ModelSerializer):
         fields (list): The fields to include in the serialized output.
     """
 
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Images
-        fields = ["id", "listing", "url", "is_first", "order", "description"]
+        fields = [
+            "id", "listing", "url", "is_first", "order", "description",
+            "variants", "srcset",
+        ]
+        read_only_fields = ["variants"]
 
+    def get_srcset(self, obj):
+        return image_srcset(obj.variants)
 
-class ListingSerializer(serializers.ModelSerializer):
+
+class ListingSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer class for the Listing model.
 
@@ -164,6 +179,23 @@ class ListingSerializer(serializers.ModelSerializer):
     )
     files = ListingFileListSerializer(many=True, read_only=True)
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Load everything the serializer reads in a constant number of
+        queries, whatever the number of listings.
+        """
+        return queryset.select_related(
+            "agent_name__profile",
+        ).prefetch_related(
+            "images",
+            "amenities",
+            Prefetch(
+                "files",
+                queryset=ListingFile.objects.select_related("uploaded_by"),
+            ),
+        )
+
     def get_is_owner(self, obj):
         request = self.context.get("request")
         if request and hasattr(request, "user"):
@@ -180,34 +212,50 @@ class ListingSerializer(serializers.ModelSerializer):
         image_descriptions = request.data.getlist('image_descriptions', [])
         is_first_image_idx = int(request.data.get('is_first', 0))
 
-        # Create the Listing object
-        listing = Listing.objects.create(**validated_data)
-        listing.amenities.set(amenities)
+        # Upload images to Backblaze concurrently, before the
+        # transaction opens. The listing has no id yet, so they go to
+        # the "new" folder
         folder = "listings"
+        filenames = []
+        fields = []
+        for idx in range(len(uploaded_images)):
+            filenames.append(generate_unique_filename(
+                folder, "new", idx + 1))
+
+            # Get order and description for this image
+            order = int(image_orders[idx]) if idx < len(
+                image_orders) else idx
+            is_first = (is_first_image_idx == idx)
+            description = image_descriptions[idx] if idx < len(
+                image_descriptions) else ""
+            fields.append({
+                "is_first": is_first,
+                "order": order,
+                "description": description,  # ← SAVE DESCRIPTION
+            })
+
+        try:
+            staged = stage_images(uploaded_images, filenames)
+        except Exception as e:
+            raise serializers.ValidationError(
+                f"File upload failed: {str(e)}")
 
-        # Upload images to Backblaze and create Image objects
-        for idx, uploaded_image in enumerate(uploaded_images):
-            filename = generate_unique_filename(folder, listing.id, idx + 1)
-            try:
-                file_url = upload_to_backblaze(uploaded_image, filename)
-
-                # Get order and description for this image
-                order = int(image_orders[idx]) if idx < len(
-                    image_orders) else idx
-                is_first = (is_first_image_idx == idx)
-                description = image_descriptions[idx] if idx < len(
-                    image_descriptions) else ""
-
-                Images.objects.create(
-                    listing=listing,
-                    url=file_url,
-                    is_first=is_first,
-                    order=order,
-                    description=description,  # ← SAVE DESCRIPTION
-                )
-            except Exception as e:
-                raise serializers.ValidationError(
-                    f"File upload failed: {str(e)}")
+        try:
+            with transaction.atomic():
+                # Create the Listing object
+                listing = Listing.objects.create(**validated_data)
+                listing.amenities.set(amenities)
+
+                try:
+                    create_images(Images, listing, staged, fields)
+                except Exception as e:
+                    raise serializers.ValidationError(
+                        f"File upload failed: {str(e)}")
+        except Exception:
+            # The rows were rolled back; delete the files uploaded for
+            # them
+            staged.discard()
+            raise
 
         return listing
 
@@ -232,83 +280,105 @@ class ListingSerializer(serializers.ModelSerializer):
         new_image_orders = request.data.getlist('image_orders', [])
         new_image_descriptions = request.data.getlist('image_descriptions', [])
 
-        listing_owner = validated_data.pop("listing_owner", None)
-        if listing_owner is not None:
-            instance.listing_owner = listing_owner
-
-        # Update amenities if provided
-        if amenities is not None:
-            instance.amenities.set(amenities)
-
-        # === 1. DELETE IMAGES ===
-        if images_to_delete:
-            for image_id in images_to_delete:
-                try:
-                    image = Images.objects.get(
-                        id=int(image_id), listing=instance)
-                    # Optionally delete from Backblaze here
-                    image.delete()
-                except Images.DoesNotExist:
-                    pass
-
-        # === 2. UPDATE EXISTING IMAGES (ORDER + DESCRIPTION) ===
-        if existing_image_ids:
-            for idx, image_id in enumerate(existing_image_ids):
-                try:
-                    image = Images.objects.get(
-                        id=int(image_id), listing=instance)
-
-                    # Update order
-                    if idx < len(existing_image_orders):
-                        image.order = int(existing_image_orders[idx])
-
-                    # Update description ← IMPORTANT!
-                    if idx < len(existing_image_descriptions):
-                        image.description = existing_image_descriptions[idx]
-
-                    # Update is_first based on order
-                    image.is_first = (image.order == 0)
-
-                    image.save()
-                except Images.DoesNotExist:
-                    pass
-                except (ValueError, TypeError) as e:
-                    raise serializers.ValidationError(
-                        f"Error updating image {image_id}: {str(e)}")
-
-        # === 3. ADD NEW IMAGES ===
+        # === UPLOAD NEW IMAGES ===
+        # Uploaded before the transaction opens, so that it does not
+        # stay open while files travel to Backblaze
         folder = "listings"
+        staged = None
         if uploaded_images:
-            # Get the max order from ALL remaining images
-            max_order = instance.images.aggregate(
+            # Get the max order from the images that remain
+            max_order = instance.images.exclude(
+                id__in=[int(image_id) for image_id in images_to_delete]
+            ).aggregate(
                 max_order=Max('order')
             )['max_order'] or -1
 
-            for idx, uploaded_image in enumerate(uploaded_images):
-                filename = generate_unique_filename(
-                    folder, instance.id, max_order + idx + 1)
-                try:
-                    file_url = upload_to_backblaze(uploaded_image, filename)
-
-                    # Get order and description
-                    order = int(new_image_orders[idx]) if idx < len(
-                        new_image_orders) else (max_order + idx + 1)
-                    description = new_image_descriptions[idx] if idx < len(
-                        new_image_descriptions) else ""
-
-                    Images.objects.create(
-                        listing=instance,
-                        url=file_url,
-                        is_first=(order == 0),
-                        order=order,
-                        description=description,  # ← SAVE DESCRIPTION
-                    )
-                except Exception as e:
-                    raise serializers.ValidationError(
-                        f"File upload failed: {str(e)}")
+            filenames = []
+            fields = []
+            for idx in range(len(uploaded_images)):
+                filenames.append(generate_unique_filename(
+                    folder, instance.id, max_order + idx + 1))
+
+                # Get order and description
+                order = int(new_image_orders[idx]) if idx < len(
+                    new_image_orders) else (max_order + idx + 1)
+                description = new_image_descriptions[idx] if idx < len(
+                    new_image_descriptions) else ""
+                fields.append({
+                    "is_first": (order == 0),
+                    "order": order,
+                    "description": description,  # ← SAVE DESCRIPTION
+                })
 
-        # Call the parent class update method
-        return super().update(instance, validated_data)
+            try:
+                staged = stage_images(uploaded_images, filenames)
+            except Exception as e:
+                raise serializers.ValidationError(
+                    f"File upload failed: {str(e)}")
+
+        try:
+            with transaction.atomic():
+                listing_owner = validated_data.pop("listing_owner", None)
+                if listing_owner is not None:
+                    instance.listing_owner = listing_owner
+
+                # Update amenities if provided
+                if amenities is not None:
+                    instance.amenities.set(amenities)
+
+                # === 1. DELETE IMAGES ===
+                if images_to_delete:
+                    for image_id in images_to_delete:
+                        try:
+                            image = Images.objects.get(
+                                id=int(image_id), listing=instance)
+                            # Optionally delete from Backblaze here
+                            image.delete()
+                        except Images.DoesNotExist:
+                            pass
+
+                # === 2. UPDATE EXISTING IMAGES (ORDER + DESCRIPTION) ===
+                if existing_image_ids:
+                    for idx, image_id in enumerate(existing_image_ids):
+                        try:
+                            image = Images.objects.get(
+                                id=int(image_id), listing=instance)
+
+                            # Update order
+                            if idx < len(existing_image_orders):
+                                image.order = int(existing_image_orders[idx])
+
+                            # Update description ← IMPORTANT!
+                            if idx < len(existing_image_descriptions):
+                                image.description = (
+                                    existing_image_descriptions[idx])
+
+                            # Update is_first based on order
+                            image.is_first = (image.order == 0)
+
+                            image.save()
+                        except Images.DoesNotExist:
+                            pass
+                        except (ValueError, TypeError) as e:
+                            raise serializers.ValidationError(
+                                f"Error updating image {image_id}: {str(e)}")
+
+                # === 3. ADD NEW IMAGES ===
+                if staged:
+                    try:
+                        create_images(Images, instance, staged, fields)
+                    except Exception as e:
+                        raise serializers.ValidationError(
+                            f"File upload failed: {str(e)}")
+
+                # Call the parent class update method
+                return super().update(instance, validated_data)
+        except Exception:
+            # The rows were rolled back; delete the files uploaded for
+            # them
+            if staged:
+                staged.discard()
+            raise
 
     class Meta:
         model = Listing
@@ -379,12 +449,6 @@ class ListingSerializer(serializers.ModelSerializer):
             "files",
         ]
 
-    def to_representation(self, instance):
-        ret = super().to_representation(instance)
-        # Sort by order field
-        ret['images'] = sorted(ret['images'], key=lambda x: x['order'])
-        return ret
-
 
 class ShortTermImagesSerializer(serializers.ModelSerializer):
     """
@@ -395,9 +459,18 @@ class ShortTermImagesSerializer(serializers.ModelSerializer):
     representation of a ShortTermImages object.
     """
 
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = ShortTermImages
-        fields = ["id", "listing", "url", "is_first", "order", "description"]
+        fields = [
+            "id", "listing", "url", "is_first", "order", "description",
+            "variants", "srcset",
+        ]
+        read_only_fields = ["variants"]
+
+    def get_srcset(self, obj):
+        return image_srcset(obj.variants)
 
 
 class ShortTermPriceOverrideSerializer(serializers.ModelSerializer):
@@ -406,7 +479,8 @@ class ShortTermPriceOverrideSerializer(serializers.ModelSerializer):
         fields = ["date", "price"]
 
 
-class ShortTermListingSerializer(serializers.ModelSerializer):
+class ShortTermListingSerializer(SparseFieldsetMixin,
+                                 serializers.ModelSerializer):
     """
     Serializer class for the ShortTermListing model.
 
@@ -453,6 +527,25 @@ class ShortTermListingSerializer(serializers.ModelSerializer):
     service_fee_display = serializers.SerializerMethodField()
     files = ShortTermListingFileSerializer(many=True, read_only=True)
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Load everything the serializer reads in a constant number of
+        queries, whatever the number of listings.
+        """
+        return queryset.select_related(
+            "agent_name__profile",
+        ).prefetch_related(
+            "images",
+            "amenities",
+            "price_overrides",
+            Prefetch(
+                "files",
+                queryset=ShortTermListingFile.objects.select_related(
+                    "uploaded_by"),
+            ),
+        )
+
     def get_is_owner(self, obj):
         request = self.context.get("request")
         if request and hasattr(request, "user"):
@@ -472,35 +565,52 @@ class ShortTermListingSerializer(serializers.ModelSerializer):
         image_descriptions = request.data.getlist('image_descriptions', [])
         is_first_image_idx = int(request.data.get('is_first', 0))
 
-        # Create the ShortTermListing object
-        short_term_listing = ShortTermListing.objects.create(**validated_data)
-        short_term_listing.amenities.set(amenities)
+        # Upload images to Backblaze concurrently, before the
+        # transaction opens. The listing has no id yet, so they go to
+        # the "new" folder
         folder = "short_term_listings"
+        filenames = []
+        fields = []
+        for idx in range(len(uploaded_images)):
+            filenames.append(generate_unique_filename(
+                folder, "new", idx + 1))
+
+            # Get order and description for this image
+            order = int(image_orders[idx]) if idx < len(
+                image_orders) else idx
+            is_first = (is_first_image_idx == idx)
+            description = image_descriptions[idx] if idx < len(
+                image_descriptions) else ""
+            fields.append({
+                "is_first": is_first,
+                "order": order,
+                "description": description,  # ← SAVE DESCRIPTION
+            })
+
+        try:
+            staged = stage_images(uploaded_images, filenames)
+        except Exception as e:
+            raise serializers.ValidationError(
+                f"File upload failed: {str(e)}")
 
-        # Upload images to Backblaze and create ShortTermImage objects
-        for idx, uploaded_image in enumerate(uploaded_images):
-            filename = generate_unique_filename(
-                folder, short_term_listing.id, idx + 1)
-            try:
-                file_url = upload_to_backblaze(uploaded_image, filename)
-
-                # Get order and description for this image
-                order = int(image_orders[idx]) if idx < len(
-                    image_orders) else idx
-                is_first = (is_first_image_idx == idx)
-                description = image_descriptions[idx] if idx < len(
-                    image_descriptions) else ""
-
-                ShortTermImages.objects.create(
-                    listing=short_term_listing,
-                    url=file_url,
-                    is_first=is_first,
-                    order=order,
-                    description=description,  # ← SAVE DESCRIPTION
-                )
-            except Exception as e:
-                raise serializers.ValidationError(
-                    f"File upload failed: {str(e)}")
+        try:
+            with transaction.atomic():
+                # Create the ShortTermListing object
+                short_term_listing = ShortTermListing.objects.create(
+                    **validated_data)
+                short_term_listing.amenities.set(amenities)
+
+                try:
+                    create_images(
+                        ShortTermImages, short_term_listing, staged, fields)
+                except Exception as e:
+                    raise serializers.ValidationError(
+                        f"File upload failed: {str(e)}")
+        except Exception:
+            # The rows were rolled back; delete the files uploaded for
+            # them
+            staged.discard()
+            raise
 
         return short_term_listing
 
@@ -533,88 +643,111 @@ class ShortTermListingSerializer(serializers.ModelSerializer):
         new_image_orders = request.data.getlist('image_orders', [])
         new_image_descriptions = request.data.getlist('image_descriptions', [])
 
-        listing_owner = validated_data.pop("listing_owner", None)
-        if listing_owner is not None:
-            instance.listing_owner = listing_owner
-
-        # Update amenities if provided
-        if amenities is not None:
-            instance.amenities.set(amenities)
-
-        # === 1. DELETE IMAGES ===
-        if images_to_delete:
-            for image_id in images_to_delete:
-                try:
-                    image = ShortTermImages.objects.get(
-                        id=int(image_id),
-                        listing=instance
-                    )
-                    # Optionally delete from Backblaze here
-                    # delete_from_backblaze(image.url)
-                    image.delete()
-                except ShortTermImages.DoesNotExist:
-                    pass
-
-        # === 2. UPDATE EXISTING IMAGES (ORDER + DESCRIPTION) ===
-        if existing_image_ids:
-            for idx, image_id in enumerate(existing_image_ids):
-                try:
-                    image = ShortTermImages.objects.get(
-                        id=int(image_id),
-                        listing=instance
-                    )
-
-                    # Update order
-                    if idx < len(existing_image_orders):
-                        image.order = int(existing_image_orders[idx])
-
-                    # Update description ← IMPORTANT!
-                    if idx < len(existing_image_descriptions):
-                        image.description = existing_image_descriptions[idx]
-
-                    # Update is_first based on order
-                    image.is_first = (image.order == 0)
-
-                    image.save()
-                except ShortTermImages.DoesNotExist:
-                    pass
-                except (ValueError, TypeError) as e:
-                    raise serializers.ValidationError(
-                        f"Error updating image {image_id}: {str(e)}")
-
-        # === 3. ADD NEW IMAGES ===
+        # === UPLOAD NEW IMAGES ===
+        # Uploaded before the transaction opens, so that it does not
+        # stay open while files travel to Backblaze
         folder = "short_term_listings"
+        staged = None
         if uploaded_images:
-            # Get the max order from ALL remaining images
-            max_order = instance.images.aggregate(
+            # Get the max order from the images that remain
+            max_order = instance.images.exclude(
+                id__in=[int(image_id) for image_id in images_to_delete]
+            ).aggregate(
                 max_order=Max('order')
             )['max_order'] or -1
 
-            for idx, uploaded_image in enumerate(uploaded_images):
-                filename = generate_unique_filename(
-                    folder, instance.id, max_order + idx + 1)
-                try:
-                    file_url = upload_to_backblaze(uploaded_image, filename)
-
-                    # Get order and description
-                    order = int(new_image_orders[idx]) if idx < len(
-                        new_image_orders) else (max_order + idx + 1)
-                    description = new_image_descriptions[idx] if idx < len(
-                        new_image_descriptions) else ""
-
-                    ShortTermImages.objects.create(
-                        listing=instance,
-                        url=file_url,
-                        is_first=(order == 0),
-                        order=order,
-                        description=description,  # ← SAVE DESCRIPTION
-                    )
-                except Exception as e:
-                    raise serializers.ValidationError(
-                        f"File upload failed: {str(e)}")
+            filenames = []
+            fields = []
+            for idx in range(len(uploaded_images)):
+                filenames.append(generate_unique_filename(
+                    folder, instance.id, max_order + idx + 1))
+
+                # Get order and description
+                order = int(new_image_orders[idx]) if idx < len(
+                    new_image_orders) else (max_order + idx + 1)
+                description = new_image_descriptions[idx] if idx < len(
+                    new_image_descriptions) else ""
+                fields.append({
+                    "is_first": (order == 0),
+                    "order": order,
+                    "description": description,  # ← SAVE DESCRIPTION
+                })
 
-        # Call the parent class update method
-        return super().update(instance, validated_data)
+            try:
+                staged = stage_images(uploaded_images, filenames)
+            except Exception as e:
+                raise serializers.ValidationError(
+                    f"File upload failed: {str(e)}")
+
+        try:
+            with transaction.atomic():
+                listing_owner = validated_data.pop("listing_owner", None)
+                if listing_owner is not None:
+                    instance.listing_owner = listing_owner
+
+                # Update amenities if provided
+                if amenities is not None:
+                    instance.amenities.set(amenities)
+
+                # === 1. DELETE IMAGES ===
+                if images_to_delete:
+                    for image_id in images_to_delete:
+                        try:
+                            image = ShortTermImages.objects.get(
+                                id=int(image_id),
+                                listing=instance
+                            )
+                            # Optionally delete from Backblaze here
+                            # delete_from_backblaze(image.url)
+                            image.delete()
+                        except ShortTermImages.DoesNotExist:
+                            pass
+
+                # === 2. UPDATE EXISTING IMAGES (ORDER + DESCRIPTION) ===
+                if existing_image_ids:
+                    for idx, image_id in enumerate(existing_image_ids):
+                        try:
+                            image = ShortTermImages.objects.get(
+                                id=int(image_id),
+                                listing=instance
+                            )
+
+                            # Update order
+                            if idx < len(existing_image_orders):
+                                image.order = int(existing_image_orders[idx])
+
+                            # Update description ← IMPORTANT!
+                            if idx < len(existing_image_descriptions):
+                                image.description = (
+                                    existing_image_descriptions[idx])
+
+                            # Update is_first based on order
+                            image.is_first = (image.order == 0)
+
+                            image.save()
+                        except ShortTermImages.DoesNotExist:
+                            pass
+                        except (ValueError, TypeError) as e:
+                            raise serializers.ValidationError(
+                                f"Error updating image {image_id}: {str(e)}")
+
+                # === 3. ADD NEW IMAGES ===
+                if staged:
+                    try:
+                        create_images(
+                            ShortTermImages, instance, staged, fields)
+                    except Exception as e:
+                        raise serializers.ValidationError(
+                            f"File upload failed: {str(e)}")
+
+                # Call the parent class update method
+                return super().update(instance, validated_data)
+        except Exception:
+            # The rows were rolled back; delete the files uploaded for
+            # them
+            if staged:
+                staged.discard()
+            raise
 
     def get_vat_rate_display(self, obj):
         """Convert 0.13 -> 13.0 for display."""
@@ -686,12 +819,6 @@ class ShortTermListingSerializer(serializers.ModelSerializer):
             "files",
         ]
 
-    def to_representation(self, instance):
-        ret = super().to_representation(instance)
-        # Sort by order field
-        ret['images'] = sorted(ret['images'], key=lambda x: x['order'])
-        return ret
-
     def validate(self, data):
         max_guests = data.get("max_guests", 1)
         max_adults = data.get("max_adults", 1)
@@ -705,7 +832,273 @@ class ShortTermListingSerializer(serializers.ModelSerializer):
         return data
 
 
+def cover_image_url(image_model, field="url"):
+    """
+    Subquery selecting the URL (or another field) of a listing's cover
+    image: the image flagged is_first, otherwise the first one by order.
+    """
+    return Subquery(
+        image_model.objects.filter(
+            listing=OuterRef("pk")
+        ).order_by(
+            F("is_first").desc(nulls_last=True), "order", "pk"
+        ).values(field)[:1]
+    )
+
+
+class ListingCardSerializer(SparseFieldsetMixin,
+                            serializers.ModelSerializer):
+    """
+    Compact, read-only representation of a Listing for search result
+    cards: the fields a card shows plus the cover image URL and srcset.
+    Served by ListingList for ?view=card.
+    """
+    cover_image = serializers.ReadOnlyField()
+    cover_image_srcset = serializers.SerializerMethodField()
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Annotate the cover image; nothing else is loaded"""
+        return queryset.annotate(
+            cover_image=cover_image_url(Images),
+            cover_image_variants=cover_image_url(Images, "variants"),
+        )
+
+    def get_cover_image_srcset(self, obj):
+        return image_srcset(getattr(obj, "cover_image_variants", None))
+
+    class Meta:
+        model = Listing
+        fields = [
+            "id",
+            "type",
+            "sub_type",
+            "sale_type",
+            "price",
+            "currency",
+            "municipality",
+            "municipality_gr",
+            "municipality_id",
+            "county_id",
+            "region_id",
+            "floor_area",
+            "land_area",
+            "bedrooms",
+            "bathrooms",
+            "latitude",
+            "longitude",
+            "featured",
+            "created_on",
+            "cover_image",
+            "cover_image_srcset",
+        ]
+        read_only_fields = fields
+
+
+class ShortTermListingCardSerializer(SparseFieldsetMixin,
+                                     serializers.ModelSerializer):
+    """
+    Compact, read-only representation of a ShortTermListing for search
+    result cards. Served by ShortTermListingList for ?view=card.
+    """
+    cover_image = serializers.ReadOnlyField()
+    cover_image_srcset = serializers.SerializerMethodField()
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Annotate the cover image; nothing else is loaded"""
+        return queryset.annotate(
+            cover_image=cover_image_url(ShortTermImages),
+            cover_image_variants=cover_image_url(
+                ShortTermImages, "variants"),
+        )
+
+    def get_cover_image_srcset(self, obj):
+        return image_srcset(getattr(obj, "cover_image_variants", None))
+
+    class Meta:
+        model = ShortTermListing
+        fields = [
+            "id",
+            "title",
+            "title_gr",
+            "price",
+            "currency",
+            "municipality",
+            "municipality_id",
+            "county_id",
+            "region_id",
+            "floor_area",
+            "bedrooms",
+            "bathrooms",
+            "max_guests",
+            "latitude",
+            "longitude",
+            "created_on",
+            "cover_image",
+            "cover_image_srcset",
+        ]
+        read_only_fields = fields
+
+
 class AvailabilityDaySerializer(serializers.Serializer):
     date = serializers.DateField()
     available = serializers.BooleanField()
     price = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+# Maximum number of listings priced by one quote request
+MAX_QUOTE_LISTINGS = 50
+
+
+class QuoteRequestSerializer(serializers.Serializer):
+    """
+    Validates the query parameters of the batch quote endpoint.
+    `ids` is a comma separated list of ShortTermListing ids.
+    """
+    ids = serializers.CharField()
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    guests = serializers.IntegerField(min_value=1, default=1)
+
+    def validate_ids(self, value):
+        try:
+            ids = list(dict.fromkeys(
+                int(pk) for pk in value.split(",") if pk.strip()
+            ))
+        except ValueError:
+            raise serializers.ValidationError(
+                "ids must be a comma separated list of integers")
+        if not ids:
+            raise serializers.ValidationError("At least one id is required")
+        if len(ids) > MAX_QUOTE_LISTINGS:
+            raise serializers.ValidationError(
+                f"At most {MAX_QUOTE_LISTINGS} listings can be quoted "
+                f"at once")
+        return ids
+
+    def validate(self, data):
+        if data["check_out"] <= data["check_in"]:
+            raise serializers.ValidationError({
+                "check_out": "Check-out must be after check-in."
+            })
+        if (data["check_out"] - data["check_in"]).days > MAX_STAY_NIGHTS:
+            raise serializers.ValidationError({
+                "check_out": f"The stay cannot exceed {MAX_STAY_NIGHTS} "
+                             f"nights."
+            })
+        return data
+
+
+class QuoteSerializer(serializers.Serializer):
+    """
+    Price of a stay at one short-term listing, as returned by
+    bookings.utils.calculate_booking_prices. The price fields are null
+    when the listing has no price for some night of the stay
+    (`priceable` is false).
+    """
+    listing = serializers.IntegerField()
+    currency = serializers.CharField()
+    available = serializers.BooleanField()
+    fits_guests = serializers.BooleanField()
+    priceable = serializers.BooleanField()
+    nights = serializers.IntegerField()
+    subtotal = serializers.DecimalField(
+        max_digits=10, decimal_places=2, allow_null=True)
+    vat = serializers.DecimalField(
+        max_digits=10, decimal_places=2, allow_null=True)
+    municipality_tax = serializers.DecimalField(
+        max_digits=10, decimal_places=2, allow_null=True)
+    climate_crisis_fee = serializers.DecimalField(
+        max_digits=10, decimal_places=2, allow_null=True)
+    cleaning_fee = serializers.DecimalField(
+        max_digits=10, decimal_places=2, allow_null=True)
+    service_fee = serializers.DecimalField(
+        max_digits=10, decimal_places=2, allow_null=True)
+    total = serializers.DecimalField(
+        max_digits=10, decimal_places=2, allow_null=True)
+
+
+# Longest window accepted by the flexible dates endpoint
+MAX_FLEXIBLE_WINDOW_DAYS = 186
+
+
+class FlexibleDatesRequestSerializer(serializers.Serializer):
+    """
+    Validates the query parameters of the flexible dates endpoint.
+    """
+    flexible_start = serializers.DateField()
+    flexible_end = serializers.DateField()
+    nights = serializers.IntegerField(min_value=1)
+
+    def validate(self, data):
+        window = (data["flexible_end"] - data["flexible_start"]).days
+        if window < data["nights"]:
+            raise serializers.ValidationError({
+                "flexible_end": "The window must be at least as long as "
+                                "the stay."
+            })
+        if window > MAX_FLEXIBLE_WINDOW_DAYS:
+            raise serializers.ValidationError({
+                "flexible_end": f"The window cannot exceed "
+                                f"{MAX_FLEXIBLE_WINDOW_DAYS} days."
+            })
+        return data
+
+
+class StayQuoteSerializer(serializers.Serializer):
+    """
+    Price of one stay, as returned by bookings.utils.calculate_booking_price
+    plus its dates.
+    """
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    nights = serializers.IntegerField()
+    subtotal = serializers.DecimalField(max_digits=10, decimal_places=2)
+    total = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+class FlexibleStaysSerializer(serializers.Serializer):
+    """
+    Feasible check-in dates of one listing and its cheapest stay.
+    """
+    listing = serializers.IntegerField()
+    currency = serializers.CharField()
+    check_in_dates = serializers.ListField(child=serializers.DateField())
+    cheapest = StayQuoteSerializer(allow_null=True)
+
+
+class MapClustersRequestSerializer(serializers.Serializer):
+    """
+    Validates the query parameters of the map cluster endpoints.
+    """
+    bbox = serializers.CharField(help_text="south,west,north,east")
+    zoom = serializers.IntegerField(min_value=0, max_value=22)
+
+    def validate_bbox(self, value):
+        return parse_bbox(value)
+
+
+class MapClusterSerializer(serializers.Serializer):
+    """
+    One map cluster: the listings whose geohash starts with `cell`.
+    """
+    cell = serializers.CharField()
+    count = serializers.IntegerField()
+    latitude = serializers.FloatField()
+    longitude = serializers.FloatField()
+    min_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, allow_null=True)
+    max_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, allow_null=True)
+
+
+class MapPointSerializer(serializers.Serializer):
+    """
+    One listing shown on its own at high zoom levels.
+    """
+    id = serializers.IntegerField()
+    latitude = serializers.FloatField()
+    longitude = serializers.FloatField()
+    price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, allow_null=True)
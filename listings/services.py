@@ -1,26 +1,102 @@
-from b2sdk.v2 import InMemoryAccountInfo, B2Api
+"""
+Backblaze B2 uploads.
+
+The process keeps one authorized B2Api and bucket handle, created on
+first use and shared by every thread: b2sdk's session and upload URL
+pool are thread-safe, and when the account token expires the session
+re-authorizes with the stored application key and retries the call.
+`reset_backblaze_client` drops the client, e.g. after the credentials
+change.
+"""
 import os
+import threading
 
+from b2sdk.v2 import B2Api, InMemoryAccountInfo
 
-def upload_to_backblaze(file, filename):
-    # Initialize Backblaze B2 API
+
+# B2's smallest part size; a stream upload holds at most UPLOAD_BUFFERS
+# parts in memory
+UPLOAD_PART_SIZE = 5 * 1024 * 1024
+UPLOAD_BUFFERS = 2
+UPLOAD_READ_SIZE = 64 * 1024
+
+_client_lock = threading.Lock()
+_bucket = None
+
+
+def _connect(api_config=None):
     info = InMemoryAccountInfo()
-    b2_api = B2Api(info)
+    if api_config is None:
+        b2_api = B2Api(info)
+    else:
+        b2_api = B2Api(info, api_config=api_config)
 
-    # Authenticate
     application_key_id = os.environ.get('APPlICATION_KEY_ID')
     application_key = os.environ.get('APPLICATION_KEY')
     b2_api.authorize_account('production', application_key_id, application_key)
 
-    # Get the bucket object
-    bucket = b2_api.get_bucket_by_name(os.environ.get('BUCKET_NAME'))
+    return b2_api.get_bucket_by_name(os.environ.get('BUCKET_NAME'))
+
+
+def get_bucket():
+    """
+    Returns:
+        Bucket: the process-wide B2 bucket handle, authorized once.
+    """
+    global _bucket
+    if _bucket is None:
+        with _client_lock:
+            if _bucket is None:
+                _bucket = _connect()
+    return _bucket
+
 
-    # Upload the file's content directly to Backblaze
-    file_content = file.read()  # Read file into memory (binary)
-    bucket.upload_bytes(file_content, filename)
+def reset_backblaze_client(api_config=None):
+    """
+    Drop the shared client; the next upload authorizes again. Pass a
+    b2sdk B2HttpApiConfig (e.g. backed by RawSimulator) to connect
+    right away with it instead.
+    """
+    global _bucket
+    with _client_lock:
+        _bucket = None if api_config is None else _connect(api_config)
+
+
+def upload_to_backblaze(file, filename):
+    """
+    Stream an uploaded file to Backblaze without reading it into memory.
+
+    Uploads Django spooled to disk (TemporaryUploadedFile) are sent from
+    their temp file. Other files are read UPLOAD_PART_SIZE at a time,
+    through at most UPLOAD_BUFFERS buffers. Files larger than a part go
+    up as multipart (large file) uploads.
+
+    Returns:
+        str: the public URL of the file.
+    """
+    bucket = get_bucket()
+
+    if hasattr(file, 'temporary_file_path'):
+        bucket.upload_local_file(file.temporary_file_path(), filename)
+    else:
+        bucket.upload_unbound_stream(
+            file,
+            filename,
+            recommended_upload_part_size=UPLOAD_PART_SIZE,
+            min_part_size=UPLOAD_PART_SIZE,
+            buffers_count=UPLOAD_BUFFERS,
+            read_size=UPLOAD_READ_SIZE,
+        )
 
     # Construct the public file URL
     bucket_name = os.environ.get('BUCKET_NAME')
     file_url = f"https://f003.backblazeb2.com/file/{bucket_name}/{filename}"
 
     return file_url
+
+
+def delete_from_backblaze(filename):
+    """Delete the latest version of an uploaded file"""
+    bucket = get_bucket()
+    file_version = bucket.get_file_info_by_name(filename)
+    bucket.delete_file_version(file_version.id_, filename)
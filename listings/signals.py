@@ -0,0 +1,362 @@
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db.models.signals import (
+    m2m_changed, post_save, pre_delete, pre_save, post_delete
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .agent_stats import refresh_agent_listing_stats
+from .blobs import (
+    BACKBLAZE, STORAGE, acquire_blob, content_hash, find_blobs,
+    register_blob, release_blob,
+)
+from .clusters import refresh_clusters
+from re_drf_api.cache import bump_cache_version
+from .models import (
+    Amenities,
+    Images,
+    Listing,
+    ListingFile,
+    OwnerFile,
+    ShortTermImages,
+    ShortTermListing,
+    ShortTermListingFile,
+    ShortTermPriceOverride,
+    ShortTermSeasonalPrice,
+)
+from .search import remove_from_search_index, sync_search_index
+
+
+# ============================================================================
+# AGENT LISTING COUNTERS (see listings/agent_stats.py)
+# ============================================================================
+
+@receiver(pre_save, sender=Listing)
+@receiver(pre_save, sender=ShortTermListing)
+def remember_previous_listing(sender, instance, **kwargs):
+    """
+    Keep the old agent, location and price, so that changing them
+    recounts both agents and reclusters both locations
+    """
+    previous = None
+    if instance.pk:
+        previous = (
+            sender.objects.filter(pk=instance.pk)
+            .values('agent_name_id', 'geohash', 'price')
+            .first()
+        )
+    previous = previous or {}
+    instance._previous_agent_id = previous.get('agent_name_id')
+    instance._previous_geohash = previous.get('geohash')
+    instance._previous_price = previous.get('price')
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_save, sender=ShortTermListing)
+def count_agent_listings_on_save(sender, instance, created, **kwargs):
+    """Count a new listing, or a listing moved to another agent"""
+    previous_agent_id = getattr(instance, '_previous_agent_id', None)
+    if not created and previous_agent_id == instance.agent_name_id:
+        return
+    refresh_agent_listing_stats([previous_agent_id, instance.agent_name_id])
+
+
+@receiver(post_delete, sender=Listing)
+@receiver(post_delete, sender=ShortTermListing)
+def count_agent_listings_on_delete(sender, instance, origin=None,
+                                   **kwargs):
+    """Uncount a deleted listing, unless its agent is being deleted"""
+    if getattr(origin, 'model', type(origin)) is User:
+        return
+    refresh_agent_listing_stats([instance.agent_name_id])
+
+
+# ============================================================================
+# SEARCH INDEX (see listings/search.py)
+# ============================================================================
+
+@receiver(post_save, sender=Listing)
+@receiver(post_save, sender=ShortTermListing)
+def index_listing_on_save(sender, instance, using, **kwargs):
+    sync_search_index(instance, using)
+
+
+@receiver(post_delete, sender=Listing)
+@receiver(post_delete, sender=ShortTermListing)
+def unindex_listing_on_delete(sender, instance, using, **kwargs):
+    remove_from_search_index(instance, using)
+
+
+# ============================================================================
+# MAP CLUSTERS (see listings/clusters.py)
+# ============================================================================
+
+@receiver(post_save, sender=Listing)
+@receiver(post_save, sender=ShortTermListing)
+def recluster_listing_on_save(sender, instance, created, **kwargs):
+    previous_geohash = getattr(instance, '_previous_geohash', None)
+    if (
+        not created and
+        previous_geohash == instance.geohash and
+        getattr(instance, '_previous_price', None) == instance.price
+    ):
+        return
+    refresh_clusters(sender, [previous_geohash, instance.geohash])
+
+
+@receiver(post_delete, sender=Listing)
+@receiver(post_delete, sender=ShortTermListing)
+def recluster_listing_on_delete(sender, instance, **kwargs):
+    refresh_clusters(sender, [instance.geohash])
+
+
+# ============================================================================
+# LAST MODIFIED (see re_drf_api/conditional.py)
+# ============================================================================
+
+# Related models shown in the listing responses, by listing model
+LISTING_CHILDREN = {
+    Listing: (Images, ListingFile),
+    ShortTermListing: (
+        ShortTermImages,
+        ShortTermListingFile,
+        ShortTermPriceOverride,
+        ShortTermSeasonalPrice,
+    ),
+}
+
+
+def touch_listings(model, listing_ids):
+    """
+    Move the `updated_on` of listings without saving them (and without
+    running their save signals), so their validators change.
+    """
+    model.objects.filter(pk__in=listing_ids).update(updated_on=timezone.now())
+
+
+def touch_parent_listing(sender, instance, **kwargs):
+    """Images, files and prices change their listing's responses"""
+    touch_listings(instance._meta.get_field('listing').related_model,
+                   [instance.listing_id])
+
+
+def touch_listings_on_amenities_change(sender, instance, action, reverse,
+                                       pk_set, **kwargs):
+    """Amenities added to, removed from or cleared on listings"""
+    if not action.startswith("post_"):
+        return
+    model = (Listing if sender is Listing.amenities.through
+             else ShortTermListing)
+    if not reverse:
+        touch_listings(model, [instance.pk])
+    elif pk_set:
+        touch_listings(model, pk_set)
+    else:
+        # Cleared from the amenity's side: the rows are already gone
+        touch_listings(model, getattr(instance, '_previous_listing_ids', ()))
+
+
+@receiver(m2m_changed, sender=Listing.amenities.through)
+@receiver(m2m_changed, sender=ShortTermListing.amenities.through)
+def remember_amenity_listings(sender, instance, action, reverse, **kwargs):
+    """Keep the listings of an amenity about to be cleared"""
+    if action == "pre_clear" and reverse:
+        related_name = ('listings' if sender is Listing.amenities.through
+                        else 'short_term_listings')
+        instance._previous_listing_ids = list(
+            getattr(instance, related_name).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Amenities)
+@receiver(pre_delete, sender=Amenities)
+def touch_listings_on_amenity_change(sender, instance, **kwargs):
+    """Renaming or deleting an amenity changes every listing showing it"""
+    touch_listings(
+        Listing, instance.listings.values_list('pk', flat=True))
+    touch_listings(
+        ShortTermListing,
+        instance.short_term_listings.values_list('pk', flat=True))
+
+
+for children in LISTING_CHILDREN.values():
+    for child in children:
+        post_save.connect(touch_parent_listing, sender=child)
+        post_delete.connect(touch_parent_listing, sender=child)
+
+m2m_changed.connect(
+    touch_listings_on_amenities_change, sender=Listing.amenities.through)
+m2m_changed.connect(
+    touch_listings_on_amenities_change,
+    sender=ShortTermListing.amenities.through)
+
+
+# ============================================================================
+# RESPONSE CACHE (see re_drf_api/cache.py)
+# ============================================================================
+
+# Cache scopes whose responses show each model
+RESPONSE_CACHE_SCOPES = {
+    Listing: ("listings",),
+    Images: ("listings",),
+    ListingFile: ("listings",),
+    ShortTermListing: ("short_term_listings",),
+    ShortTermImages: ("short_term_listings",),
+    ShortTermListingFile: ("short_term_listings",),
+    ShortTermPriceOverride: ("short_term_listings",),
+    ShortTermSeasonalPrice: ("short_term_listings",),
+    Amenities: ("amenities", "listings", "short_term_listings"),
+}
+
+
+def invalidate_cached_responses(sender, **kwargs):
+    bump_cache_version(*RESPONSE_CACHE_SCOPES[sender])
+
+
+def invalidate_cached_amenities(sender, action, **kwargs):
+    """Amenities added to, removed from or cleared on listings"""
+    if action.startswith("post_"):
+        model = (Listing if sender is Listing.amenities.through
+                 else ShortTermListing)
+        bump_cache_version(*RESPONSE_CACHE_SCOPES[model])
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_agents(sender, update_fields=None, **kwargs):
+    """Listing responses show their agent's username"""
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    bump_cache_version("listings", "short_term_listings")
+
+
+for model in RESPONSE_CACHE_SCOPES:
+    post_save.connect(invalidate_cached_responses, sender=model)
+    post_delete.connect(invalidate_cached_responses, sender=model)
+
+m2m_changed.connect(
+    invalidate_cached_amenities, sender=Listing.amenities.through)
+m2m_changed.connect(
+    invalidate_cached_amenities, sender=ShortTermListing.amenities.through)
+
+
+# ============================================================================
+# CONTENT BLOBS (see listings/blobs.py)
+# ============================================================================
+
+@receiver(pre_save, sender=ListingFile)
+@receiver(pre_save, sender=ShortTermListingFile)
+@receiver(pre_save, sender=OwnerFile)
+def deduplicate_file(sender, instance, **kwargs):
+    """
+    Point a newly uploaded file at identical stored content instead of
+    uploading it again. The reference is only counted by register_file
+    once the row is saved, so a failed save does not leak it.
+    """
+    instance._previous_file_name = None
+    if instance.pk:
+        instance._previous_file_name = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list('file', flat=True)
+            .first()
+        )
+
+    instance._new_blob = None
+    instance._reused_blob = None
+    field_file = instance.file
+    if not field_file or field_file._committed:
+        return
+    digest, size = content_hash(field_file)
+    blob = find_blobs(STORAGE, [digest]).get(digest)
+    if blob is not None:
+        instance._reused_blob = (blob, digest, size, field_file.name)
+        # Committed files are not saved to storage by the FileField
+        field_file.name = blob.name
+        field_file._committed = True
+    else:
+        instance._new_blob = (digest, size)
+
+
+@receiver(post_save, sender=ListingFile)
+@receiver(post_save, sender=ShortTermListingFile)
+@receiver(post_save, sender=OwnerFile)
+def register_file(sender, instance, **kwargs):
+    """Count new content, and release the file a row no longer uses"""
+    reused_blob = getattr(instance, '_reused_blob', None)
+    if reused_blob:
+        instance._reused_blob = None
+        blob, digest, size, name = reused_blob
+        if not acquire_blob(blob):
+            # Deleted since pre_save: store the content after all
+            content = instance.file.file
+            content.seek(0)
+            instance.file.save(name, content, save=False)
+            sender.objects.filter(pk=instance.pk).update(
+                file=instance.file.name)
+            instance._new_blob = (digest, size)
+
+    new_blob = getattr(instance, '_new_blob', None)
+    if new_blob:
+        instance._new_blob = None
+        digest, size = new_blob
+        blob, created = register_blob(
+            STORAGE, digest, instance.file.name, size)
+        if not created:
+            # The same content was uploaded concurrently: keep one copy
+            default_storage.delete(instance.file.name)
+            sender.objects.filter(pk=instance.pk).update(file=blob.name)
+            instance.file.name = blob.name
+
+    previous = getattr(instance, '_previous_file_name', None)
+    if previous and previous != instance.file.name:
+        release_blob(STORAGE, name=previous)
+    instance._previous_file_name = instance.file.name
+
+
+@receiver(post_delete, sender=ListingFile)
+@receiver(post_delete, sender=ShortTermListingFile)
+@receiver(post_delete, sender=OwnerFile)
+def release_file(sender, instance, **kwargs):
+    if instance.file:
+        release_blob(STORAGE, name=instance.file.name)
+
+
+@receiver(pre_save, sender=Images)
+@receiver(pre_save, sender=ShortTermImages)
+def remember_previous_image_url(sender, instance, **kwargs):
+    instance._previous_url = None
+    instance._previous_variants = None
+    if instance.pk:
+        instance._previous_url, instance._previous_variants = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list('url', 'variants')
+            .first()
+        ) or (None, None)
+
+
+@receiver(post_save, sender=Images)
+@receiver(post_save, sender=ShortTermImages)
+def release_replaced_image(sender, instance, **kwargs):
+    """Images created by listings/uploads.py are counted there"""
+    from .variants import discard_variants
+
+    previous = getattr(instance, '_previous_url', None)
+    if previous and previous != instance.url:
+        release_blob(BACKBLAZE, url=previous)
+
+    # e.g. reset by reset_variants when the original was replaced
+    previous_variants = getattr(instance, '_previous_variants', None)
+    if previous_variants and previous_variants != instance.variants:
+        discard_variants(instance, previous, previous_variants)
+
+    instance._previous_url = instance.url
+    instance._previous_variants = instance.variants
+
+
+@receiver(post_delete, sender=Images)
+@receiver(post_delete, sender=ShortTermImages)
+def release_image(sender, instance, **kwargs):
+    from .variants import discard_variants
+
+    if instance.url:
+        release_blob(BACKBLAZE, url=instance.url)
+    discard_variants(instance, instance.url, instance.variants)
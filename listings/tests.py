@@ -1,3 +1,206 @@
-from django.test import TestCase
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from . import services
+from .models import (
+    Amenities,
+    Images,
+    Listing,
+    ShortTermImages,
+    ShortTermListing,
+    ShortTermPriceOverride,
+    ShortTermSeasonalPrice,
+)
+
+
+class ListingQueryBudgetTests(APITestCase):
+    """
+    The listing endpoints load their relations with the prefetch plan of
+    setup_eager_loading, so the number of queries does not grow with the
+    number of listings or images.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.agent = User.objects.create_user(username='agent')
+        self.amenity = Amenities.objects.create(name='wifi')
+
+    def create_listings(self, count):
+        for _ in range(count):
+            listing = Listing.objects.create(
+                agent_name=self.agent, price=Decimal('150000.00'))
+            listing.amenities.add(self.amenity)
+            Images.objects.bulk_create([
+                Images(listing=listing, url=f'https://example.com/{order}',
+                       order=order)
+                for order in range(3)
+            ])
+
+            short_term_listing = ShortTermListing.objects.create(
+                agent_name=self.agent,
+                price=Decimal('100.00'),
+                max_guests=4,
+                max_adults=2,
+                max_children=2,
+            )
+            short_term_listing.amenities.add(self.amenity)
+            ShortTermImages.objects.bulk_create([
+                ShortTermImages(listing=short_term_listing,
+                                url=f'https://example.com/{order}',
+                                order=order)
+                for order in range(3)
+            ])
+
+    def assertQueryBudget(self, url, budget):
+        """The budget holds with 2 listings and with 10"""
+        for count in (2, 8):
+            self.create_listings(count)
+            cache.clear()
+            with self.assertNumQueries(budget):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_listing_list(self):
+        # count, listings, images, amenities, files
+        self.assertQueryBudget('/api/listings/', 5)
+
+    def test_listing_list_cards(self):
+        # count, listings with their cover image
+        self.assertQueryBudget('/api/listings/?view=card', 2)
+
+    def test_listing_detail(self):
+        self.create_listings(1)
+        listing = Listing.objects.get()
+        cache.clear()
+        # validators, listing, images, amenities, files
+        with self.assertNumQueries(5):
+            response = self.client.get(f'/api/listings/{listing.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [image['order'] for image in response.data['images']],
+            [0, 1, 2],
+        )
+
+    def test_short_term_listing_list(self):
+        # count, listings, images, amenities, price overrides, files
+        self.assertQueryBudget('/api/short-term-listings/', 6)
+
+    def test_short_term_listing_list_cards(self):
+        self.assertQueryBudget('/api/short-term-listings/?view=card', 2)
+
+    def test_short_term_listing_detail(self):
+        self.create_listings(1)
+        listing = ShortTermListing.objects.get()
+        cache.clear()
+        with self.assertNumQueries(6):
+            response = self.client.get(
+                f'/api/short-term-listings/{listing.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+
+class ListingQuoteQueryTests(APITestCase):
+    """
+    The batch quote endpoint uses four queries (listings, overrides,
+    seasons, booked nights), however many listings and nights it prices.
+    """
+
+    def setUp(self):
+        self.agent = User.objects.create_user(username='agent')
+        self.check_in = timezone.localdate() + timedelta(days=10)
+
+    def create_listings(self, count):
+        listings = []
+        for _ in range(count):
+            listing = ShortTermListing.objects.create(
+                agent_name=self.agent,
+                price=Decimal('100.00'),
+                max_guests=4,
+                max_adults=2,
+                max_children=2,
+            )
+            ShortTermSeasonalPrice.objects.create(
+                listing=listing,
+                start_date=self.check_in,
+                end_date=self.check_in + timedelta(days=7),
+                price=150,
+            )
+            ShortTermPriceOverride.objects.create(
+                listing=listing, date=self.check_in, price=200)
+            listings.append(listing)
+        return listings
+
+    def test_quote_queries_do_not_grow(self):
+        for count, nights in ((2, 3), (10, 30)):
+            ids = ','.join(
+                str(listing.pk) for listing in self.create_listings(count))
+            with self.assertNumQueries(4):
+                response = self.client.get(
+                    '/api/short-term-listings/quotes/', {
+                        'ids': ids,
+                        'check_in': self.check_in,
+                        'check_out': self.check_in + timedelta(days=nights),
+                    })
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data), count)
+            self.assertTrue(all(
+                quote['priceable'] for quote in response.data))
+
+
+@mock.patch.object(services, 'B2Api')
+class BackblazeClientTests(SimpleTestCase):
+    """
+    The process authorizes one B2 client, shared by every upload, until
+    reset_backblaze_client drops it.
+    """
+
+    def setUp(self):
+        services.reset_backblaze_client()
+        self.addCleanup(services.reset_backblaze_client)
+
+    def test_client_is_authorized_once(self, B2Api):
+        # Slow enough for the threads to race for the first client
+        B2Api.return_value.authorize_account.side_effect = (
+            lambda *args: time.sleep(0.05))
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            buckets = list(pool.map(
+                lambda _: services.get_bucket(), range(32)))
+
+        B2Api.assert_called_once()
+        B2Api.return_value.authorize_account.assert_called_once()
+        bucket = B2Api.return_value.get_bucket_by_name.return_value
+        self.assertTrue(all(item is bucket for item in buckets))
+
+    def test_uploads_share_the_client(self, B2Api):
+        services.upload_to_backblaze(mock.Mock(spec=['read']), 'a.jpg')
+        services.upload_to_backblaze(mock.Mock(spec=['read']), 'b.jpg')
+
+        B2Api.return_value.authorize_account.assert_called_once()
+        bucket = B2Api.return_value.get_bucket_by_name.return_value
+        self.assertEqual(bucket.upload_unbound_stream.call_count, 2)
+
+    def test_reset_reinitializes_the_client(self, B2Api):
+        services.get_bucket()
+        services.reset_backblaze_client()
+        services.get_bucket()
+
+        self.assertEqual(B2Api.call_count, 2)
+        self.assertEqual(
+            B2Api.return_value.authorize_account.call_count, 2)
+
+    def test_reset_with_config_connects_right_away(self, B2Api):
+        api_config = object()
+        services.reset_backblaze_client(api_config)
+
+        B2Api.assert_called_once_with(mock.ANY, api_config=api_config)
+        services.get_bucket()
+        B2Api.assert_called_once()
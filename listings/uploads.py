@@ -0,0 +1,241 @@
+"""
+Concurrent image uploads for listing create and update.
+
+A request's images are uploaded by stage_images before the request
+opens its transaction, so no database transaction or row lock is held
+while files travel to Backblaze. The uploads run in a thread pool of at
+most UPLOAD_WORKERS threads, sharing the process-wide client of
+listings/services.py. create_images then writes the rows inside the
+transaction, with one bulk_create.
+
+When an upload fails nothing is written: the uploads still queued are
+cancelled and the files already uploaded are deleted again. When the
+transaction fails afterwards, callers discard() the staged images,
+which deletes the files uploaded for them.
+
+Images whose content is already stored are not uploaded again; see
+listings/blobs.py.
+"""
+from collections import Counter
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from django.db import transaction
+
+from .blobs import (
+    BACKBLAZE, acquire_blob, content_hash, find_blobs, register_blob
+)
+from .models import Images, ShortTermImages
+from .services import delete_from_backblaze, upload_to_backblaze
+
+
+UPLOAD_WORKERS = 4
+
+
+def delete_uploads(filenames):
+    """Best-effort cleanup; an orphaned file only costs storage"""
+    for filename in filenames:
+        try:
+            delete_from_backblaze(filename)
+        except Exception:
+            pass
+
+
+def upload_images(files, filenames):
+    """
+    Upload files concurrently, at most UPLOAD_WORKERS at a time.
+
+    Returns:
+        list: the public URLs of the files, in order.
+
+    Raises the first upload error, once the files already uploaded have
+    been deleted.
+    """
+    if not files:
+        return []
+
+    workers = min(UPLOAD_WORKERS, len(files))
+    with ThreadPoolExecutor(workers, thread_name_prefix="upload") as pool:
+        futures = [
+            pool.submit(upload_to_backblaze, file, filename)
+            for file, filename in zip(files, filenames)
+        ]
+        wait(futures, return_when=FIRST_EXCEPTION)
+        if any(future.done() and future.exception() for future in futures):
+            for future in futures:
+                future.cancel()
+    # Leaving the pool waited for the uploads already running
+
+    errors = [
+        future.exception() for future in futures
+        if not future.cancelled() and future.exception()
+    ]
+    if errors:
+        delete_uploads([
+            filename for future, filename in zip(futures, filenames)
+            if not future.cancelled() and not future.exception()
+        ])
+        raise errors[0]
+    return [future.result() for future in futures]
+
+
+def _reused_variants(urls):
+    """
+    Variants already generated for stored images, by URL, so that a
+    reused image does not have to be resized again.
+    """
+    variants = {}
+    for model in (Images, ShortTermImages):
+        for url, image_variants in model.objects.filter(
+            url__in=urls, variants_status='done'
+        ).values_list('url', 'variants'):
+            variants.setdefault(url, image_variants)
+    return variants
+
+
+class StagedImages:
+    """
+    Images uploaded ahead of the transaction that creates their rows;
+    see stage_images and create_images.
+    """
+
+    def __init__(self, files, filenames, hashes, uploaded):
+        self.files = files
+        self.filenames = filenames
+        # (digest, size) of each file
+        self.hashes = hashes
+        # {digest: (filename, url)} of the content uploaded for them
+        self.uploaded = uploaded
+
+    def discard(self):
+        """
+        Delete the files uploaded for the images, when the transaction
+        that should have created their rows failed.
+        """
+        delete_uploads([filename for filename, url in self.uploaded.values()])
+        self.uploaded = {}
+
+
+def stage_images(files, filenames):
+    """
+    Hash images and upload the content that is not stored yet. Call it
+    before opening the transaction that creates the rows.
+
+    Returns:
+        StagedImages: to pass to create_images.
+    """
+    hashes = [content_hash(file) for file in files]
+    stored = find_blobs(BACKBLAZE, [digest for digest, size in hashes])
+
+    # One upload per new content, even when the request repeats a file
+    new = {}
+    for index, (digest, size) in enumerate(hashes):
+        if digest not in stored:
+            new.setdefault(digest, index)
+    new_filenames = [filenames[index] for index in new.values()]
+    urls = upload_images(
+        [files[index] for index in new.values()], new_filenames)
+
+    return StagedImages(
+        files, filenames, hashes,
+        dict(zip(new, zip(new_filenames, urls))),
+    )
+
+
+def _store_blobs(staged):
+    """
+    Count the references of staged images to stored content, and
+    register the content uploaded for them.
+
+    Returns:
+        dict: {digest: StoredBlob} of every staged image.
+    """
+    references = Counter(digest for digest, size in staged.hashes)
+    sizes = dict(staged.hashes)
+
+    blobs = {}
+    for digest, blob in find_blobs(BACKBLAZE, references).items():
+        # Content deleted since the lookup is uploaded again
+        if acquire_blob(blob, references[digest]):
+            blobs[digest] = blob
+
+    # Content deleted since it was staged, which is rare, is uploaded
+    # here after all
+    for index, (digest, size) in enumerate(staged.hashes):
+        if digest not in blobs and digest not in staged.uploaded:
+            filename = staged.filenames[index]
+            url = upload_images([staged.files[index]], [filename])[0]
+            staged.uploaded[digest] = (filename, url)
+
+    for digest, (filename, url) in staged.uploaded.items():
+        if digest in blobs:
+            # Stored meanwhile by another request
+            transaction.on_commit(
+                lambda filename=filename: delete_uploads([filename]))
+            continue
+        blob, created = register_blob(
+            BACKBLAZE, digest, filename, sizes[digest], url,
+            count=references[digest],
+        )
+        if not created:
+            # A concurrent upload of the same content got there first
+            transaction.on_commit(
+                lambda filename=filename: delete_uploads([filename]))
+        blobs[digest] = blob
+    return blobs
+
+
+@transaction.atomic
+def create_images(model, listing, staged, fields):
+    """
+    Create the rows of staged images.
+
+    Content that is already stored (see listings/blobs.py) is not
+    uploaded again: the new rows reuse its URL, and its variants when
+    they are generated.
+
+    Args:
+        model: Images or ShortTermImages.
+        staged: the StagedImages returned by stage_images.
+        fields: the other fields of each row (order, is_first,
+            description), one dict per file.
+
+    Returns:
+        list: the created images. bulk_create sends no post_save, so
+        callers save the listing afterwards (or have just created it).
+    """
+    blobs = _store_blobs(staged)
+    uploaded = {url for filename, url in staged.uploaded.values()}
+
+    variants = _reused_variants(
+        [blob.url for blob in blobs.values() if blob.url not in uploaded])
+    images = []
+    for (digest, size), row in zip(staged.hashes, fields):
+        url = blobs[digest].url
+        if url in variants:
+            row = {
+                **row,
+                "variants": variants[url],
+                "variants_status": 'done',
+            }
+        images.append(model(listing=listing, url=url, **row))
+    return model.objects.bulk_create(images)
+
+
+def store_image(file, filename):
+    """
+    Upload one image through the same deduplication as create_images,
+    for the admin form, which saves its row itself. Call it inside the
+    transaction that saves the row, so the reference counted here rolls
+    back with it.
+
+    Returns:
+        str: the URL of the stored content.
+    """
+    staged = stage_images([file], [filename])
+    try:
+        with transaction.atomic():
+            blobs = _store_blobs(staged)
+    except Exception:
+        staged.discard()
+        raise
+    return blobs[staged.hashes[0][0]].url
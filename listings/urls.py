@@ -13,6 +13,16 @@ urlpatterns = [
     path("listings/", views.ListingList.as_view()),
     path("listings/", include(router.urls)),
     path("listings/<int:pk>/", views.ListingDetail.as_view()),
+    path(
+        "listings/clusters/",
+        views.ListingClustersView.as_view(),
+        name="listing-clusters",
+    ),
+    path(
+        "listings/facets/",
+        views.ListingFacetsView.as_view(),
+        name="listing-facets",
+    ),
     path("listings/<int:listing_id>/images/",
          views.DeleteImageView.as_view()),
     path("listings/<int:listing_id>/images/reorder-images/",
@@ -28,6 +38,26 @@ urlpatterns = [
          views.DeleteShortTermImages.as_view()),
     path("short-term-listings/<int:listing_id>/images/reorder-images/",
          views.reorder_images_short_term),
+    path(
+        "short-term-listings/quotes/",
+        views.ShortTermListingQuoteView.as_view(),
+        name="short-term-listing-quotes",
+    ),
+    path(
+        "short-term-listings/clusters/",
+        views.ShortTermListingClustersView.as_view(),
+        name="short-term-listing-clusters",
+    ),
+    path(
+        "short-term-listings/facets/",
+        views.ShortTermListingFacetsView.as_view(),
+        name="short-term-listing-facets",
+    ),
+    path(
+        "short-term-listings/flexible-dates/",
+        views.ShortTermListingFlexibleDatesView.as_view(),
+        name="short-term-listing-flexible-dates",
+    ),
     path(
         "short-term-listings/<int:listing_id>/availability/",
         views.ListingAvailabilityView.as_view(),
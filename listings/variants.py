@@ -0,0 +1,314 @@
+"""
+Responsive image variants.
+
+Listing images are stored as uploaded (up to 4096px), far larger than
+the cards and galleries that show them. `manage.py
+generate_image_variants` picks up images whose `variants_status` is
+pending, downloads each original once, renders it at every width of
+VARIANT_WIDTHS narrower than the original, encodes each width as WebP
+(and AVIF when Pillow can write it, e.g. with pillow-avif-plugin) and
+uploads the results. The URLs are recorded on the image:
+
+    {"webp": {"320": url, "640": url}, "avif": {...}}
+
+and served as `srcset` strings by the image and card serializers. All of
+this runs in the `variants` worker of the Procfile, never in the request
+that uploads the image. The worker claims a batch of images in one short
+transaction and records the results in another; no transaction stays
+open while images are downloaded and uploaded.
+"""
+import io
+import uuid
+from datetime import timedelta
+
+import requests
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from re_drf_api.cache import bump_cache_version
+from .models import Images, ShortTermImages
+from .signals import RESPONSE_CACHE_SCOPES, touch_listings
+from .uploads import delete_uploads, upload_images
+
+
+VARIANT_WIDTHS = (320, 640, 1280)
+
+# Pillow format: (file extension, save options)
+VARIANT_FORMATS = {
+    "WEBP": ("webp", {"quality": 80, "method": 4}),
+    "AVIF": ("avif", {"quality": 60}),
+}
+
+# Storage folder of the variants of each image model
+VARIANT_FOLDERS = {
+    Images: "listings",
+    ShortTermImages: "short_term_listings",
+}
+
+# Attempts before an image is marked as failed
+MAX_ATTEMPTS = 3
+
+# Delay before the first retry, doubled after every failed attempt
+RETRY_BASE_DELAY = timedelta(minutes=1)
+DOWNLOAD_TIMEOUT = 30
+
+# Time after which an image claimed by a worker that never finished it is
+# processed again
+CLAIM_TIMEOUT = timedelta(minutes=15)
+
+
+def variant_formats():
+    """
+    Returns:
+        list: the Pillow formats to encode, WEBP and, when a plugin or
+        Pillow itself can write it, AVIF.
+    """
+    try:
+        import pillow_avif  # noqa: F401 (registers the AVIF plugin)
+    except ImportError:
+        pass
+    Image.init()
+    return [fmt for fmt in VARIANT_FORMATS if fmt in Image.SAVE]
+
+
+def render_variants(data, formats):
+    """
+    Resize an image to every variant width narrower than itself (or
+    keep its own width when it is narrower than all of them).
+
+    Returns:
+        list: [(format, width, encoded bytes)]
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = (image.mode in ("RGBA", "LA", "PA") or
+                     "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+        widths = [width for width in VARIANT_WIDTHS if width < image.width]
+        rendered = []
+        for width in widths or [image.width]:
+            height = max(round(image.height * width / image.width), 1)
+            resized = image.resize(
+                (width, height), Image.LANCZOS, reducing_gap=3.0)
+            for fmt in formats:
+                output = io.BytesIO()
+                resized.save(output, fmt, **VARIANT_FORMATS[fmt][1])
+                rendered.append((fmt, width, output.getvalue()))
+        return rendered
+
+
+def variant_filename(image, generation, fmt, width):
+    """
+    Every generation of an image's variants gets its own keys, so
+    deleting old variants never touches newer ones.
+    """
+    folder = VARIANT_FOLDERS[type(image)]
+    extension = VARIANT_FORMATS[fmt][0]
+    return (
+        f"{folder}/{image.listing_id}/variants/"
+        f"{image.pk}_{generation}_{width}w.{extension}"
+    )
+
+
+def variant_keys(variants):
+    """
+    Returns:
+        set: the storage keys of the variant URLs of a `variants` field,
+        "{folder}/{listing_id}/variants/{name}" (see variant_filename).
+    """
+    return {
+        "/".join(url.split("/")[-4:])
+        for urls in (variants or {}).values()
+        for url in urls.values()
+    }
+
+
+def discard_variants(image, url, variants):
+    """
+    Delete the variants an image no longer shows, once the transaction
+    commits. Images created with the same original reuse its variants
+    (see listings/uploads.py), so the keys other images still show are
+    kept.
+    """
+    keys = variant_keys(variants)
+    if not keys:
+        return
+    for model in VARIANT_FOLDERS if url else ():
+        others = model.objects.filter(url=url)
+        if model is type(image):
+            others = others.exclude(pk=image.pk)
+        for other in others.values_list('variants', flat=True):
+            keys -= variant_keys(other)
+    if keys:
+        transaction.on_commit(lambda: delete_uploads(sorted(keys)))
+
+
+def generate_variants(image, formats):
+    """
+    Download an image, render and upload its variants.
+
+    Returns:
+        dict: {extension: {width: url}}, for the `variants` field.
+    """
+    response = requests.get(image.url, timeout=DOWNLOAD_TIMEOUT)
+    response.raise_for_status()
+
+    rendered = render_variants(response.content, formats)
+    generation = uuid.uuid4().hex[:8]
+    urls = upload_images(
+        [io.BytesIO(data) for fmt, width, data in rendered],
+        [
+            variant_filename(image, generation, fmt, width)
+            for fmt, width, _ in rendered
+        ],
+    )
+
+    variants = {}
+    for (fmt, width, _), url in zip(rendered, urls):
+        extension = VARIANT_FORMATS[fmt][0]
+        variants.setdefault(extension, {})[str(width)] = url
+    return variants
+
+
+def image_srcset(variants):
+    """
+    Returns:
+        dict: {extension: "url 320w, url 640w"} for the `srcset` of
+        <source> elements, empty until the variants are generated.
+    """
+    return {
+        extension: ", ".join(
+            f"{url} {width}w"
+            for width, url in sorted(
+                urls.items(), key=lambda item: int(item[0]))
+        )
+        for extension, urls in (variants or {}).items()
+    }
+
+
+def _retry_delay(attempts):
+    return RETRY_BASE_DELAY * 2 ** (attempts - 1)
+
+
+def _claim(model, batch_size):
+    """
+    Mark up to `batch_size` pending images that are due as processing,
+    in a short transaction, so that other workers skip them while their
+    variants are generated without any transaction open.
+
+    Images claimed more than CLAIM_TIMEOUT ago, by a worker that died,
+    are claimed again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        images = list(
+            model.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(variants_status='pending',
+                  variants_retry_at__isnull=True) |
+                Q(variants_status='pending', variants_retry_at__lte=now) |
+                Q(variants_status='processing',
+                  variants_claimed_at__lt=now - CLAIM_TIMEOUT)
+            )
+            .exclude(url__isnull=True)
+            .exclude(url='')
+            .order_by('pk')[:batch_size]
+        )
+        for image in images:
+            image.variants_status = 'processing'
+            image.variants_claimed_at = now
+            image.variants_attempts += 1
+        model.objects.bulk_update(
+            images,
+            ['variants_status', 'variants_claimed_at', 'variants_attempts'],
+        )
+    return images
+
+
+def _process(model, batch_size, formats):
+    done = failed = 0
+    images = _claim(model, batch_size)
+    if not images:
+        return done, failed
+
+    for image in images:
+        try:
+            image.variants = generate_variants(image, formats)
+        except Exception:
+            failed += 1
+            if image.variants_attempts >= MAX_ATTEMPTS:
+                image.variants_status = 'failed'
+            else:
+                image.variants_status = 'pending'
+                image.variants_retry_at = (
+                    timezone.now() + _retry_delay(image.variants_attempts))
+        else:
+            done += 1
+            image.variants_status = 'done'
+
+    with transaction.atomic():
+        # Skip images deleted, or whose original was replaced, meanwhile
+        current = dict(
+            model.objects.select_for_update()
+            .filter(
+                pk__in=[image.pk for image in images],
+                variants_status='processing',
+            )
+            .values_list('pk', 'url')
+        )
+        stale = [
+            image for image in images if current.get(image.pk) != image.url
+        ]
+        images = [
+            image for image in images if current.get(image.pk) == image.url
+        ]
+        # Nothing shows the variants generated for them
+        keys = set()
+        for image in stale:
+            if image.variants_status == 'done':
+                keys |= variant_keys(image.variants)
+        if keys:
+            transaction.on_commit(lambda: delete_uploads(sorted(keys)))
+        model.objects.bulk_update(
+            images, ['variants', 'variants_status', 'variants_retry_at'])
+
+        # bulk_update sends no post_save
+        touch_listings(
+            model._meta.get_field('listing').related_model,
+            {image.listing_id for image in images},
+        )
+        bump_cache_version(*RESPONSE_CACHE_SCOPES[model])
+
+    return done, failed
+
+
+def process_pending_variants(batch_size=20):
+    """
+    Generate the variants of up to `batch_size` pending images of each
+    image model. Failed images are retried on later runs, after a delay
+    that doubles with every attempt, up to MAX_ATTEMPTS times.
+
+    Returns:
+        tuple: (done, failed) counts for this batch.
+    """
+    formats = variant_formats()
+    done = failed = 0
+    for model in VARIANT_FOLDERS:
+        model_done, model_failed = _process(model, batch_size, formats)
+        done += model_done
+        failed += model_failed
+    return done, failed
+
+
+def reset_variants(image):
+    """
+    Queue an image whose original changed for new variants. The old
+    variants are deleted once the image is saved (listings/signals.py).
+    """
+    image.variants = {}
+    image.variants_status = 'pending'
+    image.variants_attempts = 0
+    image.variants_retry_at = None
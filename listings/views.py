@@ -2,12 +2,26 @@ from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django_filters import rest_framework as filter
 from re_drf_api.permissions import IsAdminUserOrReadOnly, IsAdminUser
-from django.db.models import Count, Q
-from rest_framework import generics, filters, status
+from re_drf_api.cache import CachedResponseMixin, bump_cache_version
+from re_drf_api.conditional import ConditionalRetrieveMixin, conditional_get
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from rest_framework import generics, filters, status, permissions
 from rest_framework.viewsets import ModelViewSet
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import (Listing, Images, Amenities, Owner,
                      OwnerFile, ShortTermListing, ShortTermImages)
+from .clusters import (
+    POINTS_ZOOM, MAX_MAP_POINTS, aggregate_clusters, cluster_precision,
+    stored_clusters
+)
+from .facets import (
+    LISTING_FACETS, SHORT_TERM_FACETS, cached_facet_counts
+)
+from .blobs import STORAGE, is_tracked
+from .geo import GeoFilter, within_bbox
+from .search import FullTextSearchFilter
+from .signals import RESPONSE_CACHE_SCOPES, touch_listings
 from .serializers import (
     ListingSerializer,
     ImagesSerializer,
@@ -16,14 +30,32 @@ from .serializers import (
     OwnerFileSerializer,
     ShortTermImagesSerializer,
     ShortTermListingSerializer,
+    ListingCardSerializer,
+    ShortTermListingCardSerializer,
+    QuoteRequestSerializer,
+    QuoteSerializer,
+    FlexibleDatesRequestSerializer,
+    FlexibleStaysSerializer,
+    MapClustersRequestSerializer,
+    MapClusterSerializer,
+    MapPointSerializer,
 )
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view
 from django import forms
-from bookings.models import ShortTermBooking
-from datetime import datetime, date
-from bookings.utils import (get_listing_availability)
+from bookings.models import ShortTermCalendarDay
+from bookings.availability import (
+    unavailable_listing_ids, listing_ids_without_stay, flexible_stays,
+    availability_validators,
+)
+from datetime import date
+from decimal import Decimal
+from bookings.utils import (
+    get_listing_availability, month_windows, calculate_booking_prices
+)
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.exceptions import ValidationError
 
 
 @api_view(['DELETE'])
@@ -35,8 +67,9 @@ def delete_file(request, owner_id, file_id):
         # Fetch the file, ensuring it belongs to the given owner
         file = get_object_or_404(OwnerFile, id=file_id, owner_id=owner_id)
 
-        # Delete the file from storage
-        if file.file:
+        # Delete the file from storage, unless it is deduplicated and
+        # deleted with its last reference (listings/signals.py)
+        if file.file and not is_tracked(STORAGE, name=file.file.name):
             file.file.delete(save=False)
 
         # Delete the file record from the database
@@ -63,6 +96,10 @@ def reorder_images(request, listing_id):
         Images.objects.filter(
             id=image_id, listing=listing).update(order=idx)
 
+    # update() sends no post_save
+    touch_listings(Listing, [listing.pk])
+    bump_cache_version(*RESPONSE_CACHE_SCOPES[Images])
+
     return Response({"detail": "Images reordered successfully."})
 
 
@@ -76,6 +113,10 @@ def reorder_images_short_term(request, listing_id):
         ShortTermImages.objects.filter(
             id=image_id, listing=listing).update(order=idx)
 
+    # update() sends no post_save
+    touch_listings(ShortTermListing, [listing.pk])
+    bump_cache_version(*RESPONSE_CACHE_SCOPES[ShortTermImages])
+
     return Response({"detail": "Images reordered successfully."})
 
 
@@ -135,6 +176,7 @@ Filter class for filtering listings based on various criteria.
             "construction_year",
             "floor_area",
             "heating_system",
+            "energy_class",
         ]
 
 
@@ -143,25 +185,58 @@ class ShortTermListingFilter(filter.FilterSet):
 Filter class for filtering listings based on various criteria.
     """
 
-    def filter_availability_by_dates(self, queryset, name, value):
-        start_date = self.data.get("start_date")
-        end_date = self.data.get("end_date")
+    # Applied by filter_queryset, which needs every date of a range
+    DATE_FILTERS = (
+        "start_date", "end_date", "flexible_start", "flexible_end", "nights")
 
+    def filter_queryset(self, queryset):
+        """
+        Apply every filter but the DATE_FILTERS, then each date range
+        once with all of its parameters.
+        """
+        cleaned_data = self.form.cleaned_data
+        for name, value in cleaned_data.items():
+            if name not in self.DATE_FILTERS:
+                queryset = self.filters[name].filter(queryset, value)
+
+        queryset = self.filter_availability_by_dates(
+            queryset,
+            cleaned_data.get("start_date"),
+            cleaned_data.get("end_date"),
+        )
+        return self.filter_flexible_dates(
+            queryset,
+            cleaned_data.get("flexible_start"),
+            cleaned_data.get("flexible_end"),
+            cleaned_data.get("nights"),
+        )
+
+    def filter_availability_by_dates(self, queryset, start_date, end_date):
+        """
+        Exclude listings with a booked night in [start_date, end_date),
+        tested against the availability bitmaps.
+        """
         if start_date and end_date:
-            try:
-                start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-                end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+            return queryset.exclude(
+                id__in=unavailable_listing_ids(start_date, end_date))
 
-                overlapping = ShortTermBooking.objects.filter(
-                    Q(check_in__lt=end_date) & Q(check_out__gt=start_date)
-                ).values_list('listing_id', flat=True)
+        return queryset
 
-                return queryset.exclude(id__in=overlapping)
+    def filter_flexible_dates(self, queryset, start_date, end_date, nights):
+        """
+        Keep listings with any `nights` consecutive free and priced
+        nights between flexible_start and flexible_end, e.g. "any 4
+        nights in August".
+        """
+        if not start_date or not end_date or not nights:
+            return queryset
 
-            except ValueError:
-                pass
+        nights = int(nights)
+        if nights > (end_date - start_date).days:
+            return queryset.none()
 
-        return queryset
+        return queryset.exclude(
+            id__in=listing_ids_without_stay(start_date, end_date, nights))
 
     # Get amenities filter
     amenities = filter.ModelMultipleChoiceFilter(
@@ -196,17 +271,30 @@ Filter class for filtering listings based on various criteria.
         field_name="municipality_id", lookup_expr="exact")
 
     start_date = filter.DateFilter(
-        method="filter_availability_by_dates",
         label="Start Date",
         widget=forms.DateInput(attrs={"type": "date"})
     )
 
     end_date = filter.DateFilter(
-        method="filter_availability_by_dates",
         label="End Date",
         widget=forms.DateInput(attrs={"type": "date"})
     )
 
+    flexible_start = filter.DateFilter(
+        label="Flexible Window Start",
+        widget=forms.DateInput(attrs={"type": "date"})
+    )
+
+    flexible_end = filter.DateFilter(
+        label="Flexible Window End",
+        widget=forms.DateInput(attrs={"type": "date"})
+    )
+
+    nights = filter.NumberFilter(
+        label="Nights",
+        min_value=1,
+    )
+
     min_guests = filter.NumberFilter(
         field_name="max_guests", lookup_expr="gte")
 
@@ -312,31 +400,58 @@ class OwnerViewSet(ModelViewSet):
         )
 
 
-class ListingList(generics.ListCreateAPIView):
+class ListingSerializerMixin:
+    """
+    Shared by the listing list and detail views.
+
+    Reads with ?view=card use `card_serializer_class` when the view sets
+    one, and the queryset is loaded with the eager loading plan of
+    whichever serializer is used. Every listing serializer also accepts
+    ?fields= and ?omit= (see SparseFieldsetMixin).
+    """
+    card_serializer_class = None
+
+    def get_serializer_class(self):
+        if (
+            self.card_serializer_class is not None and
+            self.request.method in permissions.SAFE_METHODS and
+            self.request.query_params.get("view") == "card"
+        ):
+            return self.card_serializer_class
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        return self.get_serializer_class().setup_eager_loading(
+            super().get_queryset())
+
+
+class ListingList(CachedResponseMixin, ListingSerializerMixin,
+                  generics.ListCreateAPIView):
     """
     List all listings, or create a new listing.
     """
+    cache_scopes = ("listings",)
 
     queryset = Listing.objects.annotate(
-        listing_count=Count("agent_name__listing")
+        listing_count=Coalesce("agent_name__listing_stats__listing_count", 0)
     )
     serializer_class = ListingSerializer
+    card_serializer_class = ListingCardSerializer
+    # Orderings available with ?pagination=cursor
+    cursor_orderings = {
+        "created_on": "created_on",
+        "price": Coalesce("price", Value(Decimal("0.00"))),
+    }
+    cursor_default_ordering = "-created_on"
     permission_classes = [IsAdminUserOrReadOnly]
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
-        filters.OrderingFilter
+        filters.OrderingFilter,
+        FullTextSearchFilter,
+        GeoFilter,
     ]
     parser_classes = [MultiPartParser, FormParser]
     filterset_class = ListingFilter
-    search_fields = [
-        "municipality",
-        "municipality_id",
-        "county",
-        "county_id",
-        "region_id",
-        "postcode",
-    ]
     ordering_fields = [
         "listing_count",  # Annotated field
         "created_on",
@@ -344,7 +459,6 @@ class ListingList(generics.ListCreateAPIView):
         "price",
         "-price",
         "municipality_id",
-        "county",
         "region_id",
         "postcode"
     ]
@@ -368,10 +482,15 @@ class ListingList(generics.ListCreateAPIView):
         serializer.save(agent_name=self.request.user)
 
 
-class ListingDetail(generics.RetrieveUpdateDestroyAPIView):
+class ListingDetail(ConditionalRetrieveMixin, CachedResponseMixin,
+                    ListingSerializerMixin,
+                    generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a listing.
     """
+    cache_scopes = ("listings",)
+    # Agent fields of the response
+    validator_fields = ("agent_name__username", "agent_name__profile__id")
 
     queryset = Listing.objects.all()
     serializer_class = ListingSerializer
@@ -417,10 +536,11 @@ class DeleteImageView(generics.DestroyAPIView):
         )
 
 
-class AmenitiesList(generics.ListCreateAPIView):
+class AmenitiesList(CachedResponseMixin, generics.ListCreateAPIView):
     """
     List all amenities, or create a new amenity.
     """
+    cache_scopes = ("amenities",)
 
     queryset = Amenities.objects.all()
     serializer_class = AmenitiesSerializer
@@ -454,32 +574,35 @@ class BulkCreateAmenitiesView(APIView):
         )
 
 
-class ShortTermListingList(generics.ListCreateAPIView):
+class ShortTermListingList(CachedResponseMixin, ListingSerializerMixin,
+                           generics.ListCreateAPIView):
     """
     List all short-term listings, or create a new short-term listing.
     """
+    cache_scopes = ("short_term_listings",)
 
     queryset = ShortTermListing.objects.annotate(
-        listing_count=Count("agent_name__listing")
+        listing_count=Coalesce(
+            "agent_name__listing_stats__short_term_listing_count", 0)
     )
 
     serializer_class = ShortTermListingSerializer
+    card_serializer_class = ShortTermListingCardSerializer
+    # Orderings available with ?pagination=cursor
+    cursor_orderings = {
+        "created_on": "created_on",
+        "price": Coalesce("price", Value(Decimal("0.00"))),
+    }
+    cursor_default_ordering = "-created_on"
     permission_classes = [IsAdminUserOrReadOnly]
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
-        filters.OrderingFilter
+        filters.OrderingFilter,
+        FullTextSearchFilter,
+        GeoFilter,
     ]
     parser_classes = [MultiPartParser, FormParser]
     filterset_class = ShortTermListingFilter
-    search_fields = [
-        "municipality",
-        "municipality_id",
-        "county",
-        "county_id",
-        "region_id",
-        "postcode",
-    ]
     ordering_fields = [
         "listing_count",  # Annotated field
         "created_on",
@@ -507,10 +630,15 @@ class ShortTermListingList(generics.ListCreateAPIView):
         serializer.save(agent_name=self.request.user)
 
 
-class ShortTermListingDetail(generics.RetrieveUpdateDestroyAPIView):
+class ShortTermListingDetail(ConditionalRetrieveMixin, CachedResponseMixin,
+                             ListingSerializerMixin,
+                             generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a short-term listing.
     """
+    cache_scopes = ("short_term_listings",)
+    # Agent fields of the response
+    validator_fields = ("agent_name__username", "agent_name__profile__id")
 
     queryset = ShortTermListing.objects.all()
     serializer_class = ShortTermListingSerializer
@@ -559,8 +687,18 @@ class DeleteShortTermImages(generics.DestroyAPIView):
 class ListingAvailabilityView(APIView):
     """
     Returns per-day availability & price for a listing.
+
+    Pass `page` to paginate long ranges by calendar month: page 1 is
+    the month containing `start`, and the response carries `next` and
+    `previous` links instead of the full range.
+
+    Supports conditional GET (ETag / Last-Modified).
     """
 
+    def get_validators(self, request, *args, **kwargs):
+        return availability_validators(kwargs.get("listing_id"))
+
+    @conditional_get
     def get(self, request, *args, **kwargs):
         listing_id = kwargs.get("listing_id")
         start = request.query_params.get("start")
@@ -581,12 +719,263 @@ class ListingAvailabilityView(APIView):
                 status=400
             )
 
-        listing = ShortTermListing.objects.get(pk=listing_id)
+        listing = get_object_or_404(ShortTermListing, pk=listing_id)
+
+        page = request.query_params.get("page")
+        if page is None:
+            data = get_listing_availability(
+                listing,
+                start_date,
+                end_date
+            )
+            return Response(data)
+
+        windows = month_windows(start_date, end_date)
+        try:
+            page_number = int(page)
+        except ValueError:
+            page_number = 0
+        if not 1 <= page_number <= max(len(windows), 1):
+            return Response(
+                {"error": "Invalid page"},
+                status=404
+            )
 
-        data = get_listing_availability(
-            listing,
-            start_date,
-            end_date
+        results = []
+        month = None
+        if windows:
+            window_start, window_end = windows[page_number - 1]
+            month = window_start.strftime("%Y-%m")
+            results = get_listing_availability(
+                listing, window_start, window_end)
+
+        url = request.build_absolute_uri()
+        return Response({
+            "count": len(windows),
+            "month": month,
+            "next": (
+                replace_query_param(url, "page", page_number + 1)
+                if page_number < len(windows) else None
+            ),
+            "previous": (
+                replace_query_param(url, "page", page_number - 1)
+                if page_number > 1 else None
+            ),
+            "results": results,
+        })
+
+
+class ShortTermListingQuoteView(APIView):
+    """
+    Returns the full price of one stay for several short-term listings,
+    e.g. for the cards of the search results page.
+
+    GET /api/short-term-listings/quotes/
+        ?ids=1,2,3&check_in=YYYY-MM-DD&check_out=YYYY-MM-DD&guests=2
+
+    Uses a fixed number of queries regardless of the number of listings
+    and nights: listings, price overrides, seasons and booked nights.
+    """
+
+    def get(self, request, *args, **kwargs):
+        params = QuoteRequestSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        ids = params.validated_data["ids"]
+        check_in = params.validated_data["check_in"]
+        check_out = params.validated_data["check_out"]
+        guests = params.validated_data["guests"]
+
+        listings = list(ShortTermListing.objects.filter(pk__in=ids))
+        prices = calculate_booking_prices(listings, check_in, check_out)
+        # Listings without a price for some night are quoted as null
+        unpriced = {
+            "nights": (check_out - check_in).days,
+            "subtotal": None,
+            "vat": None,
+            "municipality_tax": None,
+            "climate_crisis_fee": None,
+            "cleaning_fee": None,
+            "service_fee": None,
+            "total": None,
+        }
+
+        booked = set(
+            ShortTermCalendarDay.objects.filter(
+                listing_id__in=ids,
+                booked=True,
+                date__gte=check_in,
+                date__lt=check_out,
+            ).values_list("listing_id", flat=True).distinct()
         )
 
-        return Response(data)
+        # Keep the order the ids were requested in
+        listings.sort(key=lambda listing: ids.index(listing.pk))
+        quotes = [
+            {
+                "listing": listing.pk,
+                "currency": listing.currency,
+                "available": listing.pk not in booked,
+                "fits_guests": guests <= listing.max_guests,
+                "priceable": prices[listing.pk] is not None,
+                **(prices[listing.pk] or unpriced),
+            }
+            for listing in listings
+        ]
+
+        return Response(QuoteSerializer(quotes, many=True).data)
+
+
+class ShortTermListingFlexibleDatesView(generics.ListAPIView):
+    """
+    Answers "any N nights in month X": for every short-term listing with
+    at least one free stay of `nights` nights between flexible_start and
+    flexible_end, returns the feasible check-in dates and the cheapest
+    stay.
+
+    GET /api/short-term-listings/flexible-dates/
+        ?flexible_start=YYYY-MM-DD&flexible_end=YYYY-MM-DD&nights=4
+
+    Accepts every ShortTermListingFilter parameter and is paginated like
+    the listings list.
+    """
+    queryset = ShortTermListing.objects.all()
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ShortTermListingFilter
+
+    def list(self, request, *args, **kwargs):
+        params = FlexibleDatesRequestSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start_date = params.validated_data["flexible_start"]
+        end_date = params.validated_data["flexible_end"]
+        nights = params.validated_data["nights"]
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        listings = page if page is not None else list(queryset)
+
+        stays = flexible_stays(listings, start_date, end_date, nights)
+        results = FlexibleStaysSerializer(
+            [
+                {
+                    "listing": listing.pk,
+                    "currency": listing.currency,
+                    **stays[listing.pk],
+                }
+                for listing in listings
+            ],
+            many=True,
+        ).data
+
+        if page is not None:
+            return self.get_paginated_response(results)
+        return Response(results)
+
+
+class ListingClustersView(generics.GenericAPIView):
+    """
+    Map markers inside a bounding box: clusters of listings (count,
+    centroid and price range) below zoom level 14, the listings
+    themselves from there on.
+
+    GET /api/listings/clusters/?bbox=south,west,north,east&zoom=8
+
+    Accepts every ListingFilter parameter and ?search=. Unfiltered
+    requests read the precomputed clusters; filtered ones cluster the
+    matching listings on the fly.
+    """
+    queryset = Listing.objects.all()
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
+    filterset_class = ListingFilter
+    # Query parameters that do not filter the listings
+    map_params = {"bbox", "zoom", "format"}
+
+    def get(self, request, *args, **kwargs):
+        params = MapClustersRequestSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        bbox = params.validated_data["bbox"]
+        zoom = params.validated_data["zoom"]
+        model = self.get_queryset().model
+
+        if zoom >= POINTS_ZOOM:
+            listings = within_bbox(
+                self.filter_queryset(self.get_queryset()), *bbox)
+            points = listings.order_by("pk").values(
+                "id", "latitude", "longitude", "price")[:MAX_MAP_POINTS]
+            return Response({
+                "zoom": zoom,
+                "precision": None,
+                "clusters": [],
+                "points": MapPointSerializer(points, many=True).data,
+            })
+
+        precision = cluster_precision(zoom)
+        if set(request.query_params) - self.map_params:
+            listings = within_bbox(
+                self.filter_queryset(self.get_queryset()), *bbox)
+            clusters = aggregate_clusters(listings, precision)
+        else:
+            clusters = stored_clusters(model, precision, *bbox)
+
+        return Response({
+            "zoom": zoom,
+            "precision": precision,
+            "clusters": MapClusterSerializer(clusters, many=True).data,
+            "points": [],
+        })
+
+
+class ShortTermListingClustersView(ListingClustersView):
+    """
+    Map markers of the short-term listings inside a bounding box; see
+    ListingClustersView.
+
+    GET /api/short-term-listings/clusters/?bbox=south,west,north,east&zoom=8
+    """
+    queryset = ShortTermListing.objects.all()
+    filterset_class = ShortTermListingFilter
+
+
+class ListingFacetsView(generics.GenericAPIView):
+    """
+    Number of listings matching each value of the search filters (type,
+    sub type, sale type, bedrooms, energy class, heating system and
+    amenities), each facet ignoring its own filter.
+
+    GET /api/listings/facets/?<ListingFilter parameters>
+
+    Also honours ?search=, ?bbox= and ?near=. See listings/facets.py.
+    """
+    queryset = Listing.objects.all()
+    filter_backends = [FullTextSearchFilter, GeoFilter]
+    filterset_class = ListingFilter
+    facets = LISTING_FACETS
+    cache_scopes = ("listings",)
+
+    def filter_listings(self, params):
+        filterset = self.filterset_class(
+            params, queryset=self.get_queryset(), request=self.request)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        return self.filter_queryset(filterset.qs)
+
+    def get(self, request, *args, **kwargs):
+        return Response(cached_facet_counts(
+            self.get_queryset().model,
+            self.facets,
+            request.query_params,
+            self.filter_listings,
+            self.cache_scopes,
+        ))
+
+
+class ShortTermListingFacetsView(ListingFacetsView):
+    """
+    Number of short-term listings matching each bedroom count and
+    amenity; see ListingFacetsView.
+
+    GET /api/short-term-listings/facets/?<ShortTermListingFilter parameters>
+    """
+    queryset = ShortTermListing.objects.all()
+    filterset_class = ShortTermListingFilter
+    facets = SHORT_TERM_FACETS
+    cache_scopes = ("short_term_listings",)
@@ -0,0 +1,191 @@
+"""
+Versioned response cache.
+
+Views using CachedResponseMixin cache the responses of anonymous GET
+requests under a key made of the view, the host, path and normalized
+query parameters, the request language and the version counters of the
+view's `cache_scopes`. Saving or deleting a model bumps the versions of
+its scopes (see listings/signals.py), which orphans every response that
+depends on it at once; orphaned entries simply expire.
+
+The counters live in the default cache, so it must be shared by every
+worker process (set REDIS_URL) for the invalidation to reach them all.
+With a per-process cache (LocMemCache, the default) a bump would only
+reach the worker that handled the write, so responses are not cached at
+all.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+from django.db import transaction
+from django.http import QueryDict
+from django.utils.translation import get_language_from_request
+from rest_framework.response import Response
+
+
+RESPONSE_CACHE_SECONDS = 300
+
+# A miss holds a lock for at most STAMPEDE_LOCK_SECONDS, while concurrent
+# misses serve the previous version of the response, or wait for the new
+# one when there is none, checking every STAMPEDE_POLL_SECONDS
+STAMPEDE_LOCK_SECONDS = 10
+STAMPEDE_POLL_SECONDS = 0.05
+
+# Cache backends whose entries are private to each process
+PER_PROCESS_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+def shared_cache_configured():
+    """
+    Returns:
+        bool: True when the default cache is shared by every worker
+        process, so cached responses can be invalidated everywhere.
+    """
+    backend = settings.CACHES[DEFAULT_CACHE_ALIAS]["BACKEND"]
+    return backend not in PER_PROCESS_BACKENDS
+
+
+def normalized_query(query_params):
+    """
+    Returns:
+        QueryDict: the query parameters without empty values, keys and
+        values sorted, so equivalent requests compare equal.
+    """
+    params = QueryDict(mutable=True)
+    for key, values in sorted(query_params.lists()):
+        values = sorted(value for value in values if value != "")
+        if values:
+            params.setlist(key, values)
+    return params
+
+
+def _version_key(scope):
+    return f"cache-version:{scope}"
+
+
+def cache_version(scope):
+    """
+    Returns:
+        int: the current version of a cache scope.
+    """
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock, so a counter evicted from the cache never
+        # comes back with a version that was already used
+        cache.add(key, time.time_ns() // 1000, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def scope_versions(scopes):
+    """
+    Returns:
+        str: the versions of several scopes, for use in a cache key.
+    """
+    return ".".join(str(cache_version(scope)) for scope in scopes)
+
+
+def _bump(scopes):
+    for scope in scopes:
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            # Not in the cache: a fresh clock-based version is newer
+            cache_version(scope)
+
+
+def bump_cache_version(*scopes):
+    """
+    Invalidate every cached response depending on the given scopes, now
+    and again once the current transaction commits, since a response
+    computed in between still saw the old data.
+    """
+    _bump(scopes)
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+class CachedResponseMixin:
+    """
+    Caches the responses of anonymous GET requests. Authenticated
+    requests bypass the cache, since the responses depend on the user
+    (e.g. `is_owner`), and so does every request unless the default
+    cache is shared (see shared_cache_configured).
+
+    Views list the scopes their responses depend on in `cache_scopes`.
+    """
+    cache_scopes = ()
+    cache_timeout = RESPONSE_CACHE_SECONDS
+
+    def get_response_cache_keys(self, request):
+        """
+        Returns:
+            tuple: (key of the response at the current scope versions,
+            key of the latest response cached at any version)
+        """
+        query = normalized_query(request.query_params).urlencode()
+        url = f"{request.get_host()}{request.path}?{query}"
+        base = ":".join([
+            "response",
+            type(self).__name__,
+            get_language_from_request(request),
+            hashlib.sha1(url.encode()).hexdigest(),
+        ])
+        return f"{base}:{scope_versions(self.cache_scopes)}", f"{base}:latest"
+
+    def wait_for_response(self, key, lock_key):
+        """
+        Wait for the miss holding the lock to cache the response, for at
+        most STAMPEDE_LOCK_SECONDS.
+
+        Returns:
+            the cached response data, or None when the lock was released
+            (or expired) without a response being cached.
+        """
+        deadline = time.monotonic() + STAMPEDE_LOCK_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(STAMPEDE_POLL_SECONDS)
+            entries = cache.get_many([key, lock_key])
+            if key in entries:
+                return entries[key]
+            if lock_key not in entries:
+                return None
+        return None
+
+    def get(self, request, *args, **kwargs):
+        if request.user.is_authenticated or not shared_cache_configured():
+            return super().get(request, *args, **kwargs)
+
+        key, latest_key = self.get_response_cache_keys(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        # Only one of the concurrent misses computes the response. The
+        # others serve the previous version meanwhile, or wait for the
+        # new one when there is none (e.g. on a cold cache).
+        lock_key = f"{key}:lock"
+        locked = cache.add(lock_key, 1, STAMPEDE_LOCK_SECONDS)
+        if not locked:
+            data = cache.get(latest_key)
+            if data is None:
+                data = self.wait_for_response(key, lock_key)
+            if data is not None:
+                return Response(data)
+
+        try:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set_many(
+                    {key: response.data, latest_key: response.data},
+                    self.cache_timeout,
+                )
+            return response
+        finally:
+            if locked:
+                cache.delete(lock_key)
@@ -0,0 +1,110 @@
+"""
+Conditional GET.
+
+Views using ConditionalGetMixin compute their validators (an ETag and a
+Last-Modified date) from a few indexed columns before doing any other
+work, and answer 304 Not Modified when the client's copy is still
+current, so polling clients cost one small query per request.
+
+Listings keep `updated_on` current for changes to their images, files,
+amenities and prices too (see listings/signals.py), and deleting a
+booking touches its listing (bookings/signals.py), so the validators
+move whenever the response would.
+"""
+import functools
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .cache import normalized_query
+
+
+def make_etag(*values):
+    """
+    Returns:
+        str: a weak ETag of the given values. Weak, since equal values
+        only guarantee an equivalent response, not a byte-identical one.
+    """
+    digest = hashlib.sha1(repr(values).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def conditional_get(view_method):
+    """
+    Decorator for the get() of a view with a get_validators() method.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        validators = self.get_validators(request, *args, **kwargs)
+        if validators is None:
+            return view_method(self, request, *args, **kwargs)
+
+        values, last_modified = validators
+        # The response also depends on the user (e.g. `is_owner`) and
+        # the query parameters
+        user_id = request.user.pk if request.user.is_authenticated else None
+        query = normalized_query(request.query_params).urlencode()
+        etag = make_etag(*values, user_id, query)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = view_method(self, request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if timestamp is not None:
+                response["Last-Modified"] = http_date(timestamp)
+        return response
+
+    return wrapper
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag and Last-Modified headers to GET responses and answers
+    conditional requests with 304 Not Modified.
+
+    Views override get_validators(); list the mixin before
+    CachedResponseMixin, so cached responses get validators too.
+    """
+
+    def get_validators(self, request, *args, **kwargs):
+        """
+        Override to validate the view's responses. Without validators
+        (the default) requests are answered unconditionally.
+
+        Returns:
+            tuple: (values identifying the current state of the resource,
+            last modification datetime or None), or None to answer
+            unconditionally (e.g. the resource does not exist).
+        """
+        return None
+
+    @conditional_get
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class ConditionalRetrieveMixin(ConditionalGetMixin):
+    """
+    ConditionalGetMixin for detail views, validated by the object's
+    `updated_on` and by `validator_fields`: lookups of related fields the
+    response shows that do not move `updated_on` (e.g. the agent's
+    username).
+    """
+    validator_fields = ()
+
+    def get_validators(self, request, *args, **kwargs):
+        model = self.get_queryset().model
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = model._default_manager.filter(
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        ).values_list("updated_on", *self.validator_fields).first()
+        if row is None:
+            return None
+        return (
+            (model._meta.label_lower, kwargs[lookup_url_kwarg], *row),
+            row[0],
+        )
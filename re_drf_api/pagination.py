@@ -0,0 +1,63 @@
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination following the view's `cursor_orderings`.
+
+    `cursor_orderings` maps the names clients may pass in ?ordering= to a
+    model field or to an expression (annotated on the fly, e.g. to
+    coalesce a nullable field). Other orderings fall back to the view's
+    `cursor_default_ordering`. A "-" prefix sorts descending and "id"
+    breaks ties.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        orderings = view.cursor_orderings
+        requested = request.query_params.get(
+            OrderingFilter.ordering_param, "").split(",")[0].strip()
+        name = requested.lstrip("-")
+        if name not in orderings:
+            requested = view.cursor_default_ordering
+            name = requested.lstrip("-")
+
+        field = orderings[name]
+        if not isinstance(field, str):
+            queryset = queryset.annotate(**{f"cursor_{name}": field})
+            field = f"cursor_{name}"
+
+        prefix = "-" if requested.startswith("-") else ""
+        self._ordering = (prefix + field, prefix + "id")
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        return self._ordering
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """
+    Default pagination class.
+
+    Page-number pagination (with a total count) unless the client opts
+    in with ?pagination=cursor on a view that declares
+    `cursor_orderings`. Keyset pages skip the COUNT and the OFFSET, so
+    deep pages cost the same as the first; the response has `next` and
+    `previous` links but no `count`.
+    """
+    cursor_opt_in_param = "pagination"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if (
+            request.query_params.get(self.cursor_opt_in_param) == "cursor" and
+            getattr(view, "cursor_orderings", None)
+        ):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -1,5 +1,5 @@
 from dj_rest_auth.serializers import UserDetailsSerializer
-from rest_framework import serializers
+from rest_framework import permissions, serializers
 
 
 class CurrentUserSerializer(UserDetailsSerializer):
@@ -14,3 +14,36 @@ class CurrentUserSerializer(UserDetailsSerializer):
         fields = UserDetailsSerializer.Meta.fields + (
             "profile_id", "profile_image"
         )
+
+
+class SparseFieldsetMixin:
+    """
+    Lets clients choose the fields of a read response:
+
+        ?fields=id,price,images   only these fields
+        ?omit=description,files   every field except these
+
+    Both take comma-separated field names; unknown names are ignored.
+    Writes always use the full set of fields.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return fields
+
+        only = self._fieldset_param(request, "fields")
+        if only:
+            fields = {
+                name: field for name, field in fields.items()
+                if name in only
+            }
+        for name in self._fieldset_param(request, "omit"):
+            fields.pop(name, None)
+        return fields
+
+    @staticmethod
+    def _fieldset_param(request, name):
+        value = request.query_params.get(name, "")
+        return {field.strip() for field in value.split(",") if field.strip()}
@@ -30,7 +30,7 @@ REST_FRAMEWORK = {
             else "dj_rest_auth.jwt_auth.JWTCookieAuthentication"
         )
     ],
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "re_drf_api.pagination.OptionalCursorPagination",
     "PAGE_SIZE": 100,
     "DATETIME_FORMAT": "%d %b %Y",
 }
@@ -169,6 +169,17 @@ else:
     DATABASES = {"default": dj_database_url.parse(
         os.environ.get("DATABASE_URL"))}
 
+# Shared by every worker so the response cache versions invalidate all of
+# them (see re_drf_api/cache.py). Without it each process has its own
+# memory cache and responses are not cached.
+if "REDIS_URL" in os.environ:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ.get("REDIS_URL"),
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators